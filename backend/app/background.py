@@ -0,0 +1,74 @@
+"""
+Off-request-path execution helpers.
+
+`spawn` runs a coroutine as a tracked fire-and-forget task (so it is not
+garbage collected mid-flight and its errors are logged), and `run_in_process`
+runs CPU-bound work such as image resizing in a shared process pool so it does
+not block the event loop. Both are cleaned up by `shutdown` in the app lifespan.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Coroutine, Optional, Set
+
+from app.config import logger, settings
+
+_tasks: Set[asyncio.Task] = set()
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use"""
+    global _process_pool
+    if _process_pool is None:
+        # "spawn" avoids forking a process that is running Motor's threads
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.background_process_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _process_pool
+
+
+async def run_in_process(fn: Callable, *args: Any) -> Any:
+    """Run a picklable, CPU-bound function in the process pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), fn, *args)
+
+
+def spawn(coro: Coroutine, name: Optional[str] = None) -> asyncio.Task:
+    """Run a coroutine in the background, logging instead of losing its errors"""
+    task = asyncio.create_task(coro, name=name)
+    _tasks.add(task)
+    task.add_done_callback(_on_task_done)
+    return task
+
+
+def _on_task_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(
+            f"Background task {task.get_name()} failed: {error}", exc_info=error
+        )
+
+
+async def drain() -> None:
+    """Wait until every background task (including ones they spawn) finished"""
+    while _tasks:
+        await asyncio.gather(*list(_tasks), return_exceptions=True)
+
+
+async def shutdown(timeout: float = 10.0) -> None:
+    """Give running tasks a chance to finish, then stop the process pool"""
+    global _process_pool
+    if _tasks:
+        logger.info(f"Waiting for {len(_tasks)} background task(s) to finish...")
+        _, pending = await asyncio.wait(list(_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
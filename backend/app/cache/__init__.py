@@ -0,0 +1,94 @@
+# Shared cache module
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.invalidation import invalidation_bus
+from app.sync.changes import USER
+
+from .base import MISSING, Cache
+from .memory import MemoryCache
+from .redis import RedisCache
+from .singleflight import SingleFlight
+
+_cache: Optional[Cache] = None
+
+# Lifetime of entries that only the writing worker can invalidate
+LOCAL_CACHE_TTL = 5
+
+
+def create_cache(backend: str) -> Cache:
+    """Build the cache backend selected by `CACHE_BACKEND`"""
+    if backend == "memory":
+        return MemoryCache(settings.cache_max_entries)
+    if backend == "redis":
+        if not settings.cache_redis_url:
+            raise RuntimeError("CACHE_REDIS_URL is required for the redis backend")
+        return RedisCache(settings.cache_redis_url)
+    raise RuntimeError(f"Unknown cache backend: {backend}")
+
+
+def get_cache() -> Cache:
+    """Return the process-wide cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        _cache = create_cache(settings.cache_backend)
+    return _cache
+
+
+def invalidation_ttl(ttl: float) -> float:
+    """
+    TTL for entries that must follow writes made by any worker. They are kept
+    for `ttl` when every worker hears about invalidations (a shared redis cache,
+    or change streams on a replica set); otherwise another worker's write goes
+    unnoticed until the entry expires, so it is kept for LOCAL_CACHE_TTL only.
+    """
+    if settings.cache_backend == "redis" or invalidation_bus.mode == "changeStream":
+        return ttl
+    return min(ttl, LOCAL_CACHE_TTL)
+
+
+def group_tag(group_id: str) -> str:
+    return f"group:{group_id}"
+
+
+def user_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def tags_for_change(change: Dict[str, Any]) -> List[str]:
+    """Tags of the cached entries a change-log entry makes stale"""
+    tags = [user_tag(user_id) for user_id in change.get("userIds", [])]
+    if change.get("groupId"):
+        tags.append(group_tag(change["groupId"]))
+    if change.get("entity") == USER:
+        tags.append(user_tag(change["entityId"]))
+    return tags
+
+
+async def _invalidate(change: Dict[str, Any]) -> None:
+    tags = tags_for_change(change)
+    if tags and _cache is not None:
+        await _cache.invalidate_tags(*tags)
+
+
+async def _reset() -> None:
+    if _cache is not None:
+        await _cache.clear()
+
+
+invalidation_bus.subscribe(_invalidate, _reset)
+
+__all__ = [
+    "LOCAL_CACHE_TTL",
+    "MISSING",
+    "Cache",
+    "MemoryCache",
+    "RedisCache",
+    "SingleFlight",
+    "create_cache",
+    "get_cache",
+    "group_tag",
+    "invalidation_ttl",
+    "tags_for_change",
+    "user_tag",
+]
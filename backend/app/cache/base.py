@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from app.cache.singleflight import SingleFlight
+
+# Returned by `get` for keys that are not cached, unless another default is given
+MISSING = object()
+
+
+class Cache(ABC):
+    """
+    Key-value cache with per-entry TTLs and tags.
+
+    Tags group entries derived from the same data (e.g. `group:<id>`), so a
+    change can drop all of them with `invalidate_tags`. `get_or_set` adds
+    single-flight: concurrent misses for one key share a single computation
+    instead of each recomputing the value.
+    """
+
+    def __init__(self):
+        self._flights = SingleFlight()
+        self._fills: List[Dict[str, Any]] = []
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    async def _get_many(self, keys: List[str]) -> List[Any]:
+        """Cached values of the keys, MISSING for the ones that are not cached"""
+
+    @abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ) -> None: ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None: ...
+
+    @abstractmethod
+    async def _invalidate_tags(self, tags: List[str]) -> None: ...
+
+    @abstractmethod
+    async def clear(self) -> None: ...
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return (await self.mget([key], default))[0]
+
+    async def mget(self, keys: List[str], default: Any = None) -> List[Any]:
+        values = await self._get_many(list(keys))
+        misses = sum(1 for value in values if value is MISSING)
+        self.misses += misses
+        self.hits += len(values) - misses
+        return [default if value is MISSING else value for value in values]
+
+    async def invalidate_tags(self, *tags: str) -> None:
+        """Drop every entry carrying one of the tags"""
+        # Values being computed from the old data must not be stored afterwards
+        for fill in self._fills:
+            if fill["tags"].intersection(tags):
+                fill["stale"] = True
+        await self._invalidate_tags(list(tags))
+
+    async def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ) -> Any:
+        """Return the cached value, computing and storing it once on a miss"""
+        value = await self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        return await self._flights.run(
+            key, lambda: self._fill(key, compute, ttl, set(tags))
+        )
+
+    async def _fill(self, key, compute, ttl, tags) -> Any:
+        fill = {"tags": tags, "stale": False}
+        self._fills.append(fill)
+        try:
+            value = await compute()
+        finally:
+            self._fills.remove(fill)
+        if not fill["stale"]:
+            await self.set(key, value, ttl=ttl, tags=tags)
+        return value
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self._flights.coalesced,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
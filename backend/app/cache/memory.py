@@ -0,0 +1,90 @@
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.cache.base import MISSING, Cache
+
+
+class MemoryCache(Cache):
+    """
+    In-process LRU cache. Entries expire lazily when read after their TTL,
+    and the least recently used entries are evicted beyond `maxsize`.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.evictions = 0
+        # key -> (value, expires at, tags)
+        self._entries: "OrderedDict[str, Tuple[Any, Optional[float], Set[str]]]" = (
+            OrderedDict()
+        )
+        self._tagged: Dict[str, Set[str]] = defaultdict(set)
+
+    async def _get_many(self, keys: List[str]) -> List[Any]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                values.append(MISSING)
+            elif entry[1] is not None and entry[1] <= now:
+                self._remove(key)
+                values.append(MISSING)
+            else:
+                self._entries.move_to_end(key)
+                values.append(entry[0])
+        return values
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ) -> None:
+        self._remove(key)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        tags = set(tags)
+        self._entries[key] = (value, expires_at, tags)
+        for tag in tags:
+            self._tagged[tag].add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._remove(key)
+
+    async def _invalidate_tags(self, tags: List[str]) -> None:
+        for tag in tags:
+            for key in list(self._tagged.get(tag, ())):
+                self._remove(key)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._tagged.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "maxSize": self.maxsize,
+            "evictions": self.evictions,
+            **super().metrics(),
+        }
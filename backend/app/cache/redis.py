@@ -0,0 +1,85 @@
+import pickle
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.cache.base import MISSING, Cache
+
+# Longest lifetime of a tagged entry, so that the tag sets expire as well
+TAGGED_MAX_TTL = 24 * 3600
+
+
+class RedisCache(Cache):
+    """
+    Cache shared by all workers in Redis (or any server speaking its
+    protocol). Values are pickled; each tag is a set of the keys carrying it,
+    which expires with the longest-lived of them (`EXPIRE NX/GT` needs Redis
+    7). Tagged entries are kept for at most `TAGGED_MAX_TTL` seconds. `redis`
+    is only required when this backend is configured.
+    """
+
+    def __init__(self, url: str, client: Any = None, prefix: str = "cache:"):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError(
+                    "The redis cache backend requires redis (pip install redis)"
+                )
+            client = redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _tag(self, tag: str) -> str:
+        return f"{self.prefix}tag:{tag}"
+
+    async def _get_many(self, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        values = await self.client.mget([self._key(key) for key in keys])
+        return [MISSING if value is None else pickle.loads(value) for value in values]
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[float] = None,
+        tags: Iterable[str] = (),
+    ) -> None:
+        redis_key = self._key(key)
+        tags = list(tags)
+        if tags:
+            ttl = min(ttl, TAGGED_MAX_TTL) if ttl is not None else TAGGED_MAX_TTL
+        px = int(ttl * 1000) if ttl is not None else None
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.set(redis_key, pickle.dumps(value), px=px)
+            for tag in tags:
+                tag_key = self._tag(tag)
+                pipe.sadd(tag_key, redis_key)
+                # Set on a new tag, extended when a longer-lived key joins
+                pipe.pexpire(tag_key, px, nx=True)
+                pipe.pexpire(tag_key, px, gt=True)
+            await pipe.execute()
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*[self._key(key) for key in keys])
+
+    async def _invalidate_tags(self, tags: List[str]) -> None:
+        for tag in tags:
+            tag_key = self._tag(tag)
+            keys = await self.client.smembers(tag_key)
+            await self.client.delete(tag_key, *keys)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"backend": "redis", **super().metrics()}
@@ -0,0 +1,37 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+
+    Only calls running at the same time are coalesced, nothing is kept once
+    the call finished. Keys must identify the data the result is computed from
+    (e.g. include the group version), so that a caller never joins a call
+    that started before a change it has to see.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            self.calls += 1
+            flight = asyncio.ensure_future(fn())
+            self._inflight[key] = flight
+            flight.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the call others are waiting for
+        return await asyncio.shield(flight)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "inFlight": len(self._inflight),
+        }
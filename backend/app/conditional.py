@@ -0,0 +1,74 @@
+"""
+Conditional GET support for polled read endpoints.
+
+`conditional_get` builds a route dependency that derives a strong ETag from a
+cheap data version lookup (for instance a group's `version` counter) before the
+endpoint does any real work. When the client's `If-None-Match` matches, the
+request is answered with 304 right away; otherwise the ETag and a private
+`Cache-Control` header are added to the normal response.
+"""
+
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.auth.security import get_current_user
+from app.groups.service import group_service
+from app.storage.responses import etag_matches
+from fastapi import Depends, HTTPException, Request, Response
+
+# Responses are per user, and clients have to revalidate before each reuse
+CACHE_CONTROL = "private, no-cache"
+
+VersionLookup = Callable[[Request, Dict[str, Any]], Awaitable[Optional[Any]]]
+
+
+def make_etag(request: Request, user_id: str, version: Any) -> str:
+    """Strong ETag for a user's view of a resource at a given data version"""
+    digest = hashlib.sha256(
+        f"{request.url.path}?{request.url.query}|{user_id}|{version}".encode()
+    ).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def conditional_get(version_of: VersionLookup):
+    """
+    Create a dependency answering `If-None-Match` requests for a resource.
+
+    `version_of(request, current_user)` returns the data version the response
+    depends on, or None when it cannot be determined (e.g. the resource does
+    not exist), in which case the request is handled as usual.
+    """
+
+    async def check_etag(
+        request: Request,
+        response: Response,
+        current_user: Dict[str, Any] = Depends(get_current_user),
+    ) -> Optional[str]:
+        version = await version_of(request, current_user)
+        if version is None:
+            return None
+
+        etag = make_etag(request, current_user["_id"], version)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(status_code=304, headers=headers)
+
+        response.headers.update(headers)
+        return etag
+
+    return Depends(check_etag)
+
+
+# Version lookups shared by the group and expense routes
+
+
+async def group_version(request: Request, current_user: Dict[str, Any]):
+    """Version of the group in the path, None if the user is not a member"""
+    return await group_service.get_group_version(
+        request.path_params["group_id"], current_user["_id"]
+    )
+
+
+async def user_groups_version(request: Request, current_user: Dict[str, Any]):
+    """Combined version of all groups of the user"""
+    return await group_service.get_user_groups_version(current_user["_id"])
@@ -36,6 +36,70 @@ class Settings(BaseSettings):
     # App
     debug: bool = False
 
+    # Blob storage for attachments: "local", "gridfs" or "s3"
+    storage_backend: str = "local"
+    storage_local_path: str = "./storage"
+    storage_s3_bucket: Optional[str] = None
+    storage_s3_endpoint_url: Optional[str] = None  # e.g. http://localhost:9000 (MinIO)
+    storage_s3_access_key_id: Optional[str] = None
+    storage_s3_secret_access_key: Optional[str] = None
+    storage_s3_region: Optional[str] = None
+    attachment_max_bytes: int = 10 * 1024 * 1024
+    image_max_bytes: int = 5 * 1024 * 1024  # User and group images
+    image_cache_path: str = "./storage/image-cache"  # Resized image variants
+
+    # Cache for user lookups, membership checks, balances and optimized
+    # settlements: "memory" (per worker LRU) or "redis" (shared by all workers)
+    cache_backend: str = "memory"
+    cache_redis_url: Optional[str] = None
+    cache_max_entries: int = 10000
+
+    # Delta sync - changes younger than the settle delay are held back so that
+    # writes still in flight cannot be skipped by a token issued after them
+    sync_settle_seconds: float = 2.0
+    sync_change_retention_days: int = 30
+    sync_page_size: int = 500
+
+    # Group list - largest page and members included with each group
+    groups_max_page_size: int = 100
+    group_member_preview_size: int = 5
+    # Profile changes are copied into group member entries by a job run after
+    # this delay, batching changes to a user that arrive together
+    member_profile_refresh_delay: float = 1.0
+    # Renames are copied into settlements and expense history in batches, with
+    # a pause between batches
+    name_propagation_batch_size: int = 500
+    name_propagation_batch_delay: float = 0.1
+    # Data of deleted groups is removed in batches too
+    group_deletion_batch_size: int = 500
+    group_deletion_batch_delay: float = 0.1
+    # and so are the memberships and tokens of deleted accounts
+    account_deletion_batch_size: int = 500
+    account_deletion_batch_delay: float = 0.1
+
+    # Real-time events: "local" (single worker) or "redis" to fan out across workers
+    realtime_broker: str = "local"
+    realtime_redis_url: Optional[str] = None
+    realtime_queue_size: int = 100  # Buffered events per connection
+    realtime_heartbeat_seconds: float = 25.0
+
+    # Durable background jobs (app/jobs.py). Workers run in the API processes
+    # unless disabled, e.g. when they run on their own with `python -m app.jobs`
+    jobs_workers_enabled: bool = True
+    jobs_poll_interval: float = 1.0
+    jobs_visibility_timeout: float = 60.0  # Seconds before a silent job's lease expires
+    jobs_max_attempts: int = 5
+    jobs_retry_base_delay: float = 5.0  # Doubled after every failed attempt
+    jobs_retry_max_delay: float = 600.0
+    jobs_metrics_interval: float = 15.0  # How often queue depth is sampled
+
+    # Worker processes for CPU-bound background work (receipt thumbnails)
+    background_process_workers: int = 2
+
+    # Profiling - report DB command counts/timings per request (development only)
+    db_profiling: bool = False
+    db_slow_query_ms: float = 100.0
+
     # CORS - Add your frontend domain here for production
     allowed_origins: str = (
         "http://localhost:3000,http://localhost:5173,http://127.0.0.1:3000,http://localhost:8081"
@@ -1,4 +1,5 @@
 from app.config import logger, settings
+from app.profiling import query_profiler
 from motor.motor_asyncio import AsyncIOMotorClient
 
 
@@ -16,7 +17,14 @@ async def connect_to_mongo():
 
     Establishes a connection using the configured MongoDB URL and selects the database specified in the application settings.
     """
-    mongodb.client = AsyncIOMotorClient(settings.mongodb_url)
+    event_listeners = []
+    if settings.db_profiling:
+        event_listeners.append(query_profiler)
+        logger.info("MongoDB command profiling enabled")
+
+    mongodb.client = AsyncIOMotorClient(
+        settings.mongodb_url, event_listeners=event_listeners
+    )
     mongodb.database = mongodb.client[settings.database_name]
     logger.info("Connected to MongoDB")
 
@@ -1,13 +1,14 @@
-import io
-import uuid
+import mimetypes
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from app.auth.security import get_current_user
-from app.config import logger
+from app.conditional import conditional_get, group_version, user_groups_version
+from app.config import logger, settings
 from app.expenses.schemas import (
     AttachmentUploadResponse,
     BalanceSummaryResponse,
+    DashboardResponse,
     ExpenseAnalytics,
     ExpenseCreateRequest,
     ExpenseCreateResponse,
@@ -23,12 +24,17 @@ from app.expenses.schemas import (
     UserBalance,
 )
 from app.expenses.service import expense_service
+from app.groups.service import group_service
+from app.storage import BlobNotFoundError, blob_response, get_storage
+from app.storage.base import CHUNK_SIZE
+from app.storage.uploads import limited_upload_route
 from fastapi import (
     APIRouter,
     Depends,
     File,
     HTTPException,
     Query,
+    Request,
     Response,
     UploadFile,
     status,
@@ -48,21 +54,36 @@ router = APIRouter(prefix="/groups/{group_id}", tags=["Expenses"])
 async def create_expense(
     group_id: str,
     expense_data: ExpenseCreateRequest,
+    include: str = Query(
+        "summary",
+        pattern="^(summary)?$",
+        description="'summary' to return the group summary, empty to skip it "
+        "and refresh the optimized settlements in the background",
+    ),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """Create a new expense within a group"""
     try:
         result = await expense_service.create_expense(
-            group_id, expense_data, current_user["_id"]
+            group_id,
+            expense_data,
+            current_user["_id"],
+            include_summary=include == "summary",
         )
         return result
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to create expense")
 
 
-@router.get("/expenses", response_model=ExpenseListResponse)
+@router.get(
+    "/expenses",
+    response_model=ExpenseListResponse,
+    dependencies=[conditional_get(group_version)],
+)
 async def list_group_expenses(
     group_id: str,
     page: int = Query(1, ge=1),
@@ -70,13 +91,21 @@ async def list_group_expenses(
     from_date: Optional[datetime] = Query(None, alias="from"),
     to_date: Optional[datetime] = Query(None, alias="to"),
     tags: Optional[str] = Query(None),
+    receipts: str = Query("thumbnail", pattern="^(thumbnail|webp|original)$"),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """List all expenses for a group with pagination and filtering"""
     try:
         tag_list = tags.split(",") if tags else None
         result = await expense_service.list_group_expenses(
-            group_id, current_user["_id"], page, limit, from_date, to_date, tag_list
+            group_id,
+            current_user["_id"],
+            page,
+            limit,
+            from_date,
+            to_date,
+            tag_list,
+            receipt_variant=receipts,
         )
         return result
     except ValueError as e:
@@ -148,11 +177,6 @@ async def delete_expense(
 # Attachment Handling
 
 
-@router.post(
-    "/expenses/{expense_id}/attachments",
-    response_model=AttachmentUploadResponse,
-    status_code=status.HTTP_201_CREATED,
-)
 async def upload_attachment_for_expense(
     group_id: str,
     expense_id: str,
@@ -160,28 +184,43 @@ async def upload_attachment_for_expense(
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
     """Upload attachment for an expense"""
-    try:
-        # Verify user has access to the expense
-        await expense_service.get_expense_by_id(
-            group_id, expense_id, current_user["_id"]
-        )
 
-        # Generate unique key for the attachment
-        file_extension = file.filename.split(".")[-1] if "." in file.filename else ""
-        attachment_key = f"{expense_id}_{uuid.uuid4().hex}.{file_extension}"
+    async def file_chunks():
+        while chunk := await file.read(CHUNK_SIZE):
+            yield chunk
 
-        # In a real implementation, you would upload to cloud storage (S3, etc.)
-        # For now, we'll simulate this
-        file_content = await file.read()
-
-        # Store file metadata (in practice, store the actual file and return the URL)
-        url = f"https://storage.example.com/attachments/{attachment_key}"
-
-        return AttachmentUploadResponse(attachment_key=attachment_key, url=url)
+    try:
+        result = await expense_service.upload_attachment(
+            group_id,
+            expense_id,
+            file_chunks(),
+            file.filename,
+            file.content_type,
+            current_user["_id"],
+        )
+        return AttachmentUploadResponse(**result)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
+        logger.error(f"Error uploading attachment: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to upload attachment")
+    finally:
+        await file.close()
+
+
+# Oversized uploads are cut off while the body is received
+router.add_api_route(
+    "/expenses/{expense_id}/attachments",
+    upload_attachment_for_expense,
+    methods=["POST"],
+    response_model=AttachmentUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    route_class_override=limited_upload_route(
+        lambda: settings.attachment_max_bytes, "Attachment"
+    ),
+)
 
 
 @router.get("/expenses/{expense_id}/attachments/{key}")
@@ -189,20 +228,41 @@ async def get_attachment(
     group_id: str,
     expense_id: str,
     key: str,
+    request: Request,
+    variant: Optional[str] = Query(None, pattern="^(thumbnail|webp)$"),
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
-    """Get/download an attachment"""
+    """Get/download an attachment or one of its image variants (supports Range and If-None-Match)"""
     try:
-        # Verify user has access to the expense
-        await expense_service.get_expense_by_id(
-            group_id, expense_id, current_user["_id"]
+        attachment = await expense_service.get_attachment(
+            group_id, expense_id, key, current_user["_id"]
         )
-
-        # In a real implementation, you would fetch from cloud storage
-        # For now, we'll return a placeholder response
-        raise HTTPException(
-            status_code=501, detail="Attachment download not implemented"
+        filename = attachment.get("filename")
+        if variant:
+            blob = (attachment.get("variants") or {}).get(variant)
+            if not blob:
+                raise HTTPException(
+                    status_code=404, detail="Attachment variant not available"
+                )
+            if filename:
+                extension = mimetypes.guess_extension(blob["contentType"]) or ""
+                filename = f"{filename.rsplit('.', 1)[0]}-{variant}{extension}"
+        else:
+            blob = attachment
+
+        return await blob_response(
+            request,
+            get_storage(),
+            blob["blobKey"],
+            content_type=blob.get("contentType", "application/octet-stream"),
+            size=blob.get("size"),
+            filename=filename,
         )
+    except HTTPException:
+        raise
+    except BlobNotFoundError:
+        logger.error(f"Blob missing for attachment {key} of expense {expense_id}")
+        raise HTTPException(status_code=404, detail="Attachment content not found")
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -245,45 +305,29 @@ async def get_group_settlements(
 ):
     """Retrieve pending and optimized settlements for a group"""
     try:
-        # Get settlements using service
-        settlements_result = await expense_service.get_group_settlements(
-            group_id, current_user["_id"], status_filter, page, limit
-        )
-
-        # Get optimized settlements
-        optimized_settlements = await expense_service.calculate_optimized_settlements(
-            group_id, algorithm
-        )
-
-        # Calculate summary
-        from app.database import mongodb
-
-        total_pending_result = await mongodb.database.settlements.aggregate(
-            [
-                {"$match": {"groupId": group_id, "status": "pending"}},
-                {"$group": {"_id": None, "totalPending": {"$sum": "$amount"}}},
-            ]
-        ).to_list(None)
-
-        total_pending = (
-            total_pending_result[0]["totalPending"] if total_pending_result else 0
+        result = await expense_service.get_group_settlements_overview(
+            group_id, current_user["_id"], status_filter, page, limit, algorithm
         )
+        settlements = result["settlements"]
+        optimized_settlements = result["optimizedSettlements"]
 
         return SettlementListResponse(
-            settlements=settlements_result["settlements"],
+            settlements=settlements,
             optimizedSettlements=optimized_settlements,
             summary={
-                "totalPending": total_pending,
-                "transactionCount": len(settlements_result["settlements"]),
+                "totalPending": result["totalPending"],
+                "transactionCount": len(settlements),
                 "optimizedCount": len(optimized_settlements),
             },
             pagination={
                 "currentPage": page,
-                "totalPages": (settlements_result["total"] + limit - 1) // limit,
-                "totalItems": settlements_result["total"],
+                "totalPages": (result["total"] + limit - 1) // limit,
+                "totalItems": result["total"],
                 "limit": limit,
             },
         )
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
@@ -358,16 +402,13 @@ async def calculate_optimized_settlements(
 ):
     """Calculate and return optimized (simplified) settlements for a group"""
     try:
-        optimized_settlements = await expense_service.calculate_optimized_settlements(
+        optimized_settlements = await expense_service.get_optimized_settlements(
             group_id, algorithm
         )
 
         # Calculate savings
-        from app.database import mongodb
-
-        total_settlements = await mongodb.database.settlements.count_documents(
-            {"groupId": group_id, "status": "pending"}
-        )
+        group_stats = await expense_service.get_group_stats(group_id)
+        total_settlements = group_stats["pendingCount"]
 
         optimized_count = len(optimized_settlements)
         reduction_percentage = (
@@ -396,7 +437,11 @@ async def calculate_optimized_settlements(
 balance_router = APIRouter(prefix="/users/me", tags=["User Balance"])
 
 
-@balance_router.get("/friends-balance", response_model=FriendsBalanceResponse)
+@balance_router.get(
+    "/friends-balance",
+    response_model=FriendsBalanceResponse,
+    dependencies=[conditional_get(user_groups_version)],
+)
 async def get_cross_group_friend_balances(
     current_user: Dict[str, Any] = Depends(get_current_user),
 ):
@@ -420,6 +465,24 @@ async def get_overall_user_balance_summary(
         raise HTTPException(status_code=500, detail="Failed to fetch balance summary")
 
 
+@balance_router.get(
+    "/dashboard",
+    response_model=DashboardResponse,
+    dependencies=[conditional_get(user_groups_version)],
+)
+async def get_user_dashboard(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """Retrieve the home screen summary of all the current user's groups and friends"""
+    try:
+        groups = await group_service.get_user_groups(current_user["_id"])
+        result = await expense_service.get_dashboard(current_user["_id"], groups)
+        return DashboardResponse(**result)
+    except Exception as e:
+        logger.error(f"Error fetching dashboard for user {current_user['_id']}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch dashboard")
+
+
 # Group-specific user balance
 @router.get("/users/{user_id}/balance", response_model=UserBalance)
 async def get_user_balance_in_specific_group(
@@ -433,6 +496,8 @@ async def get_user_balance_in_specific_group(
             group_id, user_id, current_user["_id"]
         )
         return UserBalance(**result)
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
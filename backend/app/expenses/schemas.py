@@ -86,6 +86,12 @@ class ExpenseHistoryEntry(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
+class ReceiptVariants(BaseModel):
+    url: str
+    thumbnailUrl: Optional[str] = None
+    webpUrl: Optional[str] = None
+
+
 class ExpenseResponse(BaseModel):
     id: str = Field(alias="_id")
     groupId: str
@@ -97,6 +103,7 @@ class ExpenseResponse(BaseModel):
     splitType: SplitType
     tags: List[str] = []
     receiptUrls: List[str] = []
+    receipts: List[ReceiptVariants] = []
     comments: Optional[List[ExpenseComment]] = []
     history: Optional[List[ExpenseHistoryEntry]] = []
     createdAt: datetime
@@ -140,7 +147,7 @@ class GroupSummary(BaseModel):
 class ExpenseCreateResponse(BaseModel):
     expense: ExpenseResponse
     settlements: List[Settlement]
-    groupSummary: GroupSummary
+    groupSummary: Optional[GroupSummary] = None
 
 
 class ExpenseListResponse(BaseModel):
@@ -223,8 +230,26 @@ class ExpenseAnalytics(BaseModel):
 class AttachmentUploadResponse(BaseModel):
     attachment_key: str
     url: str
+    size: Optional[int] = None
+    contentType: Optional[str] = None
 
 
 class OptimizedSettlementsResponse(BaseModel):
     optimizedSettlements: List[OptimizedSettlement]
     savings: Dict[str, Any]
+
+
+class DashboardGroup(BaseModel):
+    groupId: str
+    name: str
+    imageUrl: Optional[str] = None
+    currency: str = "USD"
+    memberCount: int
+    yourBalance: float
+    lastActivity: Optional[datetime] = None
+
+
+class DashboardResponse(BaseModel):
+    groups: List[DashboardGroup]
+    friendsBalance: List[FriendBalance]
+    summary: Dict[str, Any]
@@ -1,8 +1,20 @@
+import asyncio
+import mimetypes
+import uuid
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
-
-from app.config import logger
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from app.background import run_in_process, spawn
+from app.cache import (
+    Cache,
+    SingleFlight,
+    get_cache,
+    group_tag,
+    invalidation_ttl,
+    user_tag,
+)
+from app.config import logger, settings
 from app.database import mongodb
 from app.expenses.schemas import (
     ExpenseCreateRequest,
@@ -14,13 +26,55 @@ from app.expenses.schemas import (
     SettlementStatus,
     SplitType,
 )
+from app.images import RECEIPT_VARIANTS, generate_variants
+from app.jobs import job_queue
+from app.storage import BlobTooLargeError, get_storage
+from app.storage.images import MEMBER_IMAGE_SIZE, image_variant_url
+from app.sync.changes import DELETE, EXPENSE, SETTLEMENT, change, record_changes
 from bson import ObjectId, errors
 from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Counters kept on every group document under "stats", maintained with $inc by
+# each expense and settlement mutation so summaries don't need to aggregate
+EMPTY_GROUP_STATS = {
+    "expenseCount": 0,
+    "totalExpenses": 0,
+    "settlementCount": 0,
+    "pendingCount": 0,
+    "pendingTotal": 0,
+}
+# Recounts of a group's stats to try while it keeps changing
+RECOUNT_ATTEMPTS = 5
+
+
+# Job type copying a renamed user's name into settlements and history
+PROPAGATE_NAME = "propagateName"
+
+# Job type generating the thumbnail and WebP variants of a receipt image
+GENERATE_RECEIPT_VARIANTS = "generateReceiptVariants"
+
+# How long cached reads may lag behind a change whose invalidation was missed.
+# Entries are only kept this long when other workers' writes invalidate them
+MEMBERSHIP_CACHE_TTL = 300
+FRIENDS_BALANCE_CACHE_TTL = 60
 
 
 class ExpenseService:
-    def __init__(self):
-        pass
+    def __init__(self, cache: Optional[Cache] = None):
+        # Groups with a background settlement refresh running, and those that
+        # changed again meanwhile and need another pass
+        self._refreshing_groups: Set[str] = set()
+        self._stale_groups: Set[str] = set()
+        self._cache = cache
+        # Identical group computations running at the same time (e.g. a whole
+        # group opening the app after a notification) share one call
+        self.flights = SingleFlight()
+
+    @property
+    def cache(self) -> Cache:
+        return self._cache if self._cache is not None else get_cache()
 
     @property
     def expenses_collection(self):
@@ -38,10 +92,40 @@ class ExpenseService:
     def users_collection(self):
         return mongodb.database.users
 
+    @property
+    def changes_collection(self):
+        return mongodb.database.changes
+
+    @property
+    def attachments_collection(self):
+        return mongodb.database.attachments
+
+    @property
+    def name_propagations_collection(self):
+        return mongodb.database.name_propagations
+
+    @property
+    def jobs_collection(self):
+        return mongodb.database.jobs
+
+    @property
+    def settlement_caches_collection(self):
+        return mongodb.database.settlement_caches
+
     async def create_expense(
-        self, group_id: str, expense_data: ExpenseCreateRequest, user_id: str
+        self,
+        group_id: str,
+        expense_data: ExpenseCreateRequest,
+        user_id: str,
+        include_summary: bool = True,
     ) -> Dict[str, Any]:
-        """Create a new expense and calculate settlements"""
+        """
+        Create a new expense and calculate settlements.
+
+        Without `include_summary` the group summary is left out of the result and
+        the optimized settlements are recomputed in the background instead, so
+        the write does not wait for a calculation over the group's history.
+        """
 
         # Validate and convert group_id to ObjectId
         try:
@@ -99,15 +183,52 @@ class ExpenseService:
             expense_doc, expense_data.paidBy
         )
 
-        # Get optimized settlements for the group
-        optimized_settlements = await self.calculate_optimized_settlements(group_id)
-
-        # Get group summary
-        group_summary = await self._get_group_summary(group_id, optimized_settlements)
+        # Update the group counters
+        group_change = await self._record_group_change(
+            group_id,
+            {
+                "expenseCount": 1,
+                "totalExpenses": expense_data.amount,
+                **self._settlement_stats_delta(
+                    added=[settlement.model_dump() for settlement in settlements]
+                ),
+            },
+            [change(EXPENSE, expense_doc["_id"])]
+            + [change(SETTLEMENT, settlement.id) for settlement in settlements],
+        )
 
         # Convert expense to response format
         expense_response = await self._expense_doc_to_response(expense_doc)
 
+        if not include_summary:
+            self.schedule_settlements_refresh(group_id)
+            return {
+                "expense": expense_response,
+                "settlements": settlements,
+                "groupSummary": None,
+            }
+
+        # Get optimized settlements for the group, shared with members reading
+        # the group at the new version meanwhile
+        if group_change:
+            version = group_change["version"]
+            optimized_settlements = await self.cache.get_or_set(
+                self._settlements_cache_key(group_id, "advanced", version),
+                lambda: self._compute_optimized_settlements(
+                    group_id, "advanced", version
+                ),
+                tags=[group_tag(group_id)],
+            )
+        else:
+            optimized_settlements = await self.calculate_optimized_settlements(group_id)
+
+        # Get group summary
+        group_summary = await self._get_group_summary(
+            group_id,
+            optimized_settlements,
+            group_change.get("stats") if group_change else None,
+        )
+
         return {
             "expense": expense_response,
             "settlements": settlements,
@@ -163,8 +284,14 @@ class ExpenseService:
         from_date: Optional[datetime] = None,
         to_date: Optional[datetime] = None,
         tags: Optional[List[str]] = None,
+        receipt_variant: str = "thumbnail",
     ) -> Dict[str, Any]:
-        """List expenses for a group with pagination and filtering"""
+        """
+        List expenses for a group with pagination and filtering.
+
+        `receiptUrls` point at the `receipt_variant` of each receipt image where
+        one has been generated, so lists stay light; "original" disables this.
+        """
 
         # Verify user access
         group = await self.groups_collection.find_one(
@@ -202,6 +329,8 @@ class ExpenseService:
 
         expenses = []
         for doc in expenses_docs:
+            if receipt_variant != "original":
+                doc = self._with_receipt_variant(doc, receipt_variant)
             expense = await self._expense_doc_to_response(doc)
             expenses.append(expense)
 
@@ -399,10 +528,18 @@ class ExpenseService:
                         status_code=404, detail="Expense not found during update"
                     )
 
+            stats_delta = {}
+            if updates.amount is not None:
+                stats_delta["totalExpenses"] = updates.amount - expense_doc["amount"]
+            changes = [change(EXPENSE, expense_id)]
+
             # If splits changed, recalculate settlements
             if updates.splits is not None or updates.amount is not None:
                 try:
                     # Delete old settlements for this expense
+                    old_settlements = await self.settlements_collection.find(
+                        {"expenseId": expense_id}, {"amount": 1, "status": 1}
+                    ).to_list(None)
                     await self.settlements_collection.delete_many(
                         {"expenseId": expense_id}
                     )
@@ -412,17 +549,29 @@ class ExpenseService:
                         {"_id": expense_obj_id}
                     )
 
+                    new_settlements = []
                     if updated_expense:
                         # Create new settlements
-                        await self._create_settlements_for_expense(
+                        new_settlements = await self._create_settlements_for_expense(
                             updated_expense, user_id
                         )
+                    stats_delta.update(
+                        self._settlement_stats_delta(
+                            added=[s.model_dump() for s in new_settlements],
+                            removed=old_settlements,
+                        )
+                    )
+                    changes += [
+                        change(SETTLEMENT, s["_id"], DELETE) for s in old_settlements
+                    ] + [change(SETTLEMENT, s.id) for s in new_settlements]
                 except Exception:
                     logger.error(
                         f"Warning: Failed to recalculate settlements", exc_info=True
                     )
                     # Continue anyway, as the expense update succeeded
 
+            await self._record_group_change(group_id, stats_delta, changes)
+
             # Return updated expense
             updated_expense = await self.expenses_collection.find_one(
                 {"_id": expense_obj_id}
@@ -469,13 +618,459 @@ class ExpenseService:
             )
 
         # Delete settlements for this expense
+        settlement_docs = await self.settlements_collection.find(
+            {"expenseId": expense_id}, {"amount": 1, "status": 1}
+        ).to_list(None)
         await self.settlements_collection.delete_many({"expenseId": expense_id})
 
         # Delete the expense
         result = await self.expenses_collection.delete_one(
             {"_id": ObjectId(expense_id)}
         )
-        return result.deleted_count > 0
+        deleted = result.deleted_count > 0
+
+        # Update the group counters
+        stats_delta = self._settlement_stats_delta(removed=settlement_docs)
+        changes = [change(SETTLEMENT, s["_id"], DELETE) for s in settlement_docs]
+        if deleted:
+            stats_delta.update(
+                {"expenseCount": -1, "totalExpenses": -expense_doc["amount"]}
+            )
+            changes.append(change(EXPENSE, expense_id, DELETE))
+        if changes:
+            await self._record_group_change(group_id, stats_delta, changes)
+
+        return deleted
+
+    async def _verify_expense_access(
+        self, group_id: str, expense_id: str, user_id: str
+    ) -> ObjectId:
+        """Check that the expense exists in a group the user belongs to"""
+        try:
+            group_obj_id = ObjectId(group_id)
+            expense_obj_id = ObjectId(expense_id)
+        except errors.InvalidId:
+            logger.warning(
+                f"Invalid ObjectId(s): group_id={group_id}, expense_id={expense_id}"
+            )
+            raise HTTPException(
+                status_code=400, detail="Invalid group ID or expense ID"
+            )
+
+        if not await self.is_group_member(group_id, user_id):
+            raise HTTPException(
+                status_code=403, detail="You are not a member of this group"
+            )
+
+        expense = await self.expenses_collection.find_one(
+            {"_id": expense_obj_id, "groupId": group_id}, {"_id": 1}
+        )
+        if not expense:
+            raise HTTPException(status_code=404, detail="Expense not found")
+        return expense_obj_id
+
+    async def upload_attachment(
+        self,
+        group_id: str,
+        expense_id: str,
+        chunks: AsyncIterator[bytes],
+        filename: Optional[str],
+        content_type: Optional[str],
+        user_id: str,
+    ) -> Dict[str, Any]:
+        """Stream an attachment into blob storage and link it to the expense"""
+        expense_obj_id = await self._verify_expense_access(
+            group_id, expense_id, user_id
+        )
+
+        try:
+            blob = await get_storage().put(
+                chunks, max_bytes=settings.attachment_max_bytes
+            )
+        except BlobTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        filename = filename or "attachment"
+        file_extension = filename.rsplit(".", 1)[-1] if "." in filename else ""
+        attachment_key = f"{expense_id}_{uuid.uuid4().hex}.{file_extension}"
+        url = f"/groups/{group_id}/expenses/{expense_id}/attachments/{attachment_key}"
+        content_type = (
+            content_type
+            or mimetypes.guess_type(filename)[0]
+            or "application/octet-stream"
+        )
+
+        is_image = content_type.startswith("image/")
+
+        attachment_doc = {
+            "_id": ObjectId(),
+            "key": attachment_key,
+            "url": url,
+            "expenseId": expense_id,
+            "groupId": group_id,
+            "blobKey": blob.key,
+            "filename": filename,
+            "contentType": content_type,
+            "size": blob.size,
+            "uploadedBy": user_id,
+            "createdAt": datetime.utcnow(),
+        }
+        if is_image:
+            attachment_doc["variantsStatus"] = "pending"
+            # Thumbnails are generated off the request path, by a job queued
+            # first (held back until the attachment exists), so they are
+            # still generated if the process stops right after the insert
+            await self._schedule_receipt_variants(
+                attachment_doc["_id"], settings.jobs_visibility_timeout
+            )
+        await self.attachments_collection.insert_one(attachment_doc)
+        await self.expenses_collection.update_one(
+            {"_id": expense_obj_id}, {"$addToSet": {"receiptUrls": url}}
+        )
+        await self._record_group_change(group_id, {}, [change(EXPENSE, expense_id)])
+
+        if blob.deduplicated:
+            logger.info(f"Attachment {attachment_key} reused stored blob {blob.key}")
+
+        if is_image:
+            await self._schedule_receipt_variants(attachment_doc["_id"])
+
+        return {
+            "attachment_key": attachment_key,
+            "url": url,
+            "size": blob.size,
+            "contentType": content_type,
+        }
+
+    async def get_attachment(
+        self, group_id: str, expense_id: str, key: str, user_id: str
+    ) -> Dict[str, Any]:
+        """Get attachment metadata after verifying access to the expense"""
+        await self._verify_expense_access(group_id, expense_id, user_id)
+
+        attachment = await self.attachments_collection.find_one(
+            {"key": key, "expenseId": expense_id, "groupId": group_id}
+        )
+        if not attachment:
+            raise HTTPException(status_code=404, detail="Attachment not found")
+        return attachment
+
+    async def _schedule_receipt_variants(
+        self, attachment_id: ObjectId, delay: float = 0
+    ) -> None:
+        await job_queue.enqueue(
+            self.jobs_collection,
+            GENERATE_RECEIPT_VARIANTS,
+            str(attachment_id),
+            delay=delay,
+        )
+
+    async def generate_receipt_variants(self, attachment_id: ObjectId) -> None:
+        """
+        Generate the thumbnail and WebP variants of a receipt image.
+
+        The variants are stored next to the original in blob storage, recorded
+        on the attachment and listed in the expense's `receipts` metadata.
+        """
+        attachment = await self.attachments_collection.find_one({"_id": attachment_id})
+        if not attachment:
+            return
+
+        # Identical images share a blob, so reuse variants generated before
+        processed = await self.attachments_collection.find_one(
+            {"blobKey": attachment["blobKey"], "variantsStatus": "ready"},
+            {"variants": 1},
+        )
+        if processed:
+            variants = processed["variants"]
+        else:
+            try:
+                storage = get_storage()
+                data = await storage.read_all(attachment["blobKey"])
+                images = await run_in_process(generate_variants, data, RECEIPT_VARIANTS)
+                variants = {}
+                for name, image in images.items():
+                    blob = await storage.put_bytes(image.data)
+                    variants[name] = {
+                        "blobKey": blob.key,
+                        "size": blob.size,
+                        "contentType": image.content_type,
+                        "width": image.width,
+                        "height": image.height,
+                    }
+            except Exception as e:
+                logger.warning(
+                    f"Could not generate variants for attachment {attachment['key']}: {e}"
+                )
+                await self.attachments_collection.update_one(
+                    {"_id": attachment_id}, {"$set": {"variantsStatus": "failed"}}
+                )
+                return
+
+        await self.attachments_collection.update_one(
+            {"_id": attachment_id},
+            {"$set": {"variants": variants, "variantsStatus": "ready"}},
+        )
+
+        url = attachment["url"]
+        receipt = {"url": url}
+        for name in variants:
+            receipt[f"{name}Url"] = f"{url}?variant={name}"
+        await self.expenses_collection.update_one(
+            {"_id": ObjectId(attachment["expenseId"])},
+            {"$push": {"receipts": receipt}},
+        )
+        await self._record_group_change(
+            attachment["groupId"], {}, [change(EXPENSE, attachment["expenseId"])]
+        )
+
+    async def get_optimized_settlements(
+        self, group_id: str, algorithm: str = "advanced"
+    ) -> List[OptimizedSettlement]:
+        """
+        Get the optimized settlements of a group, reusing a result computed for
+        the group's current version. Results are cached in memory and in the
+        `settlement_caches` collection, so only a group's first read after a
+        change (on any worker) pays for the calculation and other reads cost a
+        version lookup.
+        """
+        group_obj_id = ObjectId(group_id)
+        group = await self.groups_collection.find_one(
+            {"_id": group_obj_id}, {"version": 1}
+        )
+        if not group:
+            return await self.calculate_optimized_settlements(group_id, algorithm)
+
+        version = group.get("version", 0)
+        return await self.cache.get_or_set(
+            self._settlements_cache_key(group_id, algorithm, version),
+            lambda: self._load_optimized_settlements(group_id, algorithm, version),
+            tags=[group_tag(group_id)],
+        )
+
+    @staticmethod
+    def _settlements_cache_key(group_id: str, algorithm: str, version: int) -> str:
+        return f"settlements:{group_id}:{algorithm}:{version}"
+
+    async def _load_optimized_settlements(
+        self, group_id: str, algorithm: str, version: int
+    ) -> List[OptimizedSettlement]:
+        # Another worker may already have computed it
+        cached = await self.settlement_caches_collection.find_one(
+            {"_id": f"{group_id}:{algorithm}"}
+        )
+        if cached and cached["version"] == version:
+            return [OptimizedSettlement(**item) for item in cached["settlements"]]
+        return await self._compute_optimized_settlements(group_id, algorithm, version)
+
+    async def _compute_optimized_settlements(
+        self, group_id: str, algorithm: str, version: int
+    ) -> List[OptimizedSettlement]:
+        optimized_settlements = await self.calculate_optimized_settlements(
+            group_id, algorithm
+        )
+        await self._store_optimized_settlements(
+            group_id, algorithm, version, optimized_settlements
+        )
+        return optimized_settlements
+
+    async def _store_optimized_settlements(
+        self,
+        group_id: str,
+        algorithm: str,
+        version: int,
+        optimized_settlements: List[OptimizedSettlement],
+    ) -> None:
+        """
+        Keep a result in `settlement_caches`, kept apart from the group document
+        so that reads of the group don't carry it. A result for an older
+        version than the stored one is dropped.
+        """
+        try:
+            await self.settlement_caches_collection.update_one(
+                {"_id": f"{group_id}:{algorithm}", "version": {"$lte": version}},
+                {
+                    "$set": {
+                        "groupId": group_id,
+                        "algorithm": algorithm,
+                        "version": version,
+                        "settlements": [
+                            item.model_dump() for item in optimized_settlements
+                        ],
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass  # A newer version was stored meanwhile
+        except Exception as e:
+            logger.warning(f"Failed to cache settlements of group {group_id}: {e}")
+
+    def schedule_settlements_refresh(self, group_id: str) -> None:
+        """
+        Recompute the cached optimized settlements of a group in the background.
+        Changes made while a refresh is running trigger one more pass instead of
+        another concurrent calculation.
+        """
+        if group_id in self._refreshing_groups:
+            self._stale_groups.add(group_id)
+            return
+        self._refreshing_groups.add(group_id)
+        spawn(
+            self._refresh_optimized_settlements(group_id),
+            name=f"refresh-settlements-{group_id}",
+        )
+
+    async def _refresh_optimized_settlements(self, group_id: str) -> None:
+        try:
+            while True:
+                self._stale_groups.discard(group_id)
+                await self.get_optimized_settlements(group_id)
+                if group_id not in self._stale_groups:
+                    break
+        finally:
+            self._refreshing_groups.discard(group_id)
+
+    def _name_copies(self, user_id: str, name: str) -> List[tuple]:
+        """
+        Stages of a name propagation: the documents holding a copy of the
+        user's name other than `name`, their entity in the change log, and the
+        update that fixes them, as (collection, entity, query, update). An
+        expense with several stale history entries of the user is matched
+        again until all of them are fixed.
+        """
+        return [
+            (
+                self.settlements_collection,
+                SETTLEMENT,
+                {"payerId": user_id, "payerName": {"$ne": name}},
+                {"$set": {"payerName": name}},
+            ),
+            (
+                self.settlements_collection,
+                SETTLEMENT,
+                {"payeeId": user_id, "payeeName": {"$ne": name}},
+                {"$set": {"payeeName": name}},
+            ),
+            (
+                self.expenses_collection,
+                EXPENSE,
+                {
+                    "history": {
+                        "$elemMatch": {"userId": user_id, "userName": {"$ne": name}}
+                    }
+                },
+                {"$set": {"history.$.userName": name}},
+            ),
+        ]
+
+    async def propagate_user_name(self, user_id: str, name: str) -> None:
+        """
+        Copy a user's new name into the settlements and expense history that
+        store it, in a background job. Progress is kept in `name_propagations`,
+        so an interrupted propagation continues where it stopped, and a rename
+        during a propagation restarts it with the newer name.
+        """
+        await self.name_propagations_collection.update_one(
+            {"_id": user_id},
+            {
+                "$set": {
+                    "name": name,
+                    "stage": 0,
+                    "updated": 0,
+                    "startedAt": datetime.now(timezone.utc),
+                    "finishedAt": None,
+                }
+            },
+            upsert=True,
+        )
+        await job_queue.enqueue(self.jobs_collection, PROPAGATE_NAME, user_id)
+
+    async def _propagate_name(self, user_id: str) -> None:
+        """
+        Work through the stages of a propagation in batches of
+        `name_propagation_batch_size` documents, pausing between batches so
+        the writes don't crowd out requests. Only documents with a different
+        name match, so each batch shrinks what is left, a stage ends when
+        nothing matches anymore, and a resumed run picks up where it stopped.
+
+        The documents of a batch are noted in the progress (`pending`) before
+        they are written; once written, their groups get a new version and
+        the changes are logged, so cached settlements, ETags and `/sync` pick
+        up the new name. Pending changes left by an interrupted run are
+        recorded first when it resumes.
+        """
+        propagations = self.name_propagations_collection
+        batch_size = settings.name_propagation_batch_size
+        while True:
+            progress = await propagations.find_one({"_id": user_id})
+            if not progress or progress.get("finishedAt"):
+                return
+            if progress.get("pending"):
+                await self._record_renamed(progress["pending"])
+                await propagations.update_one(
+                    {"_id": user_id, "pending": progress["pending"]},
+                    {"$unset": {"pending": ""}},
+                )
+                continue
+            name, stage = progress["name"], progress["stage"]
+            copies = self._name_copies(user_id, name)
+            collection, entity, query, update = copies[stage]
+
+            stale = (
+                await collection.find(query, {"_id": 1, "groupId": 1})
+                .limit(batch_size)
+                .to_list(None)
+            )
+            updated = 0
+            if stale:
+                pending = [
+                    {"entity": entity, "id": str(doc["_id"]), "groupId": doc["groupId"]}
+                    for doc in stale
+                    if doc.get("groupId")
+                ]
+                await propagations.update_one(
+                    {"_id": user_id}, {"$set": {"pending": pending}}
+                )
+                result = await collection.bulk_write(
+                    [UpdateOne({**query, "_id": doc["_id"]}, update) for doc in stale],
+                    ordered=False,
+                )
+                updated = result.modified_count
+                await self._record_renamed(pending)
+
+            progress_update: Dict[str, Any] = {"$inc": {"updated": updated}}
+            if stale:
+                progress_update["$unset"] = {"pending": ""}
+            else:
+                done = {"stage": stage + 1}
+                if stage + 1 == len(copies):
+                    done["finishedAt"] = datetime.now(timezone.utc)
+                progress_update["$set"] = done
+            # Left alone if the user was renamed again meanwhile (pending
+            # changes are then recorded again, which is harmless)
+            await propagations.update_one(
+                {"_id": user_id, "name": name, "stage": stage}, progress_update
+            )
+            if stale:
+                await asyncio.sleep(settings.name_propagation_batch_delay)
+
+    async def _record_renamed(self, renamed: List[Dict[str, Any]]) -> None:
+        """
+        Bump the versions of the groups whose expenses or settlements got a
+        new name and log the changed entities. Group activity is left alone,
+        a rename doesn't move a group up the list.
+        """
+        by_group: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for doc in renamed:
+            by_group[doc["groupId"]].append(change(doc["entity"], doc["id"]))
+        group_ids = [ObjectId(gid) for gid in by_group if ObjectId.is_valid(gid)]
+        if group_ids:
+            await self.groups_collection.update_many(
+                {"_id": {"$in": group_ids}}, {"$inc": {"version": 1}}
+            )
+        for group_id, changes in by_group.items():
+            await record_changes(self.changes_collection, group_id, changes)
 
     async def calculate_optimized_settlements(
         self, group_id: str, algorithm: str = "advanced"
@@ -667,48 +1262,192 @@ class ExpenseService:
         }
 
         await self.settlements_collection.insert_one(settlement_doc)
+        await self._record_group_change(
+            group_id,
+            self._settlement_stats_delta(added=[settlement_doc]),
+            [change(SETTLEMENT, settlement_doc["_id"])],
+        )
 
         return Settlement(**{**settlement_doc, "_id": str(settlement_doc["_id"])})
 
+    def _with_receipt_variant(
+        self, doc: Dict[str, Any], variant: str
+    ) -> Dict[str, Any]:
+        """Swap receipt URLs for the given variant where it is available"""
+        variant_urls = {
+            receipt["url"]: receipt[f"{variant}Url"]
+            for receipt in doc.get("receipts") or []
+            if receipt.get(f"{variant}Url")
+        }
+        if not variant_urls:
+            return doc
+        receipt_urls = [variant_urls.get(url, url) for url in doc["receiptUrls"]]
+        return {**doc, "receiptUrls": receipt_urls}
+
     async def _expense_doc_to_response(self, doc: Dict[str, Any]) -> ExpenseResponse:
         """Convert expense document to response model"""
         return ExpenseResponse(**{**doc, "_id": str(doc["_id"])})
 
     async def _get_group_summary(
-        self, group_id: str, optimized_settlements: List[OptimizedSettlement]
+        self,
+        group_id: str,
+        optimized_settlements: List[OptimizedSettlement],
+        stats: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Get group summary statistics"""
+        if stats is None:
+            stats = await self.get_group_stats(group_id)
 
-        # Get total expenses
-        pipeline = [
-            {"$match": {"groupId": group_id}},
-            {
-                "$group": {
-                    "_id": None,
-                    "totalExpenses": {"$sum": "$amount"},
-                    "expenseCount": {"$sum": 1},
-                }
-            },
-        ]
-        expense_result = await self.expenses_collection.aggregate(pipeline).to_list(
-            None
+        return {
+            "totalExpenses": round(stats["totalExpenses"], 2),
+            "totalSettlements": stats["settlementCount"],
+            "optimizedSettlements": optimized_settlements,
+        }
+
+    def _settlement_stats_delta(
+        self,
+        added: List[Dict[str, Any]] = (),
+        removed: List[Dict[str, Any]] = (),
+    ) -> Dict[str, Any]:
+        """Counter increments for settlements added to and removed from a group"""
+        delta = {"settlementCount": 0, "pendingCount": 0, "pendingTotal": 0}
+        for sign, settlements in ((1, added), (-1, removed)):
+            for settlement in settlements:
+                delta["settlementCount"] += sign
+                if settlement["status"] == SettlementStatus.PENDING:
+                    delta["pendingCount"] += sign
+                    delta["pendingTotal"] += sign * settlement["amount"]
+        return delta
+
+    async def _record_group_change(
+        self,
+        group_id: str,
+        delta: Dict[str, Any],
+        changes: List[Dict[str, Any]] = (),
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Record a change of a group: bump its version, apply counter increments
+        to its stats and append the changed entities to the sync change log.
+        Returns the updated `version` and `stats` of the group.
+        """
+        group, _ = await asyncio.gather(
+            self._bump_group(group_id, delta),
+            record_changes(self.changes_collection, group_id, list(changes)),
+        )
+        return group
+
+    async def _bump_group(
+        self, group_id: str, delta: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Bump the version of a group, apply counter increments to its stats and
+        move its last activity (which orders group lists) forward.
+
+        Stats of groups that were never counted are left alone, they are counted
+        in full on first read instead. The change being recorded has already
+        been written at this point, so a failure is logged rather than raised;
+        `recount_group_stats` repairs counters that drifted.
+        """
+        increments = {
+            f"stats.{field}": value for field, value in delta.items() if value
+        }
+        group_obj_id = ObjectId(group_id)
+        activity = {"lastActivityAt": datetime.now(timezone.utc)}
+        try:
+            group = await self.groups_collection.find_one_and_update(
+                {"_id": group_obj_id, "stats": {"$exists": True}},
+                {"$inc": {"version": 1, **increments}, "$max": activity},
+                projection={"stats": 1, "version": 1},
+                return_document=ReturnDocument.AFTER,
+            )
+            if group is None:
+                group = await self.groups_collection.find_one_and_update(
+                    {"_id": group_obj_id},
+                    {"$inc": {"version": 1}, "$max": activity},
+                    projection={"stats": 1, "version": 1},
+                    return_document=ReturnDocument.AFTER,
+                )
+        except Exception as e:
+            logger.error(f"Failed to record change of group {group_id}: {e}")
+            return None
+        return group
+
+    async def get_group_stats(self, group_id: str) -> Dict[str, Any]:
+        """Get the counters of a group, counting them first if they are missing"""
+        group = await self.groups_collection.find_one(
+            {"_id": ObjectId(group_id)}, {"stats": 1}
         )
-        expense_stats = (
-            expense_result[0]
-            if expense_result
-            else {"totalExpenses": 0, "expenseCount": 0}
+        if group and group.get("stats"):
+            return group["stats"]
+        return await self.recount_group_stats(group_id)
+
+    async def recount_group_stats(self, group_id: str) -> Dict[str, Any]:
+        """Recompute the counters of a group from its expenses and settlements"""
+        return await self.flights.run(
+            ("recount", group_id), lambda: self._recount_group_stats(group_id)
         )
 
-        # Get total settlements count
-        settlement_count = await self.settlements_collection.count_documents(
-            {"groupId": group_id}
+    async def _recount_group_stats(self, group_id: str) -> Dict[str, Any]:
+        """
+        Count the stats and store them only if the group's version is still
+        the one read before counting. A write in between bumps the version
+        (and its `$inc` is skipped while stats are missing, or overwritten by
+        the `$set`), so the count is repeated instead of losing it.
+        """
+        group_obj_id = ObjectId(group_id)
+        for _ in range(RECOUNT_ATTEMPTS):
+            group = await self.groups_collection.find_one(
+                {"_id": group_obj_id}, {"version": 1}
+            )
+            stats = await self._count_group_stats(group_id)
+            if group is None:
+                return stats
+            result = await self.groups_collection.update_one(
+                {"_id": group_obj_id, "version": group.get("version")},
+                {"$set": {"stats": stats}},
+            )
+            if result.matched_count:
+                return stats
+        logger.warning(f"Group {group_id} kept changing, its stats were not stored")
+        return stats
+
+    async def _count_group_stats(self, group_id: str) -> Dict[str, Any]:
+        is_pending = {"$eq": ["$status", SettlementStatus.PENDING.value]}
+        expense_result, settlement_result = await asyncio.gather(
+            self.expenses_collection.aggregate(
+                [
+                    {"$match": {"groupId": group_id}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "expenseCount": {"$sum": 1},
+                            "totalExpenses": {"$sum": "$amount"},
+                        }
+                    },
+                ]
+            ).to_list(None),
+            self.settlements_collection.aggregate(
+                [
+                    {"$match": {"groupId": group_id}},
+                    {
+                        "$group": {
+                            "_id": None,
+                            "settlementCount": {"$sum": 1},
+                            "pendingCount": {"$sum": {"$cond": [is_pending, 1, 0]}},
+                            "pendingTotal": {
+                                "$sum": {"$cond": [is_pending, "$amount", 0]}
+                            },
+                        }
+                    },
+                ]
+            ).to_list(None),
         )
 
-        return {
-            "totalExpenses": expense_stats["totalExpenses"],
-            "totalSettlements": settlement_count,
-            "optimizedSettlements": optimized_settlements,
-        }
+        stats = dict(EMPTY_GROUP_STATS)
+        for result in (expense_result, settlement_result):
+            if result:
+                stats.update({k: v for k, v in result[0].items() if k != "_id"})
+        return stats
 
     async def get_group_settlements(
         self,
@@ -719,12 +1458,55 @@ class ExpenseService:
         limit: int = 50,
     ) -> Dict[str, Any]:
         """Get settlements for a group with pagination"""
+        await self._verify_settlements_access(group_id, user_id)
+        return await self._list_group_settlements(group_id, status_filter, page, limit)
 
-        # Verify user access
-        group = await self.groups_collection.find_one(
-            {"_id": ObjectId(group_id), "members.userId": user_id}
+    async def get_group_settlements_overview(
+        self,
+        group_id: str,
+        user_id: str,
+        status_filter: Optional[str] = None,
+        page: int = 1,
+        limit: int = 50,
+        algorithm: str = "advanced",
+    ) -> Dict[str, Any]:
+        """
+        Get a page of settlements together with the optimized settlements and
+        the total pending amount. The three are independent, so they are
+        queried concurrently once access has been verified.
+        """
+        await self._verify_settlements_access(group_id, user_id)
+
+        settlements_result, optimized_settlements, total_pending = await asyncio.gather(
+            self._list_group_settlements(group_id, status_filter, page, limit),
+            self.get_optimized_settlements(group_id, algorithm),
+            self.get_pending_settlements_total(group_id),
         )
-        if not group:
+        return {
+            **settlements_result,
+            "optimizedSettlements": optimized_settlements,
+            "totalPending": total_pending,
+        }
+
+    async def is_group_member(self, group_id: str, user_id: str) -> bool:
+        """Whether the user belongs to the group, cached until the group changes"""
+        group_obj_id = ObjectId(group_id)
+
+        async def lookup() -> bool:
+            group = await self.groups_collection.find_one(
+                {"_id": group_obj_id, "members.userId": user_id}, {"_id": 1}
+            )
+            return group is not None
+
+        return await self.cache.get_or_set(
+            f"member:{group_id}:{user_id}",
+            lookup,
+            ttl=invalidation_ttl(MEMBERSHIP_CACHE_TTL),
+            tags=[group_tag(group_id)],
+        )
+
+    async def _verify_settlements_access(self, group_id: str, user_id: str) -> None:
+        if not await self.is_group_member(group_id, user_id):
             logger.warning(
                 f"Unauthorized access attempt to group {group_id} by user {user_id}"
             )
@@ -732,22 +1514,27 @@ class ExpenseService:
                 status_code=403, detail="Group not found or user not a member"
             )
 
+    async def _list_group_settlements(
+        self,
+        group_id: str,
+        status_filter: Optional[str],
+        page: int,
+        limit: int,
+    ) -> Dict[str, Any]:
         # Build query
         query = {"groupId": group_id}
         if status_filter:
             query["status"] = status_filter
 
-        # Get total count
-        total = await self.settlements_collection.count_documents(query)
-
-        # Get settlements with pagination
+        # Count and fetch the page concurrently
         skip = (page - 1) * limit
-        settlements_docs = (
-            await self.settlements_collection.find(query)
+        total, settlements_docs = await asyncio.gather(
+            self.settlements_collection.count_documents(query),
+            self.settlements_collection.find(query)
             .sort("createdAt", -1)
             .skip(skip)
             .limit(limit)
-            .to_list(None)
+            .to_list(None),
         )
 
         settlements = []
@@ -762,6 +1549,11 @@ class ExpenseService:
             "limit": limit,
         }
 
+    async def get_pending_settlements_total(self, group_id: str) -> float:
+        """Sum of all pending settlement amounts in a group"""
+        stats = await self.get_group_stats(group_id)
+        return round(stats["pendingTotal"], 2)
+
     async def get_settlement_by_id(
         self, group_id: str, settlement_id: str, user_id: str
     ) -> Settlement:
@@ -805,20 +1597,67 @@ class ExpenseService:
         if paid_at:
             update_doc["paidAt"] = paid_at
 
-        result = await self.settlements_collection.update_one(
-            {"_id": ObjectId(settlement_id), "groupId": group_id}, {"$set": update_doc}
+        # The previous status is needed to update the group counters
+        previous_doc = await self.settlements_collection.find_one_and_update(
+            {"_id": ObjectId(settlement_id), "groupId": group_id},
+            {"$set": update_doc},
+            return_document=ReturnDocument.BEFORE,
         )
 
-        if result.matched_count == 0:
+        if not previous_doc:
             raise HTTPException(status_code=404, detail="Settlement not found")
 
-        # Get updated settlement
-        settlement_doc = await self.settlements_collection.find_one(
-            {"_id": ObjectId(settlement_id)}
+        settlement_doc = {**previous_doc, **update_doc}
+        await self._record_group_change(
+            group_id,
+            self._settlement_stats_delta(
+                added=[settlement_doc], removed=[previous_doc]
+            ),
+            [change(SETTLEMENT, settlement_id)],
         )
 
         return Settlement(**{**settlement_doc, "_id": str(settlement_doc["_id"])})
 
+    async def cancel_pending_settlements_of_user(self, user_id: str, limit: int) -> int:
+        """
+        Cancel up to `limit` pending settlements the user pays or receives,
+        so balances stop owing a deleted account. Returns how many were
+        cancelled.
+        """
+        pending = (
+            await self.settlements_collection.find(
+                {
+                    "$or": [{"payerId": user_id}, {"payeeId": user_id}],
+                    "status": SettlementStatus.PENDING.value,
+                },
+                {"_id": 1},
+            )
+            .limit(limit)
+            .to_list(None)
+        )
+        update_doc = {
+            "status": SettlementStatus.CANCELLED.value,
+            "updatedAt": datetime.utcnow(),
+        }
+        cancelled = 0
+        for doc in pending:
+            previous_doc = await self.settlements_collection.find_one_and_update(
+                {"_id": doc["_id"], "status": SettlementStatus.PENDING.value},
+                {"$set": update_doc},
+                return_document=ReturnDocument.BEFORE,
+            )
+            if not previous_doc:
+                continue
+            cancelled += 1
+            await self._record_group_change(
+                previous_doc["groupId"],
+                self._settlement_stats_delta(
+                    added=[{**previous_doc, **update_doc}], removed=[previous_doc]
+                ),
+                [change(SETTLEMENT, doc["_id"])],
+            )
+        return cancelled
+
     async def delete_settlement(
         self, group_id: str, settlement_id: str, user_id: str
     ) -> bool:
@@ -833,11 +1672,19 @@ class ExpenseService:
                 status_code=403, detail="Group not found or user not a member"
             )
 
-        result = await self.settlements_collection.delete_one(
-            {"_id": ObjectId(settlement_id), "groupId": group_id}
+        settlement_doc = await self.settlements_collection.find_one_and_delete(
+            {"_id": ObjectId(settlement_id), "groupId": group_id},
+            projection={"amount": 1, "status": 1},
         )
+        if not settlement_doc:
+            return False
 
-        return result.deleted_count > 0
+        await self._record_group_change(
+            group_id,
+            self._settlement_stats_delta(removed=[settlement_doc]),
+            [change(SETTLEMENT, settlement_id, DELETE)],
+        )
+        return True
 
     async def get_user_balance_in_group(
         self, group_id: str, target_user_id: str, current_user_id: str
@@ -853,10 +1700,6 @@ class ExpenseService:
                 status_code=403, detail="Group not found or user not a member"
             )
 
-        # Get user info
-        user = await self.users_collection.find_one({"_id": ObjectId(target_user_id)})
-        user_name = user.get("name", "Unknown") if user else "Unknown"
-
         # Calculate totals from settlements
         pipeline = [
             {
@@ -890,26 +1733,19 @@ class ExpenseService:
             },
         ]
 
-        result = await self.settlements_collection.aggregate(pipeline).to_list(None)
-        balance_data = result[0] if result else {"totalPaid": 0, "totalOwed": 0}
-
-        total_paid = balance_data["totalPaid"]
-        total_owed = balance_data["totalOwed"]
-        net_balance = total_paid - total_owed
-
-        # Get pending settlements
-        pending_settlements = await self.settlements_collection.find(
-            {"groupId": group_id, "payeeId": target_user_id, "status": "pending"}
-        ).to_list(None)
-
-        pending_settlement_objects = []
-        for doc in pending_settlements:
-            settlement = Settlement(**{**doc, "_id": str(doc["_id"])})
-            pending_settlement_objects.append(settlement)
-
-        # Get recent expenses where user was involved
-        recent_expenses = (
-            await self.expenses_collection.find(
+        target_user_obj_id = ObjectId(target_user_id)
+
+        # The remaining lookups are independent of each other
+        user, result, pending_settlements, recent_expenses = await asyncio.gather(
+            # User info
+            self.users_collection.find_one({"_id": target_user_obj_id}),
+            self.settlements_collection.aggregate(pipeline).to_list(None),
+            # Pending settlements
+            self.settlements_collection.find(
+                {"groupId": group_id, "payeeId": target_user_id, "status": "pending"}
+            ).to_list(None),
+            # Recent expenses where user was involved
+            self.expenses_collection.find(
                 {
                     "groupId": group_id,
                     "$or": [
@@ -920,9 +1756,21 @@ class ExpenseService:
             )
             .sort("createdAt", -1)
             .limit(5)
-            .to_list(None)
+            .to_list(None),
         )
 
+        user_name = user.get("name", "Unknown") if user else "Unknown"
+        balance_data = result[0] if result else {"totalPaid": 0, "totalOwed": 0}
+
+        total_paid = balance_data["totalPaid"]
+        total_owed = balance_data["totalOwed"]
+        net_balance = total_paid - total_owed
+
+        pending_settlement_objects = []
+        for doc in pending_settlements:
+            settlement = Settlement(**{**doc, "_id": str(doc["_id"])})
+            pending_settlement_objects.append(settlement)
+
         recent_expense_data = []
         for expense in recent_expenses:
             # Find user's share
@@ -952,7 +1800,9 @@ class ExpenseService:
             "recentExpenses": recent_expense_data,
         }
 
-    async def get_friends_balance_summary(self, user_id: str) -> Dict[str, Any]:
+    async def get_friends_balance_summary(
+        self, user_id: str, groups: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
         """
         Get cross-group friend balances using optimized aggregation pipeline.
 
@@ -960,14 +1810,31 @@ class ExpenseService:
         Example: 20 friends × 5 groups = 3 queries total (vs 100+ with naive approach).
 
         Uses MongoDB aggregation to calculate all balances at once, then batch enriches
-        with user and group details for optimal performance.
+        with user and group details for optimal performance. Callers that already
+        loaded the user's groups can pass them to skip the groups query. The result
+        is cached until one of the groups, or the user's memberships, change.
         """
 
         # First, get all groups user belongs to (need this to filter friends properly)
-        groups = await self.groups_collection.find({"members.userId": user_id}).to_list(
-            length=500
+        if groups is None:
+            groups = await self.groups_collection.find(
+                {"members.userId": user_id}
+            ).to_list(length=500)
+
+        return await self.cache.get_or_set(
+            f"friends-balance:{user_id}",
+            lambda: self._calculate_friends_balance_summary(user_id, groups),
+            ttl=invalidation_ttl(FRIENDS_BALANCE_CACHE_TTL),
+            # Friends' names are shown too, so their profile changes count
+            tags={user_tag(user_id)}
+            | {user_tag(m["userId"]) for g in groups for m in g.get("members", [])}
+            | {group_tag(str(g["_id"])) for g in groups},
         )
 
+    async def _calculate_friends_balance_summary(
+        self, user_id: str, groups: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+
         if not groups:
             return {
                 "friendsBalance": [],
@@ -1124,7 +1991,9 @@ class ExpenseService:
                     else "Unknown"
                 ),
                 "userImageUrl": (
-                    friend_details.get("imageUrl") if friend_details else None
+                    image_variant_url(friend_details.get("imageUrl"), MEMBER_IMAGE_SIZE)
+                    if friend_details
+                    else None
                 ),
                 "netBalance": round(total_balance, 2),
                 "owesYou": total_balance > 0,
@@ -1224,6 +2093,118 @@ class ExpenseService:
             "groupsSummary": groups_summary,
         }
 
+    async def get_dashboard(
+        self, user_id: str, groups: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Get everything the home screen shows in one call: a summary of each of
+        the user's groups and the cross-group friend balances.
+
+        `groups` are the user's groups as returned by GroupService.get_user_groups.
+        The per-group balances and last activity come from one aggregation over
+        settlements and one over expenses instead of per-group requests.
+        """
+        group_ids = [str(group["_id"]) for group in groups]
+        balances, expense_activity, friends = await asyncio.gather(
+            self._get_group_balances(user_id, group_ids),
+            self._get_last_expense_activity(group_ids),
+            self.get_friends_balance_summary(user_id, groups),
+        )
+
+        summaries = []
+        for group in groups:
+            group_id = str(group["_id"])
+            balance = balances.get(group_id, {})
+            activity = [
+                at
+                for at in (balance.get("lastActivity"), expense_activity.get(group_id))
+                if at is not None
+            ]
+            summaries.append(
+                {
+                    "groupId": group_id,
+                    "name": group.get("name"),
+                    "imageUrl": group.get("imageUrl"),
+                    "currency": group.get("currency", "USD"),
+                    "memberCount": len(group.get("members", [])),
+                    "yourBalance": round(balance.get("balance", 0), 2),
+                    "lastActivity": (
+                        max(activity) if activity else group.get("createdAt")
+                    ),
+                }
+            )
+
+        # Most recently active groups first
+        summaries.sort(key=lambda g: g["lastActivity"] or datetime.min, reverse=True)
+        return {
+            "groups": summaries,
+            "friendsBalance": friends["friendsBalance"],
+            "summary": friends["summary"],
+        }
+
+    async def _get_group_balances(
+        self, user_id: str, group_ids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """User's net balance and latest settlement activity in each group"""
+        if not group_ids:
+            return {}
+        pipeline = [
+            {
+                "$match": {
+                    "groupId": {"$in": group_ids},
+                    "$or": [{"payerId": user_id}, {"payeeId": user_id}],
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$groupId",
+                    # What the user paid minus what the user owes, so the
+                    # payer's own share cancels out
+                    "balance": {
+                        "$sum": {
+                            "$subtract": [
+                                {
+                                    "$cond": [
+                                        {"$eq": ["$payerId", user_id]},
+                                        "$amount",
+                                        0,
+                                    ]
+                                },
+                                {
+                                    "$cond": [
+                                        {"$eq": ["$payeeId", user_id]},
+                                        "$amount",
+                                        0,
+                                    ]
+                                },
+                            ]
+                        }
+                    },
+                    "lastActivity": {"$max": {"$ifNull": ["$updatedAt", "$createdAt"]}},
+                }
+            },
+        ]
+        results = await self.settlements_collection.aggregate(pipeline).to_list(None)
+        return {result["_id"]: result for result in results}
+
+    async def _get_last_expense_activity(
+        self, group_ids: List[str]
+    ) -> Dict[str, datetime]:
+        """Time of the latest expense change in each group"""
+        if not group_ids:
+            return {}
+        pipeline = [
+            {"$match": {"groupId": {"$in": group_ids}}},
+            {
+                "$group": {
+                    "_id": "$groupId",
+                    "lastActivity": {"$max": {"$ifNull": ["$updatedAt", "$createdAt"]}},
+                }
+            },
+        ]
+        results = await self.expenses_collection.aggregate(pipeline).to_list(None)
+        return {result["_id"]: result["lastActivity"] for result in results}
+
     async def get_group_analytics(
         self,
         group_id: str,
@@ -1265,6 +2246,23 @@ class ExpenseService:
                 end_date = datetime(now.year, now.month + 1, 1)
             period_str = f"{now.year}-{now.month:02d}"
 
+        # Members of the group asking for the same period at the same group
+        # version get the same result
+        return await self.flights.run(
+            ("analytics", group_id, start_date, end_date, group.get("version", 0)),
+            lambda: self._calculate_group_analytics(
+                group_id, group, start_date, end_date, period_str
+            ),
+        )
+
+    async def _calculate_group_analytics(
+        self,
+        group_id: str,
+        group: Dict[str, Any],
+        start_date: datetime,
+        end_date: datetime,
+        period_str: str,
+    ) -> Dict[str, Any]:
         # Get expenses in the period
         expenses = await self.expenses_collection.find(
             {"groupId": group_id, "createdAt": {"$gte": start_date, "$lt": end_date}}
@@ -1362,3 +2360,11 @@ class ExpenseService:
 
 # Create service instance
 expense_service = ExpenseService()
+job_queue.register(
+    PROPAGATE_NAME, lambda job: expense_service._propagate_name(job["key"]), 2
+)
+job_queue.register(
+    GENERATE_RECEIPT_VARIANTS,
+    lambda job: expense_service.generate_receipt_variants(ObjectId(job["key"])),
+    settings.background_process_workers,
+)
@@ -1,6 +1,8 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from app.auth.security import get_current_user
+from app.conditional import conditional_get, group_version, user_groups_version
+from app.config import settings
 from app.groups.schemas import (
     DeleteGroupResponse,
     GroupCreateRequest,
@@ -15,7 +17,7 @@ from app.groups.schemas import (
     RemoveMemberResponse,
 )
 from app.groups.service import group_service
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 router = APIRouter(prefix="/groups", tags=["Groups"])
 
@@ -34,14 +36,30 @@ async def create_group(
     return group
 
 
-@router.get("", response_model=GroupListResponse)
-async def list_user_groups(current_user: Dict[str, Any] = Depends(get_current_user)):
-    """List all groups the current user belongs to"""
-    groups = await group_service.get_user_groups(current_user["_id"])
-    return {"groups": groups}
-
-
-@router.get("/{group_id}", response_model=GroupResponse)
+@router.get(
+    "",
+    response_model=GroupListResponse,
+    dependencies=[conditional_get(user_groups_version)],
+)
+async def list_user_groups(
+    limit: Optional[int] = Query(None, ge=1, le=settings.groups_max_page_size),
+    cursor: Optional[str] = Query(None),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    List the groups the current user belongs to, most recently active first.
+    Each group carries its member count and the first few members; the full
+    list is available from `/groups/{group_id}/members`. With a `limit`, the
+    groups are paged: pass `nextCursor` as `cursor` to fetch the next page.
+    """
+    return await group_service.list_user_groups(current_user["_id"], limit, cursor)
+
+
+@router.get(
+    "/{group_id}",
+    response_model=GroupResponse,
+    dependencies=[conditional_get(group_version)],
+)
 async def get_group_details(
     group_id: str, current_user: Dict[str, Any] = Depends(get_current_user)
 ):
@@ -41,8 +41,26 @@ class GroupResponse(BaseModel):
     model_config = ConfigDict(populate_by_name=True)
 
 
+class GroupSummary(BaseModel):
+    """A group as listed: its member count and the first few members"""
+
+    id: str = Field(alias="_id")
+    name: str
+    currency: str
+    joinCode: str
+    createdBy: str
+    createdAt: datetime
+    imageUrl: Optional[str] = None
+    memberCount: int
+    members: List[GroupMemberWithDetails] = []
+    lastActivityAt: Optional[datetime] = None
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class GroupListResponse(BaseModel):
-    groups: List[GroupResponse]
+    groups: List[GroupSummary]
+    nextCursor: Optional[str] = None
 
 
 class JoinGroupRequest(BaseModel):
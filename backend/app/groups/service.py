@@ -1,18 +1,57 @@
+import asyncio
+import base64
+import hashlib
+import json
 import secrets
 import string
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
-from app.config import logger
+from app.config import logger, settings
 from app.database import get_database
+from app.expenses.service import EMPTY_GROUP_STATS
+from app.jobs import job_queue
+from app.storage.images import (
+    MEMBER_IMAGE_SIZE,
+    externalize_image_url,
+    image_variant_url,
+)
+from app.sync.changes import DELETE, GROUP, MEMBERSHIP, UPSERT, change, record_changes
 from bson import ObjectId, errors
 from fastapi import HTTPException
+from pymongo import ReturnDocument, UpdateMany
+from pymongo.errors import DuplicateKeyError
 
+# Join codes to try before giving up on finding an unused one
+JOIN_CODE_ATTEMPTS = 10
 
-class GroupService:
-    def __init__(self):
-        pass
+# User fields copied into the member entries of their groups
+MEMBER_PROFILE_FIELDS = ("name", "email", "imageUrl")
+
+# Collections holding a group's data (by "groupId"), removed after the group
+# in this order. Attachment blobs are shared between identical uploads, so only
+# the attachment records are removed.
+GROUP_DATA_COLLECTIONS = ("expenses", "settlements", "attachments", "settlement_caches")
+
+# Job type removing the data of a deleted group
+DELETE_GROUP_DATA = "deleteGroupData"
+
+# Job type copying a user's changed profile into their group memberships
+REFRESH_MEMBER_PROFILE = "refreshMemberProfile"
+
+# Fields of a group included in group lists, besides the member summary
+GROUP_SUMMARY_FIELDS = (
+    "name",
+    "currency",
+    "joinCode",
+    "createdBy",
+    "createdAt",
+    "imageUrl",
+    "lastActivityAt",
+)
 
+
+class GroupService:
     def get_db(self):
         return get_database()
 
@@ -25,11 +64,11 @@ class GroupService:
         self, members: List[dict]
     ) -> List[dict]:
         """
-        Enrich member data with user details from the users collection.
-        Uses batch fetching for optimal performance (single query for all members).
+        Enrich member data with user details.
 
-        Performance: O(1) database queries regardless of member count.
-        Example: 10 members = 1 query instead of 10 separate queries.
+        Members carry a snapshot of their profile (see `_member_profile`), so
+        usually no lookup is needed. Users of members without one (added before
+        snapshots existed) are fetched with a single batch query.
         """
         if not members:
             return []
@@ -37,72 +76,131 @@ class GroupService:
         db = self.get_db()
         enriched_members = []
 
-        # Extract all unique user IDs
+        # Extract the user IDs of members without a profile snapshot
         user_ids = []
         for member in members:
             member_user_id = member.get("userId")
-            if member_user_id:
+            if member_user_id and not member.get("profile"):
                 try:
                     user_ids.append(ObjectId(member_user_id))
                 except errors.InvalidId:
                     logger.warning(f"Invalid ObjectId for userId: {member_user_id}")
 
-        if not user_ids:
-            # No valid user IDs, return members with fallback data
-            return [self._create_fallback_member(m) for m in members]
-
-        # OPTIMIZATION: Single query to fetch ALL users at once using $in
-        try:
-            users_cursor = db.users.find(
-                {"_id": {"$in": user_ids}},
-                {
-                    "_id": 1,
-                    "name": 1,
-                    "email": 1,
-                    "imageUrl": 1,
-                },  # Project only needed fields
-            )
-            users_list = await users_cursor.to_list(length=len(user_ids))
+        users_map = {}
+        if user_ids:
+            # Single query to fetch the remaining users at once using $in
+            try:
+                users_cursor = db.users.find(
+                    {"_id": {"$in": user_ids}}, list(MEMBER_PROFILE_FIELDS)
+                )
+                users_list = await users_cursor.to_list(length=len(user_ids))
 
-            # Create fast lookup dictionary: O(1) access per member
-            users_map = {str(user["_id"]): user for user in users_list}
+                # Create fast lookup dictionary: O(1) access per member
+                users_map = {str(user["_id"]): user for user in users_list}
 
-        except Exception as e:
-            logger.error(f"Error batch fetching users: {e}")
-            # Fallback to empty map if query fails
-            users_map = {}
+            except Exception as e:
+                logger.error(f"Error batch fetching users: {e}")
+                # Fallback to empty map if query fails
 
-        # Enrich members using the lookup map
+        # Enrich members using their snapshots or the lookup map
         for member in members:
             member_user_id = member.get("userId")
             if member_user_id:
-                user = users_map.get(member_user_id)
-
-                enriched_member = {
-                    "userId": member_user_id,
-                    "role": member.get("role", "member"),
-                    "joinedAt": member.get("joinedAt"),
-                    "user": {
-                        "name": (
-                            user.get("name", f"User {member_user_id[-4:]}")
-                            if user
-                            else f"User {member_user_id[-4:]}"
-                        ),
-                        "email": (
-                            user.get("email", f"{member_user_id}@example.com")
-                            if user
-                            else f"{member_user_id}@example.com"
-                        ),
-                        "imageUrl": user.get("imageUrl") if user else None,
-                    },
-                }
-                enriched_members.append(enriched_member)
+                user = member.get("profile") or users_map.get(member_user_id)
+                enriched_members.append(
+                    self._with_user_details(member, user)
+                    if user
+                    else self._create_fallback_member(member)
+                )
             else:
                 # Add member without user details if userId is missing
                 enriched_members.append(member)
 
         return enriched_members
 
+    def _with_user_details(self, member: dict, user: dict) -> dict:
+        """Member entry as returned by the API, from a profile snapshot or user"""
+        member_user_id = member["userId"]
+        return {
+            "userId": member_user_id,
+            "role": member.get("role", "member"),
+            "joinedAt": member.get("joinedAt"),
+            "user": {
+                "name": user.get("name") or f"User {member_user_id[-4:]}",
+                "email": user.get("email") or f"{member_user_id}@example.com",
+                "imageUrl": image_variant_url(user.get("imageUrl"), MEMBER_IMAGE_SIZE),
+            },
+        }
+
+    def _member_profile(self, user: dict) -> dict:
+        """Snapshot of a user's profile, stored on each of their memberships"""
+        return {field: user.get(field) for field in MEMBER_PROFILE_FIELDS}
+
+    async def _load_member_profile(self, user_id: str) -> Optional[dict]:
+        try:
+            obj_id = ObjectId(user_id)
+        except errors.InvalidId:
+            return None
+        user = await self.get_db().users.find_one(
+            {"_id": obj_id}, list(MEMBER_PROFILE_FIELDS)
+        )
+        return self._member_profile(user) if user else None
+
+    async def schedule_member_profile_refresh(
+        self, user_id: str, delay: Optional[float] = None
+    ) -> None:
+        """
+        Queue a job refreshing the user's profile snapshots in their groups
+        after `delay` (`member_profile_refresh_delay` by default). Changes to
+        the same user arriving within the delay are written together.
+        """
+        if delay is None:
+            delay = settings.member_profile_refresh_delay
+        await job_queue.enqueue(
+            self.get_db().jobs, REFRESH_MEMBER_PROFILE, user_id, delay=delay
+        )
+
+    async def refresh_member_profiles(self, user_ids: Iterable[str]) -> int:
+        """
+        Copy the current profiles of users into their group memberships, in
+        one batch write. Groups whose snapshot changed get a new version.
+        Returns the number of groups updated.
+        """
+        db = self.get_db()
+        obj_ids = [ObjectId(uid) for uid in user_ids if ObjectId.is_valid(uid)]
+        if not obj_ids:
+            return 0
+        users = await db.users.find(
+            {"_id": {"$in": obj_ids}}, list(MEMBER_PROFILE_FIELDS)
+        ).to_list(None)
+        updates = []
+        for user in users:
+            profile = self._member_profile(user)
+            updates.append(
+                UpdateMany(
+                    {
+                        "members": {
+                            "$elemMatch": {
+                                "userId": str(user["_id"]),
+                                "profile": {"$ne": profile},
+                            }
+                        }
+                    },
+                    {"$set": {"members.$.profile": profile}, "$inc": {"version": 1}},
+                )
+            )
+        if not updates:
+            return 0
+        result = await db.groups.bulk_write(updates, ordered=False)
+        return result.modified_count
+
+    async def _new_member(self, user_id: str, role: str, joined_at: datetime) -> dict:
+        member = {"userId": user_id, "role": role, "joinedAt": joined_at}
+        profile = await self._load_member_profile(user_id)
+        if profile:
+            member["profile"] = profile
+        return member
+
     def _create_fallback_member(self, member: dict) -> dict:
         """Helper to create fallback member data when user lookup fails"""
         user_id = member.get("userId", "unknown")
@@ -142,33 +240,124 @@ class GroupService:
         """Create a new group with the user as admin"""
         db = self.get_db()
 
-        # Generate unique join code
-        join_code = None
-        for _ in range(10):  # Try up to 10 times to generate unique code
-            join_code = self.generate_join_code()
-            existing = await db.groups.find_one({"joinCode": join_code})
-            if not existing:
-                break
-
-        if not join_code:
-            raise HTTPException(
-                status_code=500, detail="Failed to generate unique join code"
-            )
-
         now = datetime.now(timezone.utc)
         group_doc = {
+            "_id": ObjectId(),
             "name": group_data["name"],
             "currency": group_data.get("currency", "USD"),
-            "imageUrl": group_data.get("imageUrl"),
-            "joinCode": join_code,
+            "imageUrl": await externalize_image_url(group_data.get("imageUrl")),
             "createdBy": user_id,
             "createdAt": now,
-            "members": [{"userId": user_id, "role": "admin", "joinedAt": now}],
+            "members": [
+                await self._new_member(user_id, "admin", now),
+            ],
+            "lastActivityAt": now,
+            "stats": dict(EMPTY_GROUP_STATS),
+            "version": 0,
+        }
+
+        # The unique index on joinCode rejects codes already in use
+        for _ in range(JOIN_CODE_ATTEMPTS):
+            group_doc["joinCode"] = self.generate_join_code()
+            try:
+                await db.groups.insert_one(group_doc)
+                break
+            except DuplicateKeyError as e:
+                if "joinCode" not in str(e):
+                    raise
+        else:
+            raise HTTPException(
+                status_code=500, detail="Failed to generate unique join code"
+            )
+
+        await record_changes(
+            db.changes, group_doc["_id"], [change(GROUP, group_doc["_id"])]
+        )
+        return self.transform_group_document(group_doc)
+
+    def _encode_cursor(self, group: dict) -> str:
+        last_activity = group.get("lastActivityAt")
+        key = [last_activity.isoformat() if last_activity else None, str(group["_id"])]
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def _decode_cursor(self, cursor: str) -> Dict[str, Any]:
+        """Query for the groups listed after the group a cursor points at"""
+        try:
+            last_activity, group_id = json.loads(base64.urlsafe_b64decode(cursor))
+            obj_id = ObjectId(group_id)
+            if last_activity is not None:
+                last_activity = datetime.fromisoformat(last_activity)
+        except (ValueError, TypeError, errors.InvalidId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        # Groups without activity sort last (missing values sort lowest)
+        same_activity = {"lastActivityAt": last_activity, "_id": {"$lt": obj_id}}
+        if last_activity is None:
+            return same_activity
+        return {
+            "$or": [
+                {"lastActivityAt": {"$lt": last_activity}},
+                same_activity,
+                {"lastActivityAt": None},
+            ]
         }
 
-        result = await db.groups.insert_one(group_doc)
-        created_group = await db.groups.find_one({"_id": result.inserted_id})
-        return self.transform_group_document(created_group)
+    async def list_user_groups(
+        self, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        The user's groups, most recently active first: all of them, or pages
+        of `limit` groups when a limit is given.
+
+        Groups are summarized to their member count and the first
+        `group_member_preview_size` members, so users in many (or large)
+        groups don't receive every member of every group. Returns the groups
+        and the cursor of the next page, if there is one.
+        """
+        db = self.get_db()
+        query: Dict[str, Any] = {"members.userId": user_id}
+        if cursor:
+            query.update(self._decode_cursor(cursor))
+
+        members = {"$ifNull": ["$members", []]}
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": query},
+            {"$sort": {"lastActivityAt": -1, "_id": -1}},
+        ]
+        if limit:
+            pipeline.append({"$limit": limit + 1})
+        pipeline.append(
+            {
+                "$project": {
+                    **{field: 1 for field in GROUP_SUMMARY_FIELDS},
+                    "memberCount": {"$size": members},
+                    "members": {
+                        "$slice": [members, settings.group_member_preview_size]
+                    },
+                }
+            }
+        )
+        groups = await db.groups.aggregate(pipeline).to_list(None)
+
+        has_more = bool(limit) and len(groups) > limit
+        groups = groups[:limit]
+        summaries = []
+        for group in groups:
+            summary = self.transform_group_document(group)
+            summary["imageUrl"] = image_variant_url(
+                summary["imageUrl"], MEMBER_IMAGE_SIZE
+            )
+            summary["members"] = [
+                self._with_user_details(m, m["profile"]) if m.get("profile") else m
+                for m in summary["members"]
+            ]
+            summary["memberCount"] = group["memberCount"]
+            summary["lastActivityAt"] = group.get("lastActivityAt")
+            summaries.append(summary)
+        return {
+            "groups": summaries,
+            "nextCursor": self._encode_cursor(groups[-1]) if has_more else None,
+        }
 
     async def get_user_groups(self, user_id: str) -> List[dict]:
         """Get all groups where user is a member"""
@@ -181,6 +370,31 @@ class GroupService:
                 groups.append(transformed)
         return groups
 
+    async def get_group_version(self, group_id: str, user_id: str) -> Optional[int]:
+        """Data version of a group, or None if it is not visible to the user"""
+        db = self.get_db()
+        try:
+            obj_id = ObjectId(group_id)
+        except errors.InvalidId:
+            return None
+
+        group = await db.groups.find_one(
+            {"_id": obj_id, "members.userId": user_id}, {"version": 1}
+        )
+        return group.get("version", 0) if group else None
+
+    async def get_user_groups_version(self, user_id: str) -> str:
+        """
+        Data version of everything derived from a user's groups. It changes
+        whenever the user joins or leaves a group or one of the groups changes.
+        """
+        db = self.get_db()
+        groups = await db.groups.find(
+            {"members.userId": user_id}, {"version": 1}
+        ).to_list(None)
+        versions = sorted(f"{g['_id']}:{g.get('version', 0)}" for g in groups)
+        return hashlib.sha256(",".join(versions).encode()).hexdigest()
+
     async def get_group_by_id(self, group_id: str, user_id: str) -> Optional[dict]:
         """Get group details by ID with enriched member information, only if user is a member"""
         db = self.get_db()
@@ -236,9 +450,16 @@ class GroupService:
                 status_code=403, detail="Only group admins can update group details"
             )
 
+        if "imageUrl" in updates:
+            # Inline data URL images are moved to blob storage
+            updates["imageUrl"] = await externalize_image_url(updates["imageUrl"])
+
         result = await db.groups.find_one_and_update(
-            {"_id": obj_id}, {"$set": updates}, return_document=True
+            {"_id": obj_id},
+            {"$set": updates, "$inc": {"version": 1}},
+            return_document=True,
         )
+        await record_changes(db.changes, group_id, [change(GROUP, group_id)])
         return self.transform_group_document(result)
 
     async def delete_group(self, group_id: str, user_id: str) -> bool:
@@ -265,40 +486,142 @@ class GroupService:
                 status_code=403, detail="Only group admins can delete groups"
             )
 
-        result = await db.groups.delete_one({"_id": obj_id})
+        member_ids = [m["userId"] for m in group.get("members", [])]
+        return await self.remove_group(group_id, member_ids)
+
+    async def remove_group(self, group_id: str, member_ids: List[str]) -> bool:
+        """
+        Delete a group right away and its data in the background. Returns
+        whether the group was still there.
+        """
+        db = self.get_db()
+        # Queued first (held back until the group is gone), so the group's data
+        # is removed even if the process stops right after the group itself
+        await self._mark_group_deleting(group_id)
+        await self._schedule_group_deletion(group_id, settings.jobs_visibility_timeout)
+        result = await db.groups.delete_one({"_id": ObjectId(group_id)})
+        if result.deleted_count == 1:
+            # Members lose access to the group, so they are named in the change
+            await record_changes(
+                db.changes, group_id, [change(GROUP, group_id, DELETE, member_ids)]
+            )
+        await self._schedule_group_deletion(group_id)
         return result.deleted_count == 1
 
+    async def _mark_group_deleting(self, group_id: str) -> None:
+        await self.get_db().group_deletions.update_one(
+            {"_id": group_id},
+            {
+                "$setOnInsert": {
+                    "stage": 0,
+                    "deleted": {name: 0 for name in GROUP_DATA_COLLECTIONS},
+                    "startedAt": datetime.now(timezone.utc),
+                    "finishedAt": None,
+                }
+            },
+            upsert=True,
+        )
+
+    async def delete_group_data(self, group_id: str) -> None:
+        """
+        Remove a deleted group's expenses, settlements and attachment records
+        in the background (see `_delete_group_data`). Also used for data left
+        behind by groups deleted before deletions cascaded.
+        """
+        await self._mark_group_deleting(group_id)
+        await self._schedule_group_deletion(group_id)
+
+    async def _schedule_group_deletion(self, group_id: str, delay: float = 0) -> None:
+        await job_queue.enqueue(
+            self.get_db().jobs, DELETE_GROUP_DATA, group_id, delay=delay
+        )
+
+    async def _delete_group_data(self, group_id: str) -> None:
+        """
+        Delete a group's data collection by collection, in batches of
+        `group_deletion_batch_size` documents with a pause of
+        `group_deletion_batch_delay` seconds between batches, so a large group
+        doesn't hold up requests. The counts of deleted documents and the
+        current stage are stored in `group_deletions` after every batch, so a
+        deletion interrupted by a restart continues where it stopped when the
+        job is retried.
+        """
+        db = self.get_db()
+        batch_size = settings.group_deletion_batch_size
+
+        # Normally gone already, unless the process stopped in between
+        if ObjectId.is_valid(group_id):
+            await db.groups.delete_one({"_id": ObjectId(group_id)})
+        while True:
+            deletion = await db.group_deletions.find_one({"_id": group_id})
+            if not deletion or deletion.get("finishedAt"):
+                return
+            stage = deletion["stage"]
+            if stage == len(GROUP_DATA_COLLECTIONS):
+                await db.group_deletions.update_one(
+                    {"_id": group_id},
+                    {"$set": {"finishedAt": datetime.now(timezone.utc)}},
+                )
+                logger.info(f"Deleted data of group {group_id}: {deletion['deleted']}")
+                return
+
+            name = GROUP_DATA_COLLECTIONS[stage]
+            batch = (
+                await db[name]
+                .find({"groupId": group_id}, {"_id": 1})
+                .limit(batch_size)
+                .to_list(None)
+            )
+            if not batch:
+                await db.group_deletions.update_one(
+                    {"_id": group_id, "stage": stage}, {"$inc": {"stage": 1}}
+                )
+                continue
+
+            result = await db[name].delete_many(
+                {"_id": {"$in": [doc["_id"] for doc in batch]}}
+            )
+            await db.group_deletions.update_one(
+                {"_id": group_id, "stage": stage},
+                {"$inc": {f"deleted.{name}": result.deleted_count}},
+            )
+            await asyncio.sleep(settings.group_deletion_batch_delay)
+
     async def join_group_by_code(self, join_code: str, user_id: str) -> Optional[dict]:
         """Join a group using join code"""
         db = self.get_db()
+        join_code = join_code.upper()
 
-        # Find group by join code
-        group = await db.groups.find_one({"joinCode": join_code.upper()})
-        if not group:
-            raise HTTPException(status_code=404, detail="Invalid join code")
+        now = datetime.now(timezone.utc)
+        new_member = await self._new_member(user_id, "member", now)
 
-        # Check if user is already a member
-        existing_member = next(
-            (m for m in group.get("members", []) if m["userId"] == user_id), None
+        # Only add the user if not a member yet, so concurrent joins can't
+        # add the same member twice
+        group = await db.groups.find_one_and_update(
+            {"joinCode": join_code, "members.userId": {"$ne": user_id}},
+            {
+                "$push": {"members": new_member},
+                "$inc": {"version": 1},
+                "$max": {"lastActivityAt": now},
+            },
+            return_document=ReturnDocument.AFTER,
         )
-        if existing_member:
+        if not group:
+            if not await db.groups.find_one({"joinCode": join_code}, {"_id": 1}):
+                raise HTTPException(status_code=404, detail="Invalid join code")
             raise HTTPException(
                 status_code=400, detail="You are already a member of this group"
             )
 
-        # Add user as member
-        new_member = {
-            "userId": user_id,
-            "role": "member",
-            "joinedAt": datetime.now(timezone.utc),
-        }
-
-        result = await db.groups.find_one_and_update(
-            {"_id": group["_id"]},
-            {"$push": {"members": new_member}},
-            return_document=True,
+        await record_changes(
+            db.changes,
+            group["_id"],
+            [
+                change(GROUP, group["_id"]),
+                change(MEMBERSHIP, group["_id"], UPSERT, [user_id]),
+            ],
         )
-        return self.transform_group_document(result)
+        return self.transform_group_document(group)
 
     async def leave_group(self, group_id: str, user_id: str) -> bool:
         """Leave a group (only if user has no outstanding balances)"""
@@ -354,8 +677,18 @@ class GroupService:
             )
 
         result = await db.groups.update_one(
-            {"_id": obj_id}, {"$pull": {"members": {"userId": user_id}}}
+            {"_id": obj_id},
+            {"$pull": {"members": {"userId": user_id}}, "$inc": {"version": 1}},
         )
+        if result.modified_count == 1:
+            await record_changes(
+                db.changes,
+                group_id,
+                [
+                    change(GROUP, group_id),
+                    change(MEMBERSHIP, group_id, DELETE, [user_id]),
+                ],
+            )
         return result.modified_count == 1
 
     async def get_group_members(self, group_id: str, user_id: str) -> List[dict]:
@@ -419,8 +752,10 @@ class GroupService:
 
         result = await db.groups.update_one(
             {"_id": obj_id, "members.userId": member_id},
-            {"$set": {"members.$.role": new_role}},
+            {"$set": {"members.$.role": new_role}, "$inc": {"version": 1}},
         )
+        if result.modified_count == 1:
+            await record_changes(db.changes, group_id, [change(GROUP, group_id)])
         return result.modified_count == 1
 
     async def remove_member(self, group_id: str, member_id: str, user_id: str) -> bool:
@@ -431,28 +766,17 @@ class GroupService:
         except Exception:
             return False
 
-        # Check if group exists and user is admin
-        group = await db.groups.find_one(
-            {
-                "_id": obj_id,
-                "members": {"$elemMatch": {"userId": user_id, "role": "admin"}},
-            }
-        )
+        # Check that the group exists, the user is an admin and the target a member
+        group = await db.groups.find_one({"_id": obj_id}, {"members": 1})
         if not group:
-            # Check if group exists at all
-            group_exists = await db.groups.find_one({"_id": obj_id})
-            if not group_exists:
-                raise HTTPException(status_code=404, detail="Group not found")
-            else:
-                raise HTTPException(
-                    status_code=403, detail="Only group admins can remove members"
-                )
+            raise HTTPException(status_code=404, detail="Group not found")
 
-        # Check if target member exists and is not the requesting user
-        target_member = next(
-            (m for m in group.get("members", []) if m["userId"] == member_id), None
-        )
-        if not target_member:
+        members = {m["userId"]: m for m in group.get("members", [])}
+        if members.get(user_id, {}).get("role") != "admin":
+            raise HTTPException(
+                status_code=403, detail="Only group admins can remove members"
+            )
+        if member_id not in members:
             raise HTTPException(status_code=404, detail="Member not found in group")
 
         if member_id == user_id:
@@ -485,10 +809,34 @@ class GroupService:
                 detail="Cannot remove member with unsettled balances. Please settle up first.",
             )
 
+        # Still conditional on the user being an admin, in case of a concurrent
+        # demotion since the check above
         result = await db.groups.update_one(
-            {"_id": obj_id}, {"$pull": {"members": {"userId": member_id}}}
+            {
+                "_id": obj_id,
+                "members": {"$elemMatch": {"userId": user_id, "role": "admin"}},
+                "members.userId": member_id,
+            },
+            {"$pull": {"members": {"userId": member_id}}, "$inc": {"version": 1}},
         )
+        if result.modified_count == 1:
+            await record_changes(
+                db.changes,
+                group_id,
+                [
+                    change(GROUP, group_id),
+                    change(MEMBERSHIP, group_id, DELETE, [member_id]),
+                ],
+            )
         return result.modified_count == 1
 
 
 group_service = GroupService()
+job_queue.register(
+    DELETE_GROUP_DATA, lambda job: group_service._delete_group_data(job["key"]), 2
+)
+job_queue.register(
+    REFRESH_MEMBER_PROFILE,
+    lambda job: group_service.refresh_member_profiles([job["key"]]),
+    2,
+)
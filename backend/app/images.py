@@ -0,0 +1,83 @@
+"""
+Image resizing used for receipt variants.
+
+These functions run inside the background process pool, so they only depend on
+Pillow and must stay importable without the rest of the application.
+"""
+
+import io
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+CONTENT_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+}
+
+
+@dataclass(frozen=True)
+class VariantSpec:
+    max_size: int  # Longest side in pixels; images are never upscaled
+    format: str  # Pillow format name
+    quality: int = 80
+
+
+@dataclass
+class ImageVariant:
+    data: bytes
+    width: int
+    height: int
+    content_type: str
+
+
+# Receipt variants generated for uploaded receipt images
+RECEIPT_VARIANTS: Dict[str, VariantSpec] = {
+    "thumbnail": VariantSpec(max_size=320, format="JPEG", quality=75),
+    "webp": VariantSpec(max_size=1600, format="WEBP", quality=80),
+}
+
+
+def resize_image(data: bytes, spec: VariantSpec) -> ImageVariant:
+    """Resize an encoded image to fit within `spec.max_size` and re-encode it"""
+    with Image.open(io.BytesIO(data)) as source:
+        return _encode_variant(ImageOps.exif_transpose(source), spec)
+
+
+def generate_variants(
+    data: bytes, specs: Dict[str, VariantSpec]
+) -> Dict[str, ImageVariant]:
+    """Generate every variant in `specs` from one decoded source image"""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+        return {
+            name: _encode_variant(image.copy(), spec) for name, spec in specs.items()
+        }
+
+
+def _encode_variant(image: Image.Image, spec: VariantSpec) -> ImageVariant:
+    """Shrink a decoded image (in place) to fit `spec` and encode it"""
+    image.thumbnail((spec.max_size, spec.max_size))
+    if spec.format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format=spec.format, quality=spec.quality)
+    return ImageVariant(
+        data=output.getvalue(),
+        width=image.width,
+        height=image.height,
+        content_type=CONTENT_TYPES[spec.format],
+    )
+
+
+def detect_content_type(data: bytes) -> Optional[str]:
+    """Identify a supported image format from its header, without decoding it"""
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return CONTENT_TYPES.get(image.format)
+    except Exception:
+        return None
@@ -0,0 +1,146 @@
+"""
+Cross-worker invalidation of process-local caches.
+
+Every write appends to the `changes` log (see `app/sync/changes.py`), and the
+worker that made the write dispatches the new entries to the registered caches
+right away. On a replica set, every worker also follows the log through a
+change stream, so writes handled by other workers reach its caches as well.
+The stream's resume token is kept across reconnects, so nothing is missed
+while the connection is down; if the oplog no longer reaches back that far,
+all caches are flushed instead.
+
+On a standalone server (no change streams), only the writing worker's caches
+are invalidated, which is exact for a single worker.
+"""
+
+import asyncio
+import inspect
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import logger
+from pymongo.errors import OperationFailure, PyMongoError
+
+# Server error codes
+NOT_A_REPLICA_SET = 40573
+CHANGE_STREAM_HISTORY_LOST = 286
+
+MAX_RECONNECT_DELAY = 30.0
+
+# Ids of recent local changes, whose echo from the change stream is skipped
+LOCAL_CHANGES_REMEMBERED = 10000
+
+# Handlers may be plain functions or coroutine functions
+ChangeHandler = Callable[[Dict[str, Any]], Optional[Awaitable[None]]]
+ResetHandler = Callable[[], Optional[Awaitable[None]]]
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._handlers: List[Tuple[ChangeHandler, ResetHandler]] = []
+        self._watcher: Optional[asyncio.Task] = None
+        self._local_ids: "OrderedDict[Any, None]" = OrderedDict()
+        self.resume_token: Optional[Dict[str, Any]] = None
+        self.mode = "local"
+        self.dispatched = 0
+        self.resets = 0
+
+    def subscribe(self, on_change: ChangeHandler, on_reset: ResetHandler) -> None:
+        """
+        Register a cache. `on_change` receives every change-log entry (with
+        `entity`, `entityId`, `op` and `groupId`); `on_reset` is called when
+        changes may have been missed and everything has to be dropped.
+        """
+        self._handlers.append((on_change, on_reset))
+
+    async def notify(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Dispatch changes made by this worker"""
+        for entry in entries:
+            if self.mode != "local":
+                self._local_ids[entry["_id"]] = None
+                if len(self._local_ids) > LOCAL_CHANGES_REMEMBERED:
+                    self._local_ids.popitem(last=False)
+            await self._dispatch(entry)
+
+    async def _dispatch(self, entry: Dict[str, Any]) -> None:
+        self.dispatched += 1
+        for on_change, _ in self._handlers:
+            try:
+                result = on_change(entry)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Cache invalidation handler failed: {e}")
+
+    async def _reset(self) -> None:
+        self.resets += 1
+        for _, on_reset in self._handlers:
+            try:
+                result = on_reset()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Cache reset handler failed: {e}")
+
+    def start(self, collection) -> None:
+        """Follow the change log of other workers through a change stream"""
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch(collection))
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        self._local_ids.clear()
+        self.mode = "local"
+
+    async def _watch(self, collection) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async with collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=self.resume_token,
+                ) as stream:
+                    self.mode = "changeStream"
+                    delay = 1.0
+                    async for event in stream:
+                        self.resume_token = event["_id"]
+                        entry = event["fullDocument"]
+                        if self._local_ids.pop(entry["_id"], False) is None:
+                            continue  # Already dispatched by notify
+                        await self._dispatch(entry)
+            except OperationFailure as e:
+                if e.code == NOT_A_REPLICA_SET:
+                    logger.info(
+                        "Change streams need a replica set, "
+                        "caches are only invalidated by local writes"
+                    )
+                    self.mode = "local"
+                    self._local_ids.clear()
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Change stream history lost, flushing caches")
+                    self.resume_token = None
+                    await self._reset()
+                    continue
+                logger.error(f"Change stream failed: {e}")
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted: {e}")
+
+            # Changes made while reconnecting are picked up via the resume token
+            self.mode = "reconnecting"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "caches": len(self._handlers),
+            "dispatched": self.dispatched,
+            "resets": self.resets,
+        }
+
+
+invalidation_bus = InvalidationBus()
@@ -0,0 +1,387 @@
+"""
+Durable background jobs, queued in the `jobs` collection.
+
+Work that must survive a restart (rename propagation, profile snapshot
+refreshes, receipt thumbnails, group data deletion, account purges) is
+enqueued here instead of being spawned. A job is identified
+by its type and a key (e.g. the user being renamed), so enqueueing a job that
+is already waiting is a no-op, and enqueueing one that is running makes it run
+once more after it finishes.
+
+Workers lease jobs with an atomic `find_one_and_update`, and keep the lease
+alive while a job runs. A job whose worker died becomes available again once
+its lease (`JOBS_VISIBILITY_TIMEOUT`) expires. Failed jobs are retried with
+exponential backoff, up to `JOBS_MAX_ATTEMPTS` attempts. Each job type runs at
+most `concurrency` jobs at a time per worker process.
+
+Workers run in the API processes (unless `JOBS_WORKERS_ENABLED` is off) or on
+their own with `python -m app.jobs`. Handlers must be idempotent: a job can be
+run again after a crash or an expired lease.
+"""
+
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from app.config import logger, settings
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Durations kept per job type for the latency metrics
+LATENCY_SAMPLES = 100
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+@dataclass
+class JobType:
+    handler: JobHandler
+    concurrency: int = 1
+    completed: int = 0
+    failed: int = 0
+    retried: int = 0
+    # Seconds from becoming due to being leased, and from lease to completion
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+    runs: Deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_SAMPLES))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(value: datetime) -> datetime:
+    # Dates come back from Mongo without a timezone
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _average(values: Deque[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 3) if values else None
+
+
+class JobQueue:
+    def __init__(self):
+        self._types: Dict[str, JobType] = {}
+        self._collection = None
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Dict[str, asyncio.Event] = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.depth: Dict[str, Dict[str, int]] = {}
+
+    def register(
+        self, job_type: str, handler: JobHandler, concurrency: int = 1
+    ) -> None:
+        """
+        Register the coroutine function that runs jobs of `job_type`. It is
+        called with the job document (`key`, `payload`, `attempts`, ...).
+        """
+        self._types[job_type] = JobType(handler, concurrency)
+
+    async def enqueue(
+        self,
+        collection,
+        job_type: str,
+        key: str,
+        payload: Optional[Dict[str, Any]] = None,
+        delay: float = 0,
+    ) -> None:
+        """
+        Queue a job, or have a running job with the same type and key run
+        again when it is done.
+        """
+        now = _utcnow()
+        job_id = f"{job_type}:{key}"
+        while True:
+            rerun = await collection.update_one(
+                {"_id": job_id, "status": RUNNING}, {"$set": {"rerun": True}}
+            )
+            if rerun.matched_count:
+                break
+            try:
+                await collection.update_one(
+                    {"_id": job_id, "status": {"$ne": RUNNING}},
+                    {
+                        "$set": {
+                            "status": QUEUED,
+                            "payload": payload or {},
+                            "attempts": 0,
+                            "runAt": now + timedelta(seconds=delay),
+                            "enqueuedAt": now,
+                            "error": None,
+                        },
+                        "$setOnInsert": {"type": job_type, "key": key},
+                    },
+                    upsert=True,
+                )
+                break
+            except DuplicateKeyError:
+                continue  # Leased in between, so mark the running job instead
+        if job_type in self._wakeup:
+            self._wakeup[job_type].set()
+
+    async def lease(self, collection, job_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Take the next due job of a type, or one whose worker's lease expired.
+        Returns None if there is nothing to do.
+        """
+        now = _utcnow()
+        return await collection.find_one_and_update(
+            {
+                "type": job_type,
+                "$or": [
+                    {"status": QUEUED, "runAt": {"$lte": now}},
+                    {"status": RUNNING, "leasedUntil": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": self.worker_id,
+                    "leasedUntil": now
+                    + timedelta(seconds=settings.jobs_visibility_timeout),
+                    "startedAt": now,
+                    "rerun": False,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("runAt", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def run(self, collection, job: Dict[str, Any]) -> None:
+        """Run a leased job and record its outcome"""
+        job_type = self._types[job["type"]]
+        started = _utcnow()
+        job_type.waits.append((started - _aware(job["runAt"])).total_seconds())
+        task = asyncio.create_task(job_type.handler(job))
+        heartbeat = asyncio.create_task(self._keep_leased(collection, job, task))
+        try:
+            await task
+        except asyncio.CancelledError:
+            if not heartbeat.done():
+                raise  # We are shutting down; the lease expires and it is retried
+            logger.warning(f"Job {job['_id']} lost its lease and was stopped")
+            return
+        except Exception as e:
+            await self._failed(collection, job, e)
+            return
+        finally:
+            heartbeat.cancel()
+        job_type.runs.append((_utcnow() - started).total_seconds())
+        job_type.completed += 1
+        await self._finished(collection, job)
+
+    async def _keep_leased(self, collection, job, task: asyncio.Task) -> None:
+        timeout = settings.jobs_visibility_timeout
+        while True:
+            await asyncio.sleep(timeout / 3)
+            result = await collection.update_one(
+                {"_id": job["_id"], "worker": self.worker_id, "status": RUNNING},
+                {"$set": {"leasedUntil": _utcnow() + timedelta(seconds=timeout)}},
+            )
+            if not result.matched_count:
+                # Another worker took the job over; don't run it twice
+                task.cancel()
+                return
+
+    async def _finished(self, collection, job) -> None:
+        mine = {"_id": job["_id"], "worker": self.worker_id, "status": RUNNING}
+        while True:
+            # Enqueued again while it ran
+            rerun = await collection.update_one(
+                {**mine, "rerun": True},
+                {
+                    "$set": {
+                        "status": QUEUED,
+                        "rerun": False,
+                        "attempts": 0,
+                        "runAt": _utcnow(),
+                    }
+                },
+            )
+            if rerun.matched_count:
+                return
+            done = await collection.update_one(
+                {**mine, "rerun": {"$ne": True}},
+                {"$set": {"status": DONE, "finishedAt": _utcnow(), "error": None}},
+            )
+            if done.matched_count or not await collection.count_documents(mine):
+                return
+
+    async def _failed(self, collection, job, error: Exception) -> None:
+        job_type = self._types[job["type"]]
+        attempts = job["attempts"]
+        update: Dict[str, Any] = {"error": str(error)}
+        if attempts >= settings.jobs_max_attempts:
+            job_type.failed += 1
+            update.update(status=FAILED, finishedAt=_utcnow())
+            logger.error(
+                f"Job {job['_id']} failed after {attempts} attempts: {error}",
+                exc_info=error,
+            )
+        else:
+            job_type.retried += 1
+            backoff = min(
+                settings.jobs_retry_base_delay * 2 ** (attempts - 1),
+                settings.jobs_retry_max_delay,
+            )
+            update.update(status=QUEUED, runAt=_utcnow() + timedelta(seconds=backoff))
+            logger.warning(
+                f"Job {job['_id']} failed (attempt {attempts}), "
+                f"retrying in {backoff:.0f}s: {error}"
+            )
+        await collection.update_one(
+            {"_id": job["_id"], "worker": self.worker_id}, {"$set": update}
+        )
+
+    async def run_pending(
+        self, collection, job_types: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Run due jobs of the given types (all registered types by default)
+        until none are left, including jobs those jobs enqueue. Used by
+        scripts and tests; returns the number of jobs run.
+        """
+        job_types = list(job_types or self._types)
+        count = 0
+        while True:
+            ran = False
+            for job_type in job_types:
+                job = await self.lease(collection, job_type)
+                if job:
+                    await self.run(collection, job)
+                    count += 1
+                    ran = True
+            if not ran:
+                return count
+
+    def start(self, collection) -> None:
+        """Start the worker tasks, `concurrency` per registered job type"""
+        self._collection = collection
+        for job_type, registered in self._types.items():
+            self._wakeup[job_type] = asyncio.Event()
+            for n in range(registered.concurrency):
+                self._workers.append(
+                    asyncio.create_task(
+                        self._work(job_type), name=f"jobs-{job_type}-{n}"
+                    )
+                )
+        self._workers.append(asyncio.create_task(self._sample_depth()))
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs they were running are picked up again by the
+        next worker once their lease runs out.
+        """
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._wakeup.clear()
+
+    async def _work(self, job_type: str) -> None:
+        wakeup = self._wakeup[job_type]
+        while True:
+            try:
+                job = await self.lease(self._collection, job_type)
+                if job:
+                    await self.run(self._collection, job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker for {job_type} failed: {e}")
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    wakeup.wait(), timeout=settings.jobs_poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sample_depth(self) -> None:
+        while True:
+            try:
+                self.depth = await self.queue_depth(self._collection)
+            except Exception as e:
+                logger.warning(f"Failed to sample the job queue depth: {e}")
+            await asyncio.sleep(settings.jobs_metrics_interval)
+
+    async def queue_depth(self, collection) -> Dict[str, Dict[str, int]]:
+        """Number of queued, running and failed jobs per type"""
+        depth: Dict[str, Dict[str, int]] = {}
+        async for row in collection.aggregate(
+            [
+                {"$match": {"status": {"$in": [QUEUED, RUNNING, FAILED]}}},
+                {
+                    "$group": {
+                        "_id": {"type": "$type", "status": "$status"},
+                        "count": {"$sum": 1},
+                    }
+                },
+            ]
+        ):
+            counts = depth.setdefault(row["_id"]["type"], {})
+            counts[row["_id"]["status"]] = row["count"]
+        return depth
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "types": {
+                name: {
+                    "concurrency": registered.concurrency,
+                    "completed": registered.completed,
+                    "failed": registered.failed,
+                    "retried": registered.retried,
+                    "avgWaitSeconds": _average(registered.waits),
+                    "avgRunSeconds": _average(registered.runs),
+                    **self.depth.get(name, {}),
+                }
+                for name, registered in self._types.items()
+            },
+        }
+
+
+job_queue = JobQueue()
+
+
+async def _main() -> None:
+    # Importing the services registers their job types with `app.jobs`. Under
+    # `python -m` this file also runs as `__main__`, a separate copy of the
+    # module, so the queue has to be taken from `app.jobs` rather than this one
+    import app.expenses.service  # noqa: F401
+    import app.groups.service  # noqa: F401
+    import app.user.service  # noqa: F401
+    from app.database import close_mongo_connection, connect_to_mongo, get_database
+    from app.jobs import job_queue as queue
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    await connect_to_mongo()
+    queue.start(get_database().jobs)
+    logger.info(f"Job worker {queue.worker_id} started")
+    try:
+        await stop.wait()
+    finally:
+        # Running jobs are cancelled and taken over once their lease expires
+        await queue.stop()
+        await close_mongo_connection()
+        logger.info(f"Job worker {queue.worker_id} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
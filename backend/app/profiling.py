@@ -0,0 +1,188 @@
+"""
+Per-request MongoDB command profiling.
+
+When `DB_PROFILING` is enabled, a pymongo command listener is attached to the
+Motor client and every command issued while handling a request is recorded
+against that request through a context variable. The profiling middleware then
+reports the number of commands and total database time in the response headers
+and logs any command slower than `DB_SLOW_QUERY_MS` together with its filter
+shape, which makes N+1 patterns easy to spot during development.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import logger, settings
+from pymongo import monitoring
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+
+# Command document keys that carry the query/filter of a command
+_FILTER_KEYS = ("filter", "query", "q", "pipeline", "updates", "deletes")
+
+
+@dataclass
+class CommandRecord:
+    name: str
+    collection: Optional[str]
+    duration_ms: float
+    shape: Any = None
+    failed: bool = False
+
+
+@dataclass
+class QueryProfile:
+    """Collects the database commands issued within one profiling scope"""
+
+    commands: List[CommandRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.commands)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(command.duration_ms for command in self.commands)
+
+    def slow_commands(self, threshold_ms: float) -> List[CommandRecord]:
+        return [c for c in self.commands if c.duration_ms >= threshold_ms]
+
+    def record(
+        self,
+        name: str,
+        collection: Optional[str],
+        duration_ms: float,
+        shape: Any = None,
+        failed: bool = False,
+    ) -> None:
+        self.commands.append(
+            CommandRecord(
+                name=name,
+                collection=collection,
+                duration_ms=duration_ms,
+                shape=shape,
+                failed=failed,
+            )
+        )
+
+
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar(
+    "db_query_profile", default=None
+)
+
+
+def get_current_profile() -> Optional[QueryProfile]:
+    """Return the profile of the current request, if profiling is active"""
+    return _current_profile.get()
+
+
+@contextmanager
+def profile_queries() -> Iterator[QueryProfile]:
+    """Record every database command issued inside the block"""
+    profile = QueryProfile()
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+
+
+def filter_shape(value: Any) -> Any:
+    """
+    Reduce a filter, pipeline or update document to its shape.
+
+    Field names and operators are kept while literal values are replaced by "?",
+    so that `{"groupId": "abc", "status": {"$in": ["a", "b"]}}` becomes
+    `{"groupId": "?", "status": {"$in": "?"}}` and queries can be grouped and
+    logged without leaking user data.
+    """
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [filter_shape(item) for item in value]
+        return "?"
+    return "?"
+
+
+def command_shape(command: Dict[str, Any]) -> Any:
+    """Extract the shape of the filter/pipeline carried by a command document"""
+    for key in _FILTER_KEYS:
+        if key in command:
+            return filter_shape(command[key])
+    return None
+
+
+class QueryProfiler(monitoring.CommandListener):
+    """
+    pymongo command listener feeding the active request's QueryProfile.
+
+    Motor executes pymongo calls on a thread pool but copies the caller's
+    context, so the context variable set by the middleware is visible here.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, Optional[str], Any]] = {}
+
+    def started(self, event):
+        if _current_profile.get() is None:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        self._pending[(event.connection_id, event.request_id)] = (
+            event.command_name,
+            collection if isinstance(collection, str) else None,
+            command_shape(command),
+        )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        started = self._pending.pop((event.connection_id, event.request_id), None)
+        profile = _current_profile.get()
+        if started is None or profile is None:
+            return
+        name, collection, shape = started
+        profile.record(
+            name, collection, event.duration_micros / 1000, shape=shape, failed=failed
+        )
+
+
+query_profiler = QueryProfiler()
+
+
+class QueryProfilingMiddleware(BaseHTTPMiddleware):
+    """Report per-request database usage in response headers and logs"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        with profile_queries() as profile:
+            response = await call_next(request)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+        response.headers[QUERY_COUNT_HEADER] = str(profile.count)
+        response.headers[QUERY_TIME_HEADER] = f"{profile.total_ms:.1f}"
+
+        logger.info(
+            f"DB profile for {request.method} {request.url.path}: "
+            f"{profile.count} commands, {profile.total_ms:.1f}ms in database, "
+            f"{elapsed_ms:.1f}ms total"
+        )
+        for command in profile.slow_commands(settings.db_slow_query_ms):
+            logger.warning(
+                f"Slow DB command during {request.method} {request.url.path}: "
+                f"{command.name} on {command.collection} took "
+                f"{command.duration_ms:.1f}ms, shape={command.shape}"
+            )
+
+        return response
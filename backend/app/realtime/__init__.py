@@ -0,0 +1,58 @@
+# Real-time group events pushed to connected clients
+from typing import Optional
+
+from app.config import settings
+
+from .base import Broker, Event
+from .bus import EventBus, Subscription
+from .local import LocalBroker
+from .redis import RedisBroker
+
+_bus: Optional[EventBus] = None
+
+
+def create_broker(backend: str) -> Broker:
+    """Build the broker selected by `REALTIME_BROKER`"""
+    if backend == "local":
+        return LocalBroker()
+    if backend == "redis":
+        if not settings.realtime_redis_url:
+            raise RuntimeError("REALTIME_REDIS_URL is required for the redis broker")
+        return RedisBroker(settings.realtime_redis_url)
+    raise RuntimeError(f"Unknown realtime broker: {backend}")
+
+
+def get_bus() -> EventBus:
+    """Return the process-wide event bus, creating it on first use"""
+    global _bus
+    if _bus is None:
+        _bus = EventBus(
+            create_broker(settings.realtime_broker),
+            queue_size=settings.realtime_queue_size,
+        )
+    return _bus
+
+
+async def start() -> None:
+    await get_bus().broker.start()
+
+
+async def shutdown() -> None:
+    global _bus
+    if _bus is not None:
+        await _bus.broker.close()
+        _bus = None
+
+
+__all__ = [
+    "Broker",
+    "Event",
+    "EventBus",
+    "LocalBroker",
+    "RedisBroker",
+    "Subscription",
+    "create_broker",
+    "get_bus",
+    "shutdown",
+    "start",
+]
@@ -0,0 +1,26 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict
+
+Event = Dict[str, Any]
+Deliver = Callable[[Event], None]
+
+
+class Broker(ABC):
+    """
+    Carries events between the event buses of all workers.
+
+    Every published event is handed to the `deliver` callback of every
+    worker's bus, including the one that published it.
+    """
+
+    def attach(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+
+    async def start(self) -> None:
+        """Start receiving events published by other workers"""
+
+    async def close(self) -> None:
+        """Stop receiving events and release connections"""
+
+    @abstractmethod
+    async def publish(self, event: Event) -> None: ...
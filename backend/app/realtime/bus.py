@@ -0,0 +1,129 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Set
+
+from app.config import logger
+from app.realtime.base import Broker, Event
+
+# Event types (`<entity>.<op>` of the change log) that change who receives what
+MEMBER_JOINED = "membership.upsert"
+MEMBER_LEFT = "membership.delete"
+GROUP_DELETED = "group.delete"
+
+# Sent in place of the events a slow connection missed
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """
+    Events of a user's groups, buffered in a bounded queue for one connection.
+
+    When the connection falls behind and the queue fills up, the buffered
+    events are dropped and replaced by a single `resync` event, telling the
+    client to catch up through `GET /sync` instead of blocking publishers.
+    """
+
+    def __init__(self, bus: "EventBus", user_id: str, group_ids: Iterable[str]):
+        self.bus = bus
+        self.user_id = user_id
+        self.group_ids: Set[str] = set(group_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=bus.queue_size)
+        self.dropped = 0
+
+    def offer(self, event: Event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.bus.overflows += 1
+
+    async def get(self) -> Event:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process pub/sub of group events for connected clients.
+
+    Events are published through the broker, which delivers them to the bus
+    of every worker; each bus then routes them to its own subscriptions of the
+    event's group. Membership events also carry the affected users, so joining
+    a group subscribes a user's open connections to it and leaving (or the
+    group being deleted) unsubscribes them after the event was delivered.
+    """
+
+    def __init__(self, broker: Broker, queue_size: int = 100):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.overflows = 0
+        self._by_group: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._by_user: Dict[str, Set[Subscription]] = defaultdict(set)
+        broker.attach(self._deliver)
+
+    def subscribe(self, user_id: str, group_ids: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, user_id, group_ids)
+        self._by_user[user_id].add(subscription)
+        for group_id in subscription.group_ids:
+            self._by_group[group_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._discard(self._by_user, subscription.user_id, subscription)
+        for group_id in subscription.group_ids:
+            self._discard(self._by_group, group_id, subscription)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[Subscription]], key: str, subscription):
+        subscribers = index.get(key)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del index[key]
+
+    async def publish(self, event: Event) -> None:
+        """Publish an event to all workers, logging instead of raising on failure"""
+        try:
+            await self.broker.publish(event)
+        except Exception as e:
+            logger.error(f"Failed to publish realtime event {event.get('type')}: {e}")
+
+    def _deliver(self, event: Event) -> None:
+        group_id = event["groupId"]
+        user_ids = event.get("userIds", [])
+
+        if event["type"] == MEMBER_JOINED:
+            for user_id in user_ids:
+                for subscription in self._by_user.get(user_id, ()):
+                    subscription.group_ids.add(group_id)
+                    self._by_group[group_id].add(subscription)
+
+        recipients = set(self._by_group.get(group_id, ()))
+        for user_id in user_ids:
+            recipients |= self._by_user.get(user_id, set())
+        for subscription in recipients:
+            subscription.offer(event)
+
+        if event["type"] == MEMBER_LEFT:
+            leaving = [
+                s for user_id in user_ids for s in self._by_user.get(user_id, ())
+            ]
+        elif event["type"] == GROUP_DELETED:
+            leaving = list(self._by_group.get(group_id, ()))
+        else:
+            return
+        for subscription in leaving:
+            subscription.group_ids.discard(group_id)
+            self._discard(self._by_group, group_id, subscription)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "connections": sum(len(subs) for subs in self._by_user.values()),
+            "groups": len(self._by_group),
+            "overflows": self.overflows,
+        }
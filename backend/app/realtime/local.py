@@ -0,0 +1,11 @@
+from app.realtime.base import Broker, Event
+
+
+class LocalBroker(Broker):
+    """
+    Delivers events within the current process only. Enough for a single
+    worker (and for tests); multiple workers need a shared broker.
+    """
+
+    async def publish(self, event: Event) -> None:
+        self.deliver(event)
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from typing import Any, Optional
+
+from app.config import logger
+from app.realtime.base import Broker, Event
+
+CHANNEL = "splitwiser:events"
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+
+class RedisBroker(Broker):
+    """
+    Fans events out to every worker through a Redis pub/sub channel.
+    `redis` is only required when this broker is configured.
+
+    When the pub/sub connection drops, the listener resubscribes with
+    exponential backoff. Pub/sub keeps no history, so events published while
+    it is down are not delivered to this worker's connections.
+    """
+
+    def __init__(self, url: str, client: Any = None, channel: str = CHANNEL):
+        if client is None:
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise RuntimeError(
+                    "The redis realtime broker requires redis (pip install redis)"
+                )
+            client = redis.from_url(url)
+        self.client = client
+        self.channel = channel
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub) -> None:
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = self.client.pubsub()
+                    await pubsub.subscribe(self.channel)
+                    logger.info("Realtime subscription restored")
+                    delay = RECONNECT_DELAY
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        self.deliver(json.loads(message["data"]))
+                    except Exception as e:
+                        logger.error(f"Failed to deliver realtime event: {e}")
+                logger.warning("Realtime subscription ended")
+            except Exception as e:
+                logger.warning(f"Realtime subscription interrupted: {e}")
+            finally:
+                if pubsub is not None:
+                    await asyncio.gather(pubsub.close(), return_exceptions=True)
+                    pubsub = None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    async def publish(self, event: Event) -> None:
+        await self.client.publish(self.channel, json.dumps(event))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self.client.close()
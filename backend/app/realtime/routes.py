@@ -0,0 +1,68 @@
+import asyncio
+
+from app.auth.security import verify_token
+from app.config import logger, settings
+from app.groups.service import group_service
+from app.realtime import get_bus
+from app.realtime.bus import Subscription
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+
+router = APIRouter(tags=["Realtime"])
+
+HEARTBEAT = {"type": "ping"}
+
+
+@router.websocket("/ws")
+async def group_events(websocket: WebSocket, token: str = Query(...)):
+    """
+    Push events of the user's groups (expense, settlement, group and
+    membership changes) as JSON messages. Browsers cannot set headers on
+    WebSocket requests, so the access token is passed as a query parameter.
+    """
+    try:
+        user_id = verify_token(token).get("sub")
+    except HTTPException:
+        user_id = None
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    groups = await group_service.get_user_groups(user_id)
+    await websocket.accept()
+    subscription = get_bus().subscribe(user_id, [group["_id"] for group in groups])
+    sender = asyncio.create_task(_send_events(websocket, subscription))
+    try:
+        # Messages from the client are not used, but reading them is how a
+        # disconnect is noticed while there are no events to send
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+        if subscription.dropped:
+            logger.info(
+                f"Realtime connection of user {user_id} dropped "
+                f"{subscription.dropped} events"
+            )
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription) -> None:
+    """Forward queued events, sending a heartbeat whenever the group is quiet"""
+    while True:
+        try:
+            event = await asyncio.wait_for(
+                subscription.get(), timeout=settings.realtime_heartbeat_seconds
+            )
+        except asyncio.TimeoutError:
+            event = HEARTBEAT
+        await websocket.send_json(event)
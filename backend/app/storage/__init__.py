@@ -0,0 +1,61 @@
+# Blob storage module
+from typing import Optional
+
+from app.config import settings
+from app.database import get_database
+
+from .base import (
+    BlobNotFoundError,
+    BlobStorage,
+    BlobTooLargeError,
+    StoredBlob,
+    is_valid_key,
+)
+from .gridfs import GridFSBlobStorage
+from .local import LocalBlobStorage
+from .responses import blob_response
+from .s3 import S3BlobStorage
+
+_storage: Optional[BlobStorage] = None
+
+
+def create_storage(backend: str) -> BlobStorage:
+    """Build the blob storage backend selected by `STORAGE_BACKEND`"""
+    if backend == "local":
+        return LocalBlobStorage(settings.storage_local_path)
+    if backend == "gridfs":
+        return GridFSBlobStorage(get_database)
+    if backend == "s3":
+        if not settings.storage_s3_bucket:
+            raise RuntimeError("STORAGE_S3_BUCKET is required for the s3 backend")
+        return S3BlobStorage(
+            settings.storage_s3_bucket,
+            endpoint_url=settings.storage_s3_endpoint_url,
+            aws_access_key_id=settings.storage_s3_access_key_id,
+            aws_secret_access_key=settings.storage_s3_secret_access_key,
+            region_name=settings.storage_s3_region,
+        )
+    raise RuntimeError(f"Unknown storage backend: {backend}")
+
+
+def get_storage() -> BlobStorage:
+    """Return the process-wide blob storage, creating it on first use"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage(settings.storage_backend)
+    return _storage
+
+
+__all__ = [
+    "BlobNotFoundError",
+    "BlobStorage",
+    "BlobTooLargeError",
+    "GridFSBlobStorage",
+    "LocalBlobStorage",
+    "S3BlobStorage",
+    "StoredBlob",
+    "blob_response",
+    "create_storage",
+    "get_storage",
+    "is_valid_key",
+]
@@ -0,0 +1,117 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+# Size of the chunks read from uploads and written to/read from backends
+CHUNK_SIZE = 256 * 1024
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_valid_key(key: str) -> bool:
+    """Blob keys are SHA-256 hex digests; anything else is never stored"""
+    return bool(key) and _KEY_PATTERN.match(key) is not None
+
+
+class BlobNotFoundError(Exception):
+    """Raised when a blob key does not exist in the storage backend"""
+
+
+class BlobTooLargeError(Exception):
+    """Raised while streaming an upload once it exceeds the allowed size"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Blob exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class StoredBlob:
+    key: str  # SHA-256 hex digest of the content
+    size: int
+    deduplicated: bool = False  # True if identical content was already stored
+
+
+class BlobStorage(ABC):
+    """
+    Content-addressed blob storage.
+
+    Blobs are streamed into a temporary location while being hashed and
+    size-checked, then committed under their SHA-256 digest. Uploading content
+    that already exists discards the temporary copy, so identical files are
+    stored once. Backends implement the temp/commit primitives and ranged reads.
+    """
+
+    async def put(
+        self, chunks: AsyncIterator[bytes], max_bytes: Optional[int] = None
+    ) -> StoredBlob:
+        """Stream `chunks` into storage without buffering the whole blob"""
+        hasher = hashlib.sha256()
+        size = 0
+
+        async def hashed_chunks():
+            nonlocal size
+            async for chunk in chunks:
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise BlobTooLargeError(max_bytes)
+                hasher.update(chunk)
+                yield chunk
+
+        temp = await self._write_temp(hashed_chunks())
+        try:
+            key = hasher.hexdigest()
+            if await self.exists(key):
+                await self._discard_temp(temp)
+                return StoredBlob(key=key, size=size, deduplicated=True)
+            await self._commit_temp(temp, key)
+        except BaseException:
+            await self._discard_temp(temp)
+            raise
+        return StoredBlob(key=key, size=size)
+
+    async def put_bytes(self, data: bytes) -> StoredBlob:
+        """Store an in-memory blob (e.g. a generated thumbnail)"""
+
+        async def single_chunk():
+            yield data
+
+        return await self.put(single_chunk())
+
+    @abstractmethod
+    async def _write_temp(self, chunks: AsyncIterator[bytes]) -> Any:
+        """Write all chunks to a temporary location and return a handle to it.
+
+        Implementations must clean up after themselves if `chunks` raises."""
+
+    @abstractmethod
+    async def _commit_temp(self, temp: Any, key: str) -> None:
+        """Move a temporary blob to its final content key"""
+
+    @abstractmethod
+    async def _discard_temp(self, temp: Any) -> None:
+        """Remove a temporary blob; must be a no-op if it is already gone"""
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """Return whether a blob is stored under `key`"""
+
+    @abstractmethod
+    async def size(self, key: str) -> int:
+        """Return the blob size in bytes, raising BlobNotFoundError if missing"""
+
+    @abstractmethod
+    def read(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream bytes `start` to `end` (inclusive) of a blob in chunks"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a blob; deleting a missing blob is not an error"""
+
+    async def read_all(self, key: str) -> bytes:
+        """Read a whole blob into memory - only for small blobs such as images"""
+        return b"".join([chunk async for chunk in self.read(key)])
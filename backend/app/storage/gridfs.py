@@ -0,0 +1,145 @@
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from app.storage.base import BlobNotFoundError, BlobStorage
+from bson import Binary, ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Default GridFS chunk size (255 KiB)
+GRIDFS_CHUNK_SIZE = 255 * 1024
+
+
+class GridFSBlobStorage(BlobStorage):
+    """
+    Stores blobs in MongoDB using the GridFS collection layout.
+
+    Documents are written to `<bucket>.files` / `<bucket>.chunks` exactly as
+    GridFS does (so standard GridFS tooling can read them), but through plain
+    collection operations so that a ranged read only fetches the chunks that
+    cover the requested bytes.
+    """
+
+    def __init__(
+        self,
+        get_database: Callable,
+        bucket: str = "blobs",
+        chunk_size: int = GRIDFS_CHUNK_SIZE,
+    ):
+        self._get_database = get_database
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+
+    @property
+    def files(self):
+        return self._get_database()[f"{self.bucket}.files"]
+
+    @property
+    def chunks(self):
+        return self._get_database()[f"{self.bucket}.chunks"]
+
+    async def _write_temp(self, chunks: AsyncIterator[bytes]) -> Tuple[ObjectId, int]:
+        temp_id = ObjectId()
+        buffer = bytearray()
+        chunk_number = 0
+        length = 0
+        try:
+            async for data in chunks:
+                buffer.extend(data)
+                length += len(data)
+                while len(buffer) >= self.chunk_size:
+                    await self._insert_chunk(
+                        temp_id, chunk_number, bytes(buffer[: self.chunk_size])
+                    )
+                    del buffer[: self.chunk_size]
+                    chunk_number += 1
+            if buffer:
+                await self._insert_chunk(temp_id, chunk_number, bytes(buffer))
+        except BaseException:
+            await self._discard_temp((temp_id, length))
+            raise
+        return temp_id, length
+
+    async def _insert_chunk(self, files_id, n: int, data: bytes) -> None:
+        await self.chunks.insert_one(
+            {"files_id": files_id, "n": n, "data": Binary(data)}
+        )
+
+    async def _commit_temp(self, temp: Tuple[ObjectId, int], key: str) -> None:
+        """
+        Move the chunks under the key first and insert the files document
+        last: a blob only exists (for reads and deduplication) once all of its
+        chunks are in place, even if the process stops halfway.
+        """
+        temp_id, length = temp
+        try:
+            await self.chunks.update_many(
+                {"files_id": temp_id}, {"$set": {"files_id": key}}
+            )
+        except DuplicateKeyError:
+            # Chunks of the same content are already there, left by a
+            # concurrent or interrupted commit; fill in the missing ones
+            await self._merge_chunks(temp_id, key)
+        try:
+            await self.files.insert_one(
+                {
+                    "_id": key,
+                    "length": length,
+                    "chunkSize": self.chunk_size,
+                    "uploadDate": datetime.now(timezone.utc),
+                    "filename": key,
+                }
+            )
+        except DuplicateKeyError:
+            pass  # The same content was committed concurrently
+
+    async def _merge_chunks(self, temp_id: ObjectId, key: str) -> None:
+        # Chunks with the same key and number hold the same bytes
+        async for chunk in self.chunks.find({"files_id": temp_id}, {"n": 1}):
+            try:
+                await self.chunks.update_one(
+                    {"_id": chunk["_id"]}, {"$set": {"files_id": key}}
+                )
+            except DuplicateKeyError:
+                await self.chunks.delete_one({"_id": chunk["_id"]})
+
+    async def _discard_temp(self, temp: Tuple[ObjectId, int]) -> None:
+        temp_id, _ = temp
+        await self.chunks.delete_many({"files_id": temp_id})
+
+    async def exists(self, key: str) -> bool:
+        return await self.files.find_one({"_id": key}, {"_id": 1}) is not None
+
+    async def size(self, key: str) -> int:
+        file_doc = await self.files.find_one({"_id": key}, {"length": 1})
+        if not file_doc:
+            raise BlobNotFoundError(key)
+        return file_doc["length"]
+
+    async def read(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        file_doc = await self.files.find_one({"_id": key})
+        if not file_doc:
+            raise BlobNotFoundError(key)
+        length = file_doc["length"]
+        if end is None or end >= length:
+            end = length - 1
+        if length == 0 or start > end:
+            return
+
+        chunk_size = file_doc["chunkSize"]
+        first_n = start // chunk_size
+        last_n = end // chunk_size
+        cursor = self.chunks.find(
+            {"files_id": key, "n": {"$gte": first_n, "$lte": last_n}}
+        ).sort("n", 1)
+        async for chunk in cursor:
+            data = bytes(chunk["data"])
+            offset = chunk["n"] * chunk_size
+            lower = max(start - offset, 0)
+            upper = min(end - offset + 1, len(data))
+            yield data[lower:upper]
+
+    async def delete(self, key: str) -> None:
+        await self.files.delete_one({"_id": key})
+        await self.chunks.delete_many({"files_id": key})
@@ -0,0 +1,181 @@
+"""
+Images embedded in user and group documents.
+
+Clients may send `imageUrl` as a `data:image/...;base64,...` URL. Storing those
+inline makes every user/group read carry hundreds of KB, so they are decoded
+into blob storage instead and replaced by a short, content-addressed URL served
+by `GET /images/{key}.{ext}`.
+
+List views only need small avatars, so `GET /images/{key}.{ext}?size=64`
+serves resized variants. They are generated in the background process pool
+and cached on disk under `IMAGE_CACHE_PATH`, keyed by content hash and size.
+"""
+
+import asyncio
+import base64
+import binascii
+import os
+import re
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from app.background import run_in_process
+from app.config import logger, settings
+from app.images import VariantSpec, detect_content_type, resize_image
+from app.storage import get_storage
+from fastapi import HTTPException
+
+IMAGE_URL_PREFIX = "/images/"
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+CONTENT_TYPES_BY_EXTENSION = {ext: ctype for ctype, ext in IMAGE_EXTENSIONS.items()}
+
+# Variant sizes (longest side in pixels); requested sizes are rounded up to one
+VARIANT_SIZES = (32, 64, 128, 256, 512, 1024)
+MEMBER_IMAGE_SIZE = 64  # Group members, friends list, group list
+PROFILE_IMAGE_SIZE = 256
+# Pillow formats used for variants; animated GIFs become a still PNG
+VARIANT_FORMATS = {
+    "image/jpeg": ("JPEG", "image/jpeg"),
+    "image/png": ("PNG", "image/png"),
+    "image/gif": ("PNG", "image/png"),
+    "image/webp": ("WEBP", "image/webp"),
+}
+
+_variants_in_progress: Dict[Tuple[str, int], asyncio.Future] = {}
+
+_DATA_URL_RE = re.compile(r"^data:([\w/.+-]*)(?:;[\w=.+-]+)*;base64,", re.IGNORECASE)
+
+
+def is_data_url(value: Optional[str]) -> bool:
+    return isinstance(value, str) and value[:5].lower() == "data:"
+
+
+def decode_data_url(value: str) -> bytes:
+    """Decode a base64 data URL, raising ValueError if it is malformed"""
+    match = _DATA_URL_RE.match(value)
+    if not match:
+        raise ValueError("Only base64 data URLs are supported")
+    try:
+        return base64.b64decode(value[match.end() :], validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 image data")
+
+
+def image_url(key: str, content_type: str) -> str:
+    return f"{IMAGE_URL_PREFIX}{key}.{IMAGE_EXTENSIONS[content_type]}"
+
+
+async def store_image(data: bytes) -> str:
+    """Store an encoded image and return its content-addressed URL"""
+    if len(data) > settings.image_max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image exceeds the maximum size of {settings.image_max_bytes} bytes",
+        )
+    # The declared type is not trusted; the image header decides
+    content_type = detect_content_type(data)
+    if content_type not in IMAGE_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported or invalid image")
+    blob = await get_storage().put_bytes(data)
+    return image_url(blob.key, content_type)
+
+
+async def externalize_image_url(value: Optional[str]) -> Optional[str]:
+    """Move an inline data URL image into blob storage; other values pass through"""
+    if not is_data_url(value):
+        return value
+    try:
+        data = decode_data_url(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await store_image(data)
+
+
+def is_stored_image_url(value: Optional[str]) -> bool:
+    return isinstance(value, str) and value.startswith(IMAGE_URL_PREFIX)
+
+
+def variant_size(size: int) -> int:
+    """Round a requested size up to the nearest supported variant size"""
+    for candidate in VARIANT_SIZES:
+        if size <= candidate:
+            return candidate
+    return VARIANT_SIZES[-1]
+
+
+def image_variant_url(value: Optional[str], size: int) -> Optional[str]:
+    """URL of a resized variant for stored images; external URLs pass through"""
+    if not is_stored_image_url(value) or "?" in value:
+        return value
+    return f"{value}?size={variant_size(size)}"
+
+
+def _variant_path(key: str, size: int, content_type: str) -> str:
+    extension = IMAGE_EXTENSIONS[VARIANT_FORMATS[content_type][1]]
+    return os.path.join(settings.image_cache_path, key[:2], f"{key}-{size}.{extension}")
+
+
+def _write_file(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+async def get_image_variant(key: str, content_type: str, size: int) -> Tuple[str, str]:
+    """
+    Return the cached file path and content type of a resized image variant,
+    generating it first if needed. Concurrent requests for the same variant
+    share one generation. Raises BlobNotFoundError if the image is unknown.
+    """
+    size = variant_size(size)
+    path = _variant_path(key, size, content_type)
+    variant_type = VARIANT_FORMATS[content_type][1]
+    if await asyncio.to_thread(os.path.exists, path):
+        return path, variant_type
+
+    in_progress = _variants_in_progress.get((key, size))
+    if in_progress is not None:
+        await asyncio.shield(in_progress)
+        return path, variant_type
+
+    future = asyncio.get_running_loop().create_future()
+    _variants_in_progress[(key, size)] = future
+    try:
+        data = await get_storage().read_all(key)
+        variant = await run_in_process(
+            resize_image, data, VariantSpec(size, VARIANT_FORMATS[content_type][0])
+        )
+        await asyncio.to_thread(_write_file, path, variant.data)
+        future.set_result(path)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters see the error; nobody else needs to retrieve it
+        future.exception()
+        raise
+    finally:
+        del _variants_in_progress[(key, size)]
+    return path, variant_type
+
+
+async def warm_image_variants(url: str, sizes: Iterable[int]) -> None:
+    """Pre-generate variants of a stored image so first requests are fast"""
+    key, _, extension = url[len(IMAGE_URL_PREFIX) :].partition(".")
+    content_type = CONTENT_TYPES_BY_EXTENSION.get(extension)
+    if not content_type:
+        return
+    for size in sizes:
+        try:
+            await get_image_variant(key, content_type, size)
+        except Exception as e:
+            logger.warning(f"Could not generate {size}px variant of {url}: {e}")
+            return
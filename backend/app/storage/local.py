@@ -0,0 +1,82 @@
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from app.storage.base import (
+    CHUNK_SIZE,
+    BlobNotFoundError,
+    BlobStorage,
+    is_valid_key,
+)
+
+
+class LocalBlobStorage(BlobStorage):
+    """Stores blobs as files under `root`, sharded by the first digest bytes"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+
+    def path_for(self, key: str) -> Path:
+        # Keys end up in file paths, so never accept anything but a digest
+        if not is_valid_key(key):
+            raise BlobNotFoundError(key)
+        return self.root / key[:2] / key[2:4] / key
+
+    async def _write_temp(self, chunks: AsyncIterator[bytes]) -> Path:
+        await asyncio.to_thread(self.tmp_dir.mkdir, parents=True, exist_ok=True)
+        temp_path = self.tmp_dir / uuid.uuid4().hex
+        handle = await asyncio.to_thread(open, temp_path, "wb")
+        try:
+            async for chunk in chunks:
+                await asyncio.to_thread(handle.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await self._discard_temp(temp_path)
+            raise
+        await asyncio.to_thread(handle.close)
+        return temp_path
+
+    async def _commit_temp(self, temp: Path, key: str) -> None:
+        final_path = self.path_for(key)
+        await asyncio.to_thread(final_path.parent.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(os.replace, temp, final_path)
+
+    async def _discard_temp(self, temp: Path) -> None:
+        await asyncio.to_thread(temp.unlink, missing_ok=True)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self.path_for(key).is_file)
+
+    async def size(self, key: str) -> int:
+        try:
+            stat = await asyncio.to_thread(self.path_for(key).stat)
+        except FileNotFoundError:
+            raise BlobNotFoundError(key)
+        return stat.st_size
+
+    async def read(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        try:
+            handle = await asyncio.to_thread(open, self.path_for(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFoundError(key)
+        try:
+            await asyncio.to_thread(handle.seek, start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+                chunk = await asyncio.to_thread(handle.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(handle.close)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.path_for(key).unlink, missing_ok=True)
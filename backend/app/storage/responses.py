@@ -0,0 +1,105 @@
+from typing import Optional, Tuple
+
+from app.storage.base import BlobStorage
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+
+def etag_for(key: str) -> str:
+    """Blob keys are content digests, so they make strong validators"""
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as required for If-None-Match
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+
+    Returns None when the header is absent or malformed (the full body is then
+    served) and raises a 416 HTTPException when the range cannot be satisfied.
+    Multi-range requests are answered with the full body.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes=") :].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if first == "":
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+async def blob_response(
+    request: Request,
+    storage: BlobStorage,
+    key: str,
+    *,
+    content_type: str = "application/octet-stream",
+    size: Optional[int] = None,
+    filename: Optional[str] = None,
+    cache_control: str = "private, max-age=3600",
+) -> Response:
+    """
+    Stream a stored blob with ETag revalidation and single-range support.
+
+    Raises BlobNotFoundError if the blob is missing from the backend.
+    """
+    etag = etag_for(key)
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    if size is None:
+        size = await storage.size(key)
+    if filename:
+        safe_name = filename.replace('"', "").replace("\r", "").replace("\n", "")
+        headers["Content-Disposition"] = f'inline; filename="{safe_name}"'
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(
+            storage.read(key), media_type=content_type, headers=headers
+        )
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        storage.read(key, start, end),
+        status_code=206,
+        media_type=content_type,
+        headers=headers,
+    )
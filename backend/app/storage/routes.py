@@ -0,0 +1,49 @@
+from typing import Optional
+
+from app.config import logger
+from app.storage import BlobNotFoundError, blob_response, get_storage, is_valid_key
+from app.storage.images import (
+    CONTENT_TYPES_BY_EXTENSION,
+    get_image_variant,
+    variant_size,
+)
+from app.storage.responses import etag_matches
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse
+
+router = APIRouter(prefix="/images", tags=["Images"])
+
+# Image URLs are content addressed, so their content never changes
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/{filename}")
+async def get_image(
+    filename: str,
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, le=4096),
+):
+    """Serve a user or group image by its content-addressed URL, optionally resized"""
+    key, _, extension = filename.partition(".")
+    content_type = CONTENT_TYPES_BY_EXTENSION.get(extension.lower())
+    if not is_valid_key(key) or not content_type:
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        if size is None:
+            return await blob_response(
+                request,
+                get_storage(),
+                key,
+                content_type=content_type,
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+            )
+
+        etag = f'"{key}-{variant_size(size)}"'
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        path, variant_type = await get_image_variant(key, content_type, size)
+        return FileResponse(path, media_type=variant_type, headers=headers)
+    except BlobNotFoundError:
+        logger.warning(f"Image {filename} not found in blob storage")
+        raise HTTPException(status_code=404, detail="Image not found")
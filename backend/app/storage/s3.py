@@ -0,0 +1,146 @@
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Optional
+
+from app.storage.base import CHUNK_SIZE, BlobNotFoundError, BlobStorage
+
+# S3 multipart uploads need parts of at least 5 MiB (except the last one)
+PART_SIZE = 8 * 1024 * 1024
+
+
+def _is_not_found(error: Exception) -> bool:
+    code = getattr(error, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class S3BlobStorage(BlobStorage):
+    """
+    Stores blobs in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    Uploads go to a temporary key through a multipart upload, holding at most
+    one part in memory, and are then copied server-side to the content key.
+    `boto3` is only required when this backend is configured.
+    """
+
+    def __init__(self, bucket: str, client: Any = None, prefix: str = "", **config):
+        if client is None:
+            try:
+                import boto3
+            except ImportError:
+                raise RuntimeError(
+                    "The S3 storage backend requires boto3 (pip install boto3)"
+                )
+            client = boto3.client("s3", **config)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def _call(self, method: str, **kwargs):
+        return await asyncio.to_thread(getattr(self.client, method), **kwargs)
+
+    async def _write_temp(self, chunks: AsyncIterator[bytes]) -> str:
+        temp_key = self._object_key(f"tmp/{uuid.uuid4().hex}")
+        upload = await self._call(
+            "create_multipart_upload", Bucket=self.bucket, Key=temp_key
+        )
+        upload_id = upload["UploadId"]
+        parts = []
+        buffer = bytearray()
+
+        async def flush():
+            part = await self._call(
+                "upload_part",
+                Bucket=self.bucket,
+                Key=temp_key,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=bytes(buffer),
+            )
+            parts.append({"ETag": part["ETag"], "PartNumber": len(parts) + 1})
+            buffer.clear()
+
+        try:
+            async for chunk in chunks:
+                buffer.extend(chunk)
+                if len(buffer) >= PART_SIZE:
+                    await flush()
+            if buffer or not parts:
+                await flush()
+            await self._call(
+                "complete_multipart_upload",
+                Bucket=self.bucket,
+                Key=temp_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await self._call(
+                "abort_multipart_upload",
+                Bucket=self.bucket,
+                Key=temp_key,
+                UploadId=upload_id,
+            )
+            raise
+        return temp_key
+
+    async def _commit_temp(self, temp: str, key: str) -> None:
+        await self._call(
+            "copy_object",
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            CopySource={"Bucket": self.bucket, "Key": temp},
+        )
+        await self._discard_temp(temp)
+
+    async def _discard_temp(self, temp: str) -> None:
+        await self._call("delete_object", Bucket=self.bucket, Key=temp)
+
+    async def _head(self, key: str) -> Optional[dict]:
+        try:
+            return await self._call(
+                "head_object", Bucket=self.bucket, Key=self._object_key(key)
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                return None
+            raise
+
+    async def exists(self, key: str) -> bool:
+        return await self._head(key) is not None
+
+    async def size(self, key: str) -> int:
+        head = await self._head(key)
+        if head is None:
+            raise BlobNotFoundError(key)
+        return head["ContentLength"]
+
+    async def read(
+        self, key: str, start: int = 0, end: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        byte_range = f"bytes={start}-" if end is None else f"bytes={start}-{end}"
+        try:
+            response = await self._call(
+                "get_object",
+                Bucket=self.bucket,
+                Key=self._object_key(key),
+                Range=byte_range,
+            )
+        except Exception as e:
+            if _is_not_found(e):
+                raise BlobNotFoundError(key)
+            raise
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> None:
+        await self._call("delete_object", Bucket=self.bucket, Key=self._object_key(key))
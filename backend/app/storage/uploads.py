@@ -0,0 +1,49 @@
+from typing import Callable, Type
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+# Allowance for multipart boundaries and headers around an uploaded file
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def limited_upload_route(max_bytes: Callable[[], int], label: str) -> Type[APIRoute]:
+    """
+    Route class for upload endpoints that answers 413 once the request body
+    grows past `max_bytes()` (plus multipart overhead). The limit is checked
+    against the declared Content-Length and again while the body is received,
+    so chunked uploads are cut off too, before the form is fully spooled.
+    """
+
+    class LimitedUploadRoute(APIRoute):
+        def get_route_handler(self) -> Callable:
+            handler = super().get_route_handler()
+
+            async def limited_handler(request: Request) -> Response:
+                limit = max_bytes()
+                too_large = HTTPException(
+                    status_code=413,
+                    detail=f"{label} exceeds the maximum size of {limit} bytes",
+                )
+                allowed = limit + MULTIPART_OVERHEAD
+                declared = request.headers.get("content-length")
+                if declared and declared.isdigit() and int(declared) > allowed:
+                    raise too_large
+
+                received = 0
+                receive = request.receive
+
+                async def limited_receive():
+                    nonlocal received
+                    message = await receive()
+                    if message["type"] == "http.request":
+                        received += len(message.get("body", b""))
+                        if received > allowed:
+                            raise too_large
+                    return message
+
+                return await handler(Request(request.scope, limited_receive))
+
+            return limited_handler
+
+    return LimitedUploadRoute
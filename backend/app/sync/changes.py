@@ -0,0 +1,91 @@
+"""
+Change log feeding the delta sync endpoint.
+
+Every write to a group, expense or settlement appends an entry to the `changes`
+collection naming the entity and whether it was upserted or deleted. Entries
+are keyed by ObjectId, so their order doubles as the sync token. Membership
+entries also list the affected users, which lets a user who left (or whose
+group was deleted) still receive the tombstone after losing access.
+
+Each entry is also published as a compact real-time event (`<entity>.<op>`)
+to the clients connected to the group, and dispatched to the process-local
+caches (see `app/invalidation.py`). User profile changes are logged without a
+group, for cache invalidation only.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.config import logger
+from app.invalidation import invalidation_bus
+from app.realtime import get_bus
+from bson import ObjectId
+
+GROUP = "group"
+EXPENSE = "expense"
+SETTLEMENT = "settlement"
+MEMBERSHIP = "membership"
+USER = "user"
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+
+def change(
+    entity: str,
+    entity_id: Any,
+    op: str = UPSERT,
+    user_ids: Optional[Iterable[str]] = None,
+) -> Dict[str, Any]:
+    """Describe one changed entity for `record_changes`"""
+    entry = {"entity": entity, "entityId": str(entity_id), "op": op}
+    if user_ids is not None:
+        entry["userIds"] = list(user_ids)
+    return entry
+
+
+async def record_changes(
+    collection, group_id: Optional[str], changes: List[Dict[str, Any]]
+):
+    """
+    Append changes of a group (or of a user when `group_id` is None) to the
+    change log.
+
+    Like the group counters, the log is written after the change itself, so a
+    failure is logged instead of failing the request that made the change.
+    """
+    if not changes:
+        return
+    now = datetime.now(timezone.utc)
+    entries = [
+        {
+            "_id": ObjectId(),
+            "groupId": str(group_id) if group_id is not None else None,
+            "at": now,
+            **entry,
+        }
+        for entry in changes
+    ]
+    try:
+        await collection.insert_many(entries, ordered=False)
+    except Exception as e:
+        logger.error(f"Failed to record changes of group {group_id}: {e}")
+
+    await invalidation_bus.notify(entries)
+    if group_id is None:
+        return
+    bus = get_bus()
+    for entry in entries:
+        await bus.publish(_event(entry))
+
+
+def _event(entry: Dict[str, Any]) -> Dict[str, Any]:
+    event = {
+        "type": f"{entry['entity']}.{entry['op']}",
+        "groupId": entry["groupId"],
+        "id": entry["entityId"],
+        "at": entry["at"].isoformat(),
+    }
+    if "userIds" in entry:
+        event["userIds"] = entry["userIds"]
+    return event
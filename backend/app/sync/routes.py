@@ -0,0 +1,24 @@
+from typing import Any, Dict, Optional
+
+from app.auth.security import get_current_user
+from app.sync.schemas import SyncResponse
+from app.sync.service import sync_service
+from fastapi import APIRouter, Depends, Query
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("", response_model=SyncResponse)
+async def sync(
+    since: Optional[str] = Query(
+        None, description="Token from the previous sync; omit for a full sync"
+    ),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Get groups, expenses and settlements changed since the given token, with
+    tombstones for deleted ones. Without a token the complete state of the
+    user's groups is returned. Pass the returned token on the next call, and
+    call again right away while `hasMore` is true.
+    """
+    return await sync_service.sync(current_user["_id"], since)
@@ -0,0 +1,20 @@
+from typing import List
+
+from app.expenses.schemas import ExpenseResponse, Settlement
+from app.groups.schemas import GroupResponse
+from pydantic import BaseModel
+
+
+class DeletedEntities(BaseModel):
+    groups: List[str] = []
+    expenses: List[str] = []
+    settlements: List[str] = []
+
+
+class SyncResponse(BaseModel):
+    token: str
+    hasMore: bool = False
+    groups: List[GroupResponse] = []
+    expenses: List[ExpenseResponse] = []
+    settlements: List[Settlement] = []
+    deleted: DeletedEntities = DeletedEntities()
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from app.config import settings
+from app.database import get_database
+from app.expenses.schemas import ExpenseResponse, Settlement
+from app.groups.service import group_service
+from app.sync.changes import DELETE, EXPENSE, GROUP, MEMBERSHIP, SETTLEMENT, UPSERT
+from bson import ObjectId, errors
+from fastapi import HTTPException
+
+
+class SyncService:
+    def get_db(self):
+        return get_database()
+
+    def _horizon(self) -> ObjectId:
+        """Changes before this id have settled and can be handed out"""
+        settled = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.sync_settle_seconds
+        )
+        return ObjectId.from_datetime(settled)
+
+    def _parse_token(self, token: str) -> ObjectId:
+        try:
+            since = ObjectId(token)
+        except (errors.InvalidId, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid sync token")
+
+        retention = timedelta(days=settings.sync_change_retention_days)
+        if since.generation_time < datetime.now(timezone.utc) - retention:
+            raise HTTPException(
+                status_code=410, detail="Sync token expired, a full sync is required"
+            )
+        return since
+
+    async def sync(self, user_id: str, since: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the changes visible to a user since a sync token, or the complete
+        state of the user's groups when no token is given. The returned token
+        is passed as `since` on the next call.
+        """
+        if since is None:
+            return await self._snapshot(user_id)
+        return await self._changes_since(user_id, self._parse_token(since))
+
+    async def _snapshot(self, user_id: str) -> Dict[str, Any]:
+        db = self.get_db()
+        horizon = self._horizon()
+        groups = await db.groups.find({"members.userId": user_id}).to_list(None)
+        group_ids = [str(group["_id"]) for group in groups]
+        expenses, settlements = await self._group_contents(group_ids)
+        return self._response(horizon, False, groups, expenses, settlements)
+
+    async def _changes_since(self, user_id: str, since: ObjectId) -> Dict[str, Any]:
+        db = self.get_db()
+        horizon = self._horizon()
+        member_of = await db.groups.find(
+            {"members.userId": user_id}, {"_id": 1}
+        ).to_list(None)
+        member_group_ids = [str(group["_id"]) for group in member_of]
+
+        page_size = settings.sync_page_size
+        changes = (
+            await db.changes.find(
+                {
+                    "_id": {"$gt": since, "$lt": horizon},
+                    "$or": [
+                        {"groupId": {"$in": member_group_ids}},
+                        {"userIds": user_id},
+                    ],
+                }
+            )
+            .sort("_id", 1)
+            .limit(page_size + 1)
+            .to_list(None)
+        )
+        has_more = len(changes) > page_size
+        changes = changes[:page_size]
+
+        # Only the latest change of each entity matters
+        latest: Dict[tuple, str] = {}
+        joined: Set[str] = set()
+        left: Set[str] = set()
+        for entry in changes:
+            if entry["entity"] == MEMBERSHIP:
+                if user_id in entry.get("userIds", []):
+                    target, other = (
+                        (joined, left) if entry["op"] == UPSERT else (left, joined)
+                    )
+                    target.add(entry["groupId"])
+                    other.discard(entry["groupId"])
+                continue
+            if entry["entity"] == GROUP and entry["op"] == DELETE:
+                left.add(entry["entityId"])
+                joined.discard(entry["entityId"])
+            latest[(entry["entity"], entry["entityId"])] = entry["op"]
+
+        def ids(entity: str, op: str) -> List[str]:
+            return [
+                eid
+                for (kind, eid), kind_op in latest.items()
+                if (kind, kind_op) == (entity, op)
+            ]
+
+        visible = set(member_group_ids)
+        group_ids = (set(ids(GROUP, UPSERT)) | joined) & visible
+        groups = await db.groups.find(
+            {"_id": {"$in": [ObjectId(gid) for gid in group_ids]}}
+        ).to_list(None)
+
+        # Newly joined groups are sent in full, including their history
+        expenses, settlements = await self._group_contents(sorted(joined & visible))
+        expenses += await self._find_visible(
+            db.expenses, ids(EXPENSE, UPSERT), member_group_ids, joined
+        )
+        settlements += await self._find_visible(
+            db.settlements, ids(SETTLEMENT, UPSERT), member_group_ids, joined
+        )
+
+        token = changes[-1]["_id"] if has_more else horizon
+        response = self._response(token, has_more, groups, expenses, settlements)
+        response["deleted"] = {
+            "groups": sorted(left - visible),
+            "expenses": ids(EXPENSE, DELETE),
+            "settlements": ids(SETTLEMENT, DELETE),
+        }
+        return response
+
+    async def _group_contents(self, group_ids: List[str]):
+        if not group_ids:
+            return [], []
+        db = self.get_db()
+        query = {"groupId": {"$in": group_ids}}
+        expenses = await db.expenses.find(query).to_list(None)
+        settlements = await db.settlements.find(query).to_list(None)
+        return expenses, settlements
+
+    async def _find_visible(
+        self, collection, entity_ids: List[str], group_ids: List[str], skip: Set[str]
+    ) -> List[Dict[str, Any]]:
+        """Current documents of changed entities in groups the user can see"""
+        if not entity_ids:
+            return []
+        return await collection.find(
+            {
+                "_id": {"$in": [ObjectId(eid) for eid in entity_ids]},
+                "groupId": {"$in": [gid for gid in group_ids if gid not in skip]},
+            }
+        ).to_list(None)
+
+    def _response(self, token, has_more, groups, expenses, settlements):
+        return {
+            "token": str(token),
+            "hasMore": has_more,
+            "groups": [group_service.transform_group_document(g) for g in groups],
+            "expenses": [
+                ExpenseResponse(**{**doc, "_id": str(doc["_id"])}) for doc in expenses
+            ],
+            "settlements": [
+                Settlement(**{**doc, "_id": str(doc["_id"])}) for doc in settlements
+            ],
+            "deleted": {"groups": [], "expenses": [], "settlements": []},
+        }
+
+
+sync_service = SyncService()
@@ -2,6 +2,7 @@ from typing import Any, Dict
 
 from app.auth.security import get_current_user
 from app.user.schemas import (
+    AccountDeletionStatus,
     DeleteUserResponse,
     UserProfileResponse,
     UserProfileUpdateRequest,
@@ -55,3 +56,20 @@ async def delete_user_account(current_user: Dict[str, Any] = Depends(get_current
     return DeleteUserResponse(
         success=True, message="User account scheduled for deletion."
     )
+
+
+@router.get("/me/deletion", response_model=AccountDeletionStatus)
+async def get_account_deletion_status(
+    current_user: Dict[str, Any] = Depends(get_current_user),
+):
+    """
+    Progress of removing the account's data after `DELETE /users/me`. Can be
+    polled with the access token issued before the deletion until it expires.
+    """
+    deletion = await user_service.get_account_deletion(current_user["_id"])
+    if not deletion:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "NotFound", "message": "Account is not being deleted"},
+        )
+    return deletion
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -23,3 +23,12 @@ class UserProfileUpdateRequest(BaseModel):
 class DeleteUserResponse(BaseModel):
     success: bool = True
     message: Optional[str] = None
+
+
+class AccountDeletionStatus(BaseModel):
+    status: str  # "inProgress" or "completed"
+    # "refreshTokens", "groups", "settlements" or "names"
+    stage: Optional[str] = None
+    processed: Dict[str, int] = {}
+    startedAt: Optional[datetime] = None
+    finishedAt: Optional[datetime] = None
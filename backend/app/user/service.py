@@ -1,15 +1,42 @@
+import asyncio
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
-from app.config import logger
+from app.background import spawn
+from app.cache import get_cache, invalidation_ttl, user_tag
+from app.config import logger, settings
 from app.database import get_database
+from app.expenses.service import expense_service
+from app.groups.service import group_service
+from app.jobs import job_queue
+from app.storage.images import (
+    MEMBER_IMAGE_SIZE,
+    PROFILE_IMAGE_SIZE,
+    externalize_image_url,
+    is_data_url,
+    warm_image_variants,
+)
+from app.sync.changes import DELETE, GROUP, USER, change, record_changes
 from bson import ObjectId, errors
+from pymongo import UpdateOne
 
+# Profiles are invalidated on change, the TTL bounds missed invalidations (and
+# is cut short when other workers' changes are not heard about)
+USER_CACHE_TTL = 300
+
+
+# Stages of purging a deleted account, in order
+ACCOUNT_PURGE_STAGES = ("refreshTokens", "groups", "settlements", "names")
+
+# What deleted users are shown as in their groups, settlements and expenses
+DELETED_USER_NAME = "Deleted user"
+DELETED_USER_PROFILE = {"name": DELETED_USER_NAME, "email": None, "imageUrl": None}
+
+# Job type purging a deleted account
+PURGE_ACCOUNT = "purgeAccount"
 
-class UserService:
-    def __init__(self):
-        pass
 
+class UserService:
     def get_db(self):
         return get_database()
 
@@ -59,8 +86,17 @@ class UserService:
             # Invalid ObjectId format
             logger.warning(f"Invalid User ID format: {e}")
             return None  # Handle invalid ObjectId gracefully
-        user = await db.users.find_one({"_id": obj_id})
-        return self.transform_user_document(user)
+
+        async def lookup() -> Optional[dict]:
+            user = await db.users.find_one({"_id": obj_id})
+            return self.transform_user_document(user)
+
+        return await get_cache().get_or_set(
+            f"user:{user_id}",
+            lookup,
+            ttl=invalidation_ttl(USER_CACHE_TTL),
+            tags=[user_tag(user_id)],
+        )
 
     async def update_user_profile(self, user_id: str, updates: dict) -> Optional[dict]:
         db = self.get_db()
@@ -74,10 +110,37 @@ class UserService:
         # Only allow certain fields
         allowed = {"name", "imageUrl", "currency"}
         updates = {k: v for k, v in updates.items() if k in allowed}
+        new_image = is_data_url(updates.get("imageUrl"))
+        if "imageUrl" in updates:
+            # Inline data URL images are moved to blob storage
+            updates["imageUrl"] = await externalize_image_url(updates["imageUrl"])
         updates["updated_at"] = datetime.now(timezone.utc)
+        profile_changed = "name" in updates or "imageUrl" in updates
+        if profile_changed:
+            # Names and avatars are copied into the user's group memberships.
+            # Queued before the write, so that the copy still happens if we
+            # stop right after it (the job is moved forward below)
+            await group_service.schedule_member_profile_refresh(
+                user_id, delay=settings.jobs_visibility_timeout
+            )
         result = await db.users.find_one_and_update(
             {"_id": obj_id}, {"$set": updates}, return_document=True
         )
+        if result:
+            await record_changes(db.changes, None, [change(USER, user_id)])
+        if result and profile_changed:
+            await group_service.schedule_member_profile_refresh(user_id)
+        if result and "name" in updates:
+            # and names into their settlements and expense edit history
+            await expense_service.propagate_user_name(user_id, result["name"])
+        if result and new_image:
+            # Avatars are shown small in member lists and larger on profiles
+            spawn(
+                warm_image_variants(
+                    updates["imageUrl"], (MEMBER_IMAGE_SIZE, PROFILE_IMAGE_SIZE)
+                ),
+                name=f"warm-avatar-{user_id}",
+            )
         return self.transform_user_document(result)
 
     async def delete_user(self, user_id: str) -> bool:
@@ -89,8 +152,202 @@ class UserService:
                 f"Invalid User ID format: {e}"
             )  # Invalid ObjectId format for deletion
             return False  # Handle invalid ObjectId gracefully
+        # The rest of the account is purged in the background. The purge is
+        # queued first (held back until the user is gone), so it still runs if
+        # the process stops right after the user itself is deleted
+        marked = await db.account_deletions.update_one(
+            {"_id": user_id},
+            {
+                "$setOnInsert": {
+                    "stage": 0,
+                    "processed": {name: 0 for name in ACCOUNT_PURGE_STAGES},
+                    "startedAt": datetime.now(timezone.utc),
+                    "finishedAt": None,
+                }
+            },
+            upsert=True,
+        )
+        await self._schedule_account_purge(user_id, settings.jobs_visibility_timeout)
         result = await db.users.delete_one({"_id": obj_id})
+        if result.deleted_count == 0 and marked.upserted_id is not None:
+            # No such user, and no earlier deletion of it to finish
+            await db.account_deletions.delete_one({"_id": user_id, "stage": 0})
+            return False
+        if result.deleted_count > 0:
+            await record_changes(db.changes, None, [change(USER, user_id, DELETE)])
+        await self._schedule_account_purge(user_id)
         return result.deleted_count > 0
 
+    async def get_account_deletion(self, user_id: str) -> Optional[dict]:
+        """Status of the purge of a deleted account, or None if there is none"""
+        db = self.get_db()
+        deletion = await db.account_deletions.find_one({"_id": user_id})
+        if not deletion:
+            return None
+        finished = deletion.get("finishedAt") is not None
+        if finished:
+            # Names are anonymized by the rename job the last stage started
+            renaming = await db.name_propagations.find_one(
+                {"_id": user_id}, {"finishedAt": 1}
+            )
+            finished = not renaming or renaming.get("finishedAt") is not None
+        stage = deletion["stage"]
+        return {
+            "status": "completed" if finished else "inProgress",
+            "stage": ACCOUNT_PURGE_STAGES[stage] if not finished else None,
+            "processed": deletion.get("processed", {}),
+            "startedAt": deletion.get("startedAt"),
+            "finishedAt": deletion.get("finishedAt") if finished else None,
+        }
+
+    async def _schedule_account_purge(self, user_id: str, delay: float = 0) -> None:
+        await job_queue.enqueue(self.get_db().jobs, PURGE_ACCOUNT, user_id, delay=delay)
+
+    async def _purge_account(self, user_id: str) -> None:
+        """
+        Remove what is left of a deleted account, one stage at a time:
+        revoke its refresh tokens, anonymize its group memberships (deleting
+        groups it was the only member of), cancel its pending settlements (so
+        group balances stop owing it), then replace its name in settlements
+        and expense history through the rename job.
+
+        Work is done in batches of `account_deletion_batch_size` documents
+        with a pause of `account_deletion_batch_delay` seconds between them.
+        The stage and counts are stored after each batch, so a purge stopped
+        by a restart continues where it left off when the job is retried.
+        """
+        db = self.get_db()
+        if await db.users.count_documents({"_id": ObjectId(user_id)}, limit=1):
+            # The deletion stopped before the user was deleted; keep the account
+            await db.account_deletions.delete_one({"_id": user_id, "finishedAt": None})
+            return
+        while True:
+            deletion = await db.account_deletions.find_one({"_id": user_id})
+            if not deletion or deletion.get("finishedAt"):
+                return
+            stage = deletion["stage"]
+            if stage == len(ACCOUNT_PURGE_STAGES):
+                await db.account_deletions.update_one(
+                    {"_id": user_id},
+                    {"$set": {"finishedAt": datetime.now(timezone.utc)}},
+                )
+                return
+
+            name = ACCOUNT_PURGE_STAGES[stage]
+            purge = {
+                "refreshTokens": self._purge_refresh_tokens,
+                "groups": self._purge_groups,
+                "settlements": self._purge_settlements,
+                "names": self._purge_names,
+            }[name]
+            processed = await purge(user_id)
+            if processed:
+                update = {"$inc": {f"processed.{name}": processed}}
+            else:
+                update = {"$inc": {"stage": 1}}
+            await db.account_deletions.update_one(
+                {"_id": user_id, "stage": stage}, update
+            )
+            if processed:
+                await asyncio.sleep(settings.account_deletion_batch_delay)
+
+    async def _purge_refresh_tokens(self, user_id: str) -> int:
+        db = self.get_db()
+        tokens = (
+            await db.refresh_tokens.find({"user_id": ObjectId(user_id)}, {"_id": 1})
+            .limit(settings.account_deletion_batch_size)
+            .to_list(None)
+        )
+        if not tokens:
+            return 0
+        result = await db.refresh_tokens.delete_many(
+            {"_id": {"$in": [token["_id"] for token in tokens]}}
+        )
+        return result.deleted_count
+
+    async def _purge_groups(self, user_id: str) -> int:
+        """
+        Anonymize the user in up to a batch of groups shared with others, and
+        delete the groups nobody else is in. The anonymized groups are noted
+        in the deletion progress (`pendingGroups`) before they are written and
+        their changes are logged afterwards, also when resuming after a stop
+        in between.
+        """
+        db = self.get_db()
+        deletion = await db.account_deletions.find_one(
+            {"_id": user_id}, {"pendingGroups": 1}
+        )
+        if deletion and deletion.get("pendingGroups"):
+            await self._record_anonymized(deletion["pendingGroups"])
+            await db.account_deletions.update_one(
+                {"_id": user_id}, {"$unset": {"pendingGroups": ""}}
+            )
+
+        groups = (
+            await db.groups.find(
+                {
+                    "members": {
+                        "$elemMatch": {
+                            "userId": user_id,
+                            "profile": {"$ne": DELETED_USER_PROFILE},
+                        }
+                    }
+                },
+                {"members.userId": 1},
+            )
+            .limit(settings.account_deletion_batch_size)
+            .to_list(None)
+        )
+        if not groups:
+            return 0
+
+        # Groups of others keep the member, so their balances still add up
+        shared = [group["_id"] for group in groups if len(group["members"]) > 1]
+        if shared:
+            pending = [str(group_id) for group_id in shared]
+            await db.account_deletions.update_one(
+                {"_id": user_id}, {"$set": {"pendingGroups": pending}}
+            )
+            await db.groups.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": group_id, "members.userId": user_id},
+                        {
+                            "$set": {"members.$.profile": DELETED_USER_PROFILE},
+                            "$inc": {"version": 1},
+                        },
+                    )
+                    for group_id in shared
+                ],
+                ordered=False,
+            )
+            await self._record_anonymized(pending)
+            await db.account_deletions.update_one(
+                {"_id": user_id}, {"$unset": {"pendingGroups": ""}}
+            )
+
+        # Groups nobody else is in are deleted along with their data
+        for group in groups:
+            if len(group["members"]) == 1:
+                await group_service.remove_group(str(group["_id"]), [user_id])
+        return len(groups)
+
+    async def _record_anonymized(self, group_ids: List[str]) -> None:
+        changes = self.get_db().changes
+        for group_id in group_ids:
+            await record_changes(changes, group_id, [change(GROUP, group_id)])
+
+    async def _purge_settlements(self, user_id: str) -> int:
+        # Nobody can pay or be paid by a deleted account anymore
+        return await expense_service.cancel_pending_settlements_of_user(
+            user_id, settings.account_deletion_batch_size
+        )
+
+    async def _purge_names(self, user_id: str) -> int:
+        # Hands the rewrite over to the resumable rename job and moves on
+        await expense_service.propagate_user_name(user_id, DELETED_USER_NAME)
+        return 0
+
 
 user_service = UserService()
+job_queue.register(PURGE_ACCOUNT, lambda job: user_service._purge_account(job["key"]))
@@ -0,0 +1,13 @@
+import pytest
+from app.auth.security import create_access_token, verify_token
+
+
+@pytest.mark.parametrize("claim_count", [0, 20, 100])
+def test_verify_token(benchmark, claim_count):
+    """JWT verification runs on every authenticated request"""
+    claims = {"sub": "65f1a2b3c4d5e6f7a8b9c0d0"}
+    claims.update({f"claim_{i}": f"value_{i}" for i in range(claim_count)})
+    token = create_access_token(claims)
+
+    payload = benchmark(verify_token, token)
+    assert payload["sub"] == claims["sub"]
@@ -0,0 +1,105 @@
+"""
+Backup/restore throughput of scripts/backup_db.py.
+
+Runs against an in-memory database by default. To measure the million-document
+case against a real server:
+
+    BENCH_MONGODB_URL=mongodb://localhost:27017 BENCH_BACKUP_DOCS=1000000 \
+        pytest benchmarks/bench_backup.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import backup_db  # noqa: E402
+
+DOC_COUNTS = [int(count) for count in os.getenv("BENCH_BACKUP_DOCS", "5000").split(",")]
+
+
+def _client():
+    url = os.getenv("BENCH_MONGODB_URL")
+    return MongoClient(url) if url else mongomock.MongoClient()
+
+
+@pytest.fixture(scope="module", params=DOC_COUNTS, ids=lambda n: f"{n}docs")
+def source_db(request):
+    client = _client()
+    db = client["splitwiser_backup_bench"]
+    db.expenses.drop()
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(request.param):
+        batch.append(
+            {
+                "_id": ObjectId(),
+                "groupId": str(ObjectId()),
+                "description": f"Expense {i}",
+                "amount": round(i * 1.37 % 500, 2),
+                "splits": [{"userId": f"user_{j}", "amount": 1.0} for j in range(4)],
+                "createdAt": start + timedelta(minutes=i),
+            }
+        )
+        if len(batch) == 10_000:
+            db.expenses.insert_many(batch)
+            batch = []
+    if batch:
+        db.expenses.insert_many(batch)
+    yield db
+    client.drop_database("splitwiser_backup_bench")
+
+
+@pytest.fixture
+def backup_dir():
+    path = tempfile.mkdtemp(prefix="splitwiser-backup-bench-")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.mark.parametrize("compression", ["gzip", "none"])
+def test_backup_collection(benchmark, source_db, backup_dir, compression):
+    """Streaming backup of one large collection"""
+
+    def setup():
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        return (), {}
+
+    def run():
+        return backup_db.create_backup(
+            db=source_db,
+            backup_dir=backup_dir,
+            collections=["expenses"],
+            compression=compression,
+        )
+
+    _, metadata = benchmark.pedantic(run, setup=setup, rounds=3)
+    assert metadata["total_documents"] == source_db.expenses.estimated_document_count()
+
+
+def test_restore_collection(benchmark, source_db, backup_dir):
+    """Streaming restore in insert_many batches"""
+    backup_path, metadata = backup_db.create_backup(
+        db=source_db, backup_dir=backup_dir, collections=["expenses"]
+    )
+    client = _client()
+    target = client["splitwiser_restore_bench"]
+
+    def setup():
+        target.expenses.drop()
+        return (), {}
+
+    def run():
+        return backup_db.restore_backup(backup_path, db=target)
+
+    stats = benchmark.pedantic(run, setup=setup, rounds=3)
+    assert stats["expenses"] == metadata["total_documents"]
+    client.drop_database("splitwiser_restore_bench")
@@ -0,0 +1,103 @@
+import pytest
+from app import background
+from app.expenses.schemas import ExpenseCreateRequest, ExpenseSplit
+from app.expenses.service import ExpenseService
+from seed import (
+    SEED_MONTH,
+    SEED_YEAR,
+    reset_database,
+    seed_expenses,
+    seed_group,
+    seed_users,
+)
+
+service = ExpenseService()
+
+
+@pytest.mark.parametrize("include_summary", [True, False])
+@pytest.mark.parametrize("member_count", [5, 20, 50])
+def test_create_expense(benchmark, run, bench_db, member_count, include_summary):
+    """Expense creation including settlements and, optionally, the group summary"""
+
+    def setup():
+        # Let the previous round's background refresh finish outside the timing
+        run(background.drain())
+        db = reset_database()
+        member_ids = run(seed_users(db, member_count))
+        group_id = run(seed_group(db, member_ids))
+        run(seed_expenses(db, group_id, member_ids, 50))
+        share = 10.0
+        request = ExpenseCreateRequest(
+            description="Benchmark dinner",
+            amount=share * member_count,
+            splits=[ExpenseSplit(userId=uid, amount=share) for uid in member_ids],
+            paidBy=member_ids[0],
+        )
+        return (group_id, request, member_ids[0]), {}
+
+    def create(group_id, request, user_id):
+        return run(
+            service.create_expense(
+                group_id, request, user_id, include_summary=include_summary
+            )
+        )
+
+    result = benchmark.pedantic(create, setup=setup, rounds=15, warmup_rounds=1)
+    run(background.drain())
+    assert len(result["settlements"]) == member_count
+
+
+@pytest.mark.parametrize("expense_count", [100, 500, 2000])
+def test_calculate_advanced_settlements(benchmark, run, bench_db, expense_count):
+    """Debt simplification over a group's whole pending history"""
+    member_ids = run(seed_users(bench_db, 20))
+    group_id = run(seed_group(bench_db, member_ids))
+    run(seed_expenses(bench_db, group_id, member_ids, expense_count))
+
+    result = benchmark(lambda: run(service._calculate_advanced_settlements(group_id)))
+    assert result
+
+
+@pytest.mark.parametrize("group_count", [5, 20, 50])
+def test_get_friends_balance_summary(benchmark, run, bench_db, group_count):
+    """Cross-group friend balances for a user in many groups"""
+    member_ids = run(seed_users(bench_db, 30))
+    user_id = member_ids[0]
+    for i in range(group_count):
+        others = member_ids[1 + (i % 25) : 6 + (i % 25)]
+        group_id = run(seed_group(bench_db, [user_id] + others, f"Group {i}"))
+        run(seed_expenses(bench_db, group_id, [user_id] + others, 20))
+
+    result = benchmark(lambda: run(service.get_friends_balance_summary(user_id)))
+    assert result["summary"]["activeGroups"] == group_count
+
+
+@pytest.mark.parametrize(
+    "member_count,expense_count", [(5, 100), (20, 1000), (50, 2000)]
+)
+def test_get_group_analytics(benchmark, run, bench_db, member_count, expense_count):
+    """Monthly analytics including per-member contributions"""
+    member_ids = run(seed_users(bench_db, member_count))
+    group_id = run(seed_group(bench_db, member_ids))
+    run(seed_expenses(bench_db, group_id, member_ids, expense_count))
+
+    result = benchmark(
+        lambda: run(
+            service.get_group_analytics(
+                group_id, member_ids[0], "month", SEED_YEAR, SEED_MONTH
+            )
+        )
+    )
+    assert result["expenseCount"] == expense_count
+
+
+@pytest.mark.parametrize("expense_count", [100, 2000])
+def test_get_optimized_settlements_cached(benchmark, run, bench_db, expense_count):
+    """Repeated reads of an unchanged group's optimized settlements"""
+    member_ids = run(seed_users(bench_db, 20))
+    group_id = run(seed_group(bench_db, member_ids))
+    run(seed_expenses(bench_db, group_id, member_ids, expense_count))
+    run(service.get_optimized_settlements(group_id))
+
+    result = benchmark(lambda: run(service.get_optimized_settlements(group_id)))
+    assert result
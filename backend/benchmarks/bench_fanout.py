@@ -0,0 +1,67 @@
+"""
+Endpoints whose independent queries run concurrently.
+
+Every database call is delayed by `latency`, so a round trip spent waiting
+sequentially shows up directly in the timings. `extra_info` records the number
+of calls: latency close to a few multiples of `latency` rather than
+`calls * latency` means the queries overlap.
+"""
+
+import pytest
+from app.database import mongodb
+from app.expenses.service import ExpenseService
+from seed import LatentDatabase, seed_expenses, seed_group, seed_users
+
+service = ExpenseService()
+
+LATENCIES = [0.005, 0.02]
+
+
+@pytest.fixture
+def seeded_group(run, bench_db):
+    member_ids = run(seed_users(bench_db, 10))
+    group_id = run(seed_group(bench_db, member_ids))
+    run(seed_expenses(bench_db, group_id, member_ids, 50))
+    return group_id, member_ids
+
+
+def _with_latency(latency):
+    latent = LatentDatabase(mongodb.database, latency)
+    mongodb.database = latent
+    return latent
+
+
+@pytest.mark.parametrize("latency", LATENCIES, ids=lambda s: f"{s * 1000:g}ms")
+def test_get_group_settlements_overview(benchmark, run, seeded_group, latency):
+    """GET /groups/{id}/settlements: page, optimized settlements, pending total"""
+    group_id, member_ids = seeded_group
+    latent = _with_latency(latency)
+
+    def overview():
+        return run(service.get_group_settlements_overview(group_id, member_ids[0]))
+
+    overview()
+    benchmark.extra_info["db_calls"] = len(latent.calls)
+    benchmark.extra_info["latency_ms"] = latency * 1000
+
+    result = benchmark(overview)
+    assert result["total"] > 0
+
+
+@pytest.mark.parametrize("latency", LATENCIES, ids=lambda s: f"{s * 1000:g}ms")
+def test_get_user_balance_in_group(benchmark, run, seeded_group, latency):
+    """GET /groups/{id}/users/{user_id}/balance"""
+    group_id, member_ids = seeded_group
+    latent = _with_latency(latency)
+
+    def balance():
+        return run(
+            service.get_user_balance_in_group(group_id, member_ids[1], member_ids[0])
+        )
+
+    balance()
+    benchmark.extra_info["db_calls"] = len(latent.calls)
+    benchmark.extra_info["latency_ms"] = latency * 1000
+
+    result = benchmark(balance)
+    assert result["userId"] == member_ids[1]
@@ -0,0 +1,17 @@
+import pytest
+from app.groups.service import GroupService
+from seed import seed_users
+
+service = GroupService()
+
+
+@pytest.mark.parametrize("member_count", [10, 50, 200])
+def test_enrich_members_with_user_details(benchmark, run, bench_db, member_count):
+    """Batch enrichment of group members with user profiles"""
+    member_ids = run(seed_users(bench_db, member_count))
+    members = [
+        {"userId": uid, "role": "member", "joinedAt": None} for uid in member_ids
+    ]
+
+    result = benchmark(lambda: run(service._enrich_members_with_user_details(members)))
+    assert len(result) == member_count
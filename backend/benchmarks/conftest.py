@@ -0,0 +1,33 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# Add project root to sys.path to allow imports from app
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.database import mongodb  # noqa: E402
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a dedicated event loop."""
+    loop = asyncio.new_event_loop()
+    try:
+        yield loop.run_until_complete
+    finally:
+        loop.close()
+
+
+@pytest.fixture
+def bench_db():
+    """Point the application at a fresh in-memory database for one benchmark."""
+    original = mongodb.database
+    mongodb.database = AsyncMongoMockClient()["bench_db"]
+    try:
+        yield mongodb.database
+    finally:
+        mongodb.database = original
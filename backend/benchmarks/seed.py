@@ -0,0 +1,148 @@
+"""
+Deterministic data builders shared by the benchmark modules.
+"""
+
+import asyncio
+import inspect
+import random
+from datetime import datetime, timedelta
+
+from app.database import mongodb
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+# Fixed seed so that every run benchmarks exactly the same data set
+SEED = 1234
+
+# Month used for seeded expenses so analytics benchmarks hit a full period
+SEED_YEAR = 2025
+SEED_MONTH = 6
+
+
+def reset_database():
+    """Swap in an empty database, used by pedantic setups that mutate state."""
+    mongodb.database = AsyncMongoMockClient()["bench_db"]
+    return mongodb.database
+
+
+async def seed_users(db, count: int) -> list:
+    """Insert `count` users and return their ids as strings."""
+    users = [
+        {"_id": ObjectId(), "name": f"User {i}", "email": f"user{i}@example.com"}
+        for i in range(count)
+    ]
+    await db.users.insert_many(users)
+    return [str(user["_id"]) for user in users]
+
+
+async def seed_group(db, member_ids: list, name: str = "Bench Group") -> str:
+    """Insert a group containing every id in `member_ids` and return its id."""
+    now = datetime(SEED_YEAR, SEED_MONTH, 1)
+    group = {
+        "_id": ObjectId(),
+        "name": name,
+        "currency": "USD",
+        "joinCode": ObjectId().binary.hex()[:6].upper(),
+        "createdBy": member_ids[0],
+        "createdAt": now,
+        "members": [
+            {
+                "userId": member_id,
+                "role": "admin" if i == 0 else "member",
+                "joinedAt": now,
+            }
+            for i, member_id in enumerate(member_ids)
+        ],
+    }
+    await db.groups.insert_one(group)
+    return str(group["_id"])
+
+
+async def seed_expenses(db, group_id: str, member_ids: list, count: int):
+    """Insert `count` equally split expenses with their pending settlements."""
+    rng = random.Random(SEED)
+    start = datetime(SEED_YEAR, SEED_MONTH, 1)
+    expenses = []
+    settlements = []
+    for i in range(count):
+        payer = rng.choice(member_ids)
+        participants = rng.sample(member_ids, k=min(len(member_ids), 4))
+        share = round(rng.uniform(5, 200), 2)
+        created_at = start + timedelta(hours=rng.randrange(0, 24 * 28))
+        expense_id = ObjectId()
+        expenses.append(
+            {
+                "_id": expense_id,
+                "groupId": group_id,
+                "createdBy": payer,
+                "paidBy": payer,
+                "description": f"Expense {i}",
+                "amount": share * len(participants),
+                "splits": [
+                    {"userId": uid, "amount": share, "type": "equal"}
+                    for uid in participants
+                ],
+                "splitType": "equal",
+                "tags": [rng.choice(["food", "travel", "rent", "misc"])],
+                "receiptUrls": [],
+                "comments": [],
+                "history": [],
+                "createdAt": created_at,
+                "updatedAt": created_at,
+            }
+        )
+        for uid in participants:
+            settlements.append(
+                {
+                    "_id": ObjectId(),
+                    "expenseId": str(expense_id),
+                    "groupId": group_id,
+                    "payerId": payer,
+                    "payeeId": uid,
+                    "payerName": f"Name {payer[-4:]}",
+                    "payeeName": f"Name {uid[-4:]}",
+                    "amount": share,
+                    "status": "completed" if uid == payer else "pending",
+                    "description": f"Share for Expense {i}",
+                    "createdAt": created_at,
+                }
+            )
+    if expenses:
+        await db.expenses.insert_many(expenses)
+        await db.settlements.insert_many(settlements)
+
+
+class LatentDatabase:
+    """
+    Proxy adding a fixed delay to every awaited database call.
+
+    The in-memory database answers instantly, which hides how an endpoint's
+    queries are scheduled. With a per-call delay, sequential queries cost the
+    sum of their delays while concurrent ones cost about the largest.
+    """
+
+    def __init__(self, target, delay: float, calls: list = None):
+        self._target = target
+        self._delay = delay
+        self.calls = calls if calls is not None else []
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return LatentDatabase(attr, self._delay, self.calls)
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if inspect.isawaitable(result):
+                return self._delayed(name, result)
+            return LatentDatabase(result, self._delay, self.calls)
+
+        return call
+
+    def __getitem__(self, name):
+        return LatentDatabase(self._target[name], self._delay, self.calls)
+
+    async def _delayed(self, name, awaitable):
+        self.calls.append(name)
+        await asyncio.sleep(self._delay)
+        return await awaitable
@@ -1,11 +1,20 @@
 from contextlib import asynccontextmanager
 
+from app import background, realtime
 from app.auth.routes import router as auth_router
+from app.cache import get_cache
 from app.config import RequestResponseLoggingMiddleware, logger, settings
-from app.database import close_mongo_connection, connect_to_mongo
+from app.database import close_mongo_connection, connect_to_mongo, get_database
 from app.expenses.routes import balance_router
 from app.expenses.routes import router as expenses_router
+from app.expenses.service import expense_service
 from app.groups.routes import router as groups_router
+from app.invalidation import invalidation_bus
+from app.jobs import job_queue
+from app.profiling import QueryProfilingMiddleware
+from app.realtime.routes import router as realtime_router
+from app.storage.routes import router as images_router
+from app.sync.routes import router as sync_router
 from app.user.routes import router as user_router
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -18,8 +27,16 @@ async def lifespan(app: FastAPI):
     logger.info("Lifespan: Connecting to MongoDB...")
     await connect_to_mongo()
     logger.info("Lifespan: MongoDB connected.")
+    await realtime.start()
+    invalidation_bus.start(get_database().changes)
+    if settings.jobs_workers_enabled:
+        job_queue.start(get_database().jobs)
     yield
     # Shutdown
+    await job_queue.stop()
+    await invalidation_bus.stop()
+    await realtime.shutdown()
+    await background.shutdown()
     logger.info("Lifespan: Closing MongoDB connection...")
     await close_mongo_connection()
     logger.info("Lifespan: MongoDB connection closed.")
@@ -55,6 +72,9 @@ logger.info(f"Allowed CORS origins: {allowed_origins}")
 
 app.add_middleware(RequestResponseLoggingMiddleware)
 
+if settings.db_profiling:
+    app.add_middleware(QueryProfilingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -119,7 +139,15 @@ async def health_check():
 
     This endpoint can be used for health checks and monitoring.
     """
-    return {"status": "healthy", "service": "Splitwiser API"}
+    return {
+        "status": "healthy",
+        "service": "Splitwiser API",
+        "cache": get_cache().metrics(),
+        "coalescing": expense_service.flights.metrics(),
+        "realtime": realtime.get_bus().metrics(),
+        "cacheInvalidation": invalidation_bus.metrics(),
+        "jobs": job_queue.metrics(),
+    }
 
 
 # Include routers
@@ -128,6 +156,9 @@ app.include_router(user_router)
 app.include_router(groups_router)
 app.include_router(expenses_router)
 app.include_router(balance_router)
+app.include_router(images_router)
+app.include_router(sync_router)
+app.include_router(realtime_router)
 
 if __name__ == "__main__":
     import uvicorn
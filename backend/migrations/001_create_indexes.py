@@ -83,6 +83,25 @@ async def create_indexes():
         await db.groups.create_index([("members.userId", 1)])
         logger.info("   ✓ Created index on 'members.userId'")
 
+        # Compound index: members.userId + lastActivityAt - For paging through
+        # a user's groups, most recently active first
+        await db.groups.create_index(
+            [("members.userId", 1), ("lastActivityAt", -1), ("_id", -1)]
+        )
+        logger.info(
+            "   ✓ Created compound index on 'members.userId' + 'lastActivityAt'"
+        )
+
+        # Backfill: groups created before lastActivityAt existed start out
+        # with their creation time, instead of all sorting last
+        result = await db.groups.update_many(
+            {"lastActivityAt": {"$exists": False}, "createdAt": {"$exists": True}},
+            [{"$set": {"lastActivityAt": "$createdAt"}}],
+        )
+        logger.info(
+            f"   ✓ Set 'lastActivityAt' from 'createdAt' on {result.modified_count} groups"
+        )
+
         # Created by index - For user's created groups
         await db.groups.create_index("createdBy")
         logger.info("   ✓ Created index on 'createdBy'")
@@ -110,6 +129,10 @@ async def create_indexes():
         await db.expenses.create_index([("createdBy", 1), ("createdAt", -1)])
         logger.info("   ✓ Created compound index on 'createdBy' + 'createdAt'")
 
+        # Edit history userId index - For copying renamed users' names into history
+        await db.expenses.create_index("history.userId", sparse=True)
+        logger.info("   ✓ Created sparse index on 'history.userId'")
+
         logger.info("")
 
         # ==========================================
@@ -143,6 +166,57 @@ async def create_indexes():
         await db.settlements.create_index([("payerId", 1), ("payeeId", 1)])
         logger.info("   ✓ Created compound index on 'payerId' + 'payeeId'")
 
+        # Optimized settlements cached per group, removed with the group
+        await db.settlement_caches.create_index("groupId")
+        logger.info("   ✓ Created index on 'settlement_caches' 'groupId'")
+
+        # They used to be cached on the group documents
+        result = await db.groups.update_many(
+            {"settlementsCache": {"$exists": True}},
+            {"$unset": {"settlementsCache": ""}},
+        )
+        logger.info(
+            f"   ✓ Removed 'settlementsCache' from {result.modified_count} groups"
+        )
+
+        logger.info("")
+
+        # ==========================================
+        # ATTACHMENTS / BLOB STORAGE INDEXES
+        # ==========================================
+        logger.info("📋 Creating indexes for 'attachments' collection...")
+
+        # Compound index: groupId + expenseId + key - For attachment downloads
+        await db.attachments.create_index(
+            [("groupId", 1), ("expenseId", 1), ("key", 1)], unique=True
+        )
+        logger.info("   ✓ Created unique index on 'groupId' + 'expenseId' + 'key'")
+
+        # GridFS-layout chunks (only used with STORAGE_BACKEND=gridfs)
+        await db["blobs.chunks"].create_index([("files_id", 1), ("n", 1)], unique=True)
+        logger.info("   ✓ Created unique index on 'blobs.chunks' 'files_id' + 'n'")
+
+        logger.info("")
+
+        # ==========================================
+        # CHANGES COLLECTION INDEXES (delta sync)
+        # ==========================================
+        logger.info("📋 Creating indexes for 'changes' collection...")
+
+        # Compound index: groupId + _id - For reading a group's changes in order
+        await db.changes.create_index([("groupId", 1), ("_id", 1)])
+        logger.info("   ✓ Created compound index on 'groupId' + '_id'")
+
+        # Users named in membership changes and group deletions
+        await db.changes.create_index([("userIds", 1), ("_id", 1)], sparse=True)
+        logger.info("   ✓ Created sparse compound index on 'userIds' + '_id'")
+
+        # TTL index on at - Changes older than the retention period expire
+        await db.changes.create_index(
+            "at", expireAfterSeconds=settings.sync_change_retention_days * 86400
+        )
+        logger.info("   ✓ Created TTL index on 'at' (sync change retention)")
+
         logger.info("")
 
         # ==========================================
@@ -191,6 +265,17 @@ async def create_indexes():
 
         logger.info("")
 
+        # ==========================================
+        # JOBS COLLECTION INDEXES (background job queue)
+        # ==========================================
+        logger.info("📋 Creating indexes for 'jobs' collection...")
+
+        # Compound index: type + status + runAt - For leasing the next due job
+        await db.jobs.create_index([("type", 1), ("status", 1), ("runAt", 1)])
+        logger.info("   ✓ Created compound index on 'type' + 'status' + 'runAt'")
+
+        logger.info("")
+
         # ==========================================
         # VERIFY INDEXES CREATED
         # ==========================================
@@ -203,6 +288,7 @@ async def create_indexes():
             "groups",
             "expenses",
             "settlements",
+            "attachments",
             "refresh_tokens",
             "password_resets",
         ]
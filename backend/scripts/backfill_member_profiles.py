@@ -0,0 +1,65 @@
+"""
+Backfill script for the profile snapshots in group member entries.
+This script:
+1. Collects the users that are members of any group (or the users given with --user)
+2. Copies their current name, email and image into their group memberships, in batches
+3. Reports how many groups were updated
+
+Snapshots are normally refreshed in the background whenever a user changes
+their name or image; run this once for groups created before snapshots existed,
+or after restoring data.
+
+Usage:
+    python backfill_member_profiles.py [--user USER_ID ...] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import close_mongo_connection, connect_to_mongo  # noqa: E402
+from app.groups.service import group_service  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def backfill_profiles(user_ids=None, batch_size=500):
+    """
+    Refresh the snapshots of the given users (all group members by default).
+    Returns how many users were processed and how many groups were updated.
+    """
+    if not user_ids:
+        user_ids = await group_service.get_db().groups.distinct("members.userId")
+    stats = {"users": 0, "groups": 0}
+
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start : start + batch_size]
+        stats["groups"] += await group_service.refresh_member_profiles(batch)
+        stats["users"] += len(batch)
+
+    return stats
+
+
+async def main(user_ids=None, batch_size=500):
+    await connect_to_mongo()
+    try:
+        return await backfill_profiles(user_ids, batch_size)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--user", action="append", dest="users", metavar="USER_ID")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    stats = asyncio.run(main(args.users, args.batch_size))
+    logger.info(f"Refreshed {stats['users']} users, updated {stats['groups']} groups")
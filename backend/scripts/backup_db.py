@@ -1,14 +1,33 @@
 """
 Database backup script for Splitwiser.
 Creates a backup of all collections before performing migrations.
+
+Collections are streamed with batched cursors (never loaded into memory as a
+whole) and written as newline-delimited MongoDB extended JSON, compressed with
+gzip (or zstd when the `zstandard` package is installed). Each collection is
+written as a series of parts and a checkpoint with the last backed-up `_id` is
+recorded after every part, so an interrupted backup can be resumed with
+`--resume <backup_path>`. `restore_backup` streams a backup back in
+`insert_many` batches.
+
+Usage:
+    python backup_db.py [--collections users,groups] [--compression gzip|zstd|none]
+    python backup_db.py --resume backups/backup_20250101_120000
+    python backup_db.py --restore backups/backup_20250101_120000 [--drop]
 """
 
+import argparse
+import gzip
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from bson import ObjectId, json_util
 from dotenv import load_dotenv
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
 
 # Get the script's directory and backend directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -21,49 +40,220 @@ load_dotenv(os.path.join(BACKEND_DIR, ".env"))
 MONGODB_URL = os.getenv("MONGODB_URL")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
 
+BACKUP_FORMAT_VERSION = 2
+METADATA_FILE = "backup_metadata.json"
+BATCH_SIZE = 1000
+DOCS_PER_PART = 100_000
+WORKERS = 4
+
+# Canonical extended JSON keeps BSON types (ObjectId, dates, int64...) intact
+JSON_OPTIONS = json_util.CANONICAL_JSON_OPTIONS
+
+EXTENSIONS = {"gzip": ".ndjson.gz", "zstd": ".ndjson.zst", "none": ".ndjson"}
+
+
+def _open_text(path, mode, compression):
+    """Open a (compressed) text file for reading ("rt") or writing ("wt")"""
+    if compression == "gzip":
+        return gzip.open(path, mode, encoding="utf-8", compresslevel=6)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(
+                "zstd compression requires the 'zstandard' package "
+                "(pip install zstandard)"
+            )
+        return zstandard.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _get_database():
+    client = MongoClient(MONGODB_URL)
+    return client[DATABASE_NAME]
+
+
+def _collection_dir(backup_path, collection_name):
+    return os.path.join(backup_path, collection_name)
+
+
+def _checkpoint_path(backup_path, collection_name):
+    return os.path.join(
+        _collection_dir(backup_path, collection_name), "checkpoint.json"
+    )
+
+
+def _part_path(backup_path, collection_name, part, compression):
+    return os.path.join(
+        _collection_dir(backup_path, collection_name),
+        f"part-{part:05d}{EXTENSIONS[compression]}",
+    )
 
-def create_backup():
-    """Create a backup of all collections."""
+
+def _read_checkpoint(backup_path, collection_name):
+    path = _checkpoint_path(backup_path, collection_name)
+    if not os.path.exists(path):
+        return {"parts": 0, "count": 0, "lastId": None, "complete": False}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _write_checkpoint(backup_path, collection_name, checkpoint):
+    # Write then rename so a crash never leaves a half-written checkpoint
+    path = _checkpoint_path(backup_path, collection_name)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def backup_collection(
+    db,
+    backup_path,
+    collection_name,
+    compression="gzip",
+    batch_size=BATCH_SIZE,
+    docs_per_part=DOCS_PER_PART,
+):
+    """
+    Stream one collection into numbered parts ordered by `_id`.
+
+    Resumes after the last completed part if a checkpoint exists. Returns the
+    number of documents in the collection's backup.
+    """
+    os.makedirs(_collection_dir(backup_path, collection_name), exist_ok=True)
+    checkpoint = _read_checkpoint(backup_path, collection_name)
+    if checkpoint["complete"]:
+        return checkpoint["count"]
+
+    query = {}
+    if checkpoint["lastId"] is not None:
+        last_id = json_util.loads(checkpoint["lastId"])
+        query = {"_id": {"$gt": last_id}}
+
+    cursor = db[collection_name].find(query).sort("_id", 1).batch_size(batch_size)
+    part_file = None
+    part_count = 0
+    last_doc_id = None
     try:
-        # Create backup directory if it doesn't exist
-        backup_dir = "backups"
-        backup_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = os.path.join(backup_dir, f"backup_{backup_time}")
-        os.makedirs(backup_path, exist_ok=True)
+        for doc in cursor:
+            if part_file is None:
+                # Discard whatever an interrupted run left of this part
+                part_file = _open_text(
+                    _part_path(
+                        backup_path, collection_name, checkpoint["parts"], compression
+                    ),
+                    "wt",
+                    compression,
+                )
+            part_file.write(json_util.dumps(doc, json_options=JSON_OPTIONS))
+            part_file.write("\n")
+            part_count += 1
+            last_doc_id = doc["_id"]
 
-        # Connect to MongoDB
-        client = MongoClient(MONGODB_URL)
-        db = client[DATABASE_NAME]
+            if part_count >= docs_per_part:
+                part_file.close()
+                part_file = None
+                checkpoint["parts"] += 1
+                checkpoint["count"] += part_count
+                checkpoint["lastId"] = json_util.dumps(
+                    last_doc_id, json_options=JSON_OPTIONS
+                )
+                _write_checkpoint(backup_path, collection_name, checkpoint)
+                part_count = 0
+    finally:
+        if part_file is not None:
+            part_file.close()
 
-        # Get all collections
-        collections = db.list_collection_names()
-        backup_stats = {}
+    if part_count:
+        checkpoint["parts"] += 1
+        checkpoint["count"] += part_count
+        checkpoint["lastId"] = json_util.dumps(last_doc_id, json_options=JSON_OPTIONS)
+    checkpoint["complete"] = True
+    _write_checkpoint(backup_path, collection_name, checkpoint)
+    return checkpoint["count"]
 
-        for collection_name in collections:
-            collection = db[collection_name]
-            documents = list(collection.find({}))
 
-            # Convert ObjectId to string for JSON serialization
-            for doc in documents:
-                doc["_id"] = str(doc["_id"])
+def create_backup(
+    db=None,
+    backup_dir="backups",
+    collections=None,
+    compression="gzip",
+    batch_size=BATCH_SIZE,
+    docs_per_part=DOCS_PER_PART,
+    workers=WORKERS,
+    resume=None,
+):
+    """
+    Create a backup of all collections (or the given ones).
 
-            # Save to file
-            backup_file = os.path.join(backup_path, f"{collection_name}.json")
-            with open(backup_file, "w") as f:
-                json.dump(documents, f, indent=2, default=str)
+    Collections are backed up in parallel. Pass the path of an interrupted
+    backup as `resume` to continue it instead of starting a new one.
+    Returns the backup path and its metadata.
+    """
+    try:
+        if resume:
+            backup_path = resume
+            with open(os.path.join(backup_path, METADATA_FILE), "r") as f:
+                metadata = json.load(f)
+            compression = metadata["compression"]
+        else:
+            backup_time = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_path = os.path.join(backup_dir, f"backup_{backup_time}")
+            os.makedirs(backup_path, exist_ok=True)
+            metadata = None
 
-            backup_stats[collection_name] = len(documents)
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
 
-        # Save backup metadata
-        metadata = {
-            "timestamp": datetime.now().isoformat(),
-            "database": DATABASE_NAME,
-            "collections": backup_stats,
-            "total_documents": sum(backup_stats.values()),
-        }
+        # Connect to MongoDB
+        db = db if db is not None else _get_database()
+        if metadata is None:
+            metadata = {
+                "version": BACKUP_FORMAT_VERSION,
+                "timestamp": datetime.now().isoformat(),
+                "database": db.name,
+                "compression": compression,
+                "collections": {},
+                "total_documents": 0,
+                "complete": False,
+            }
+            # Written up front so that an interrupted backup can be resumed
+            _write_metadata(backup_path, metadata)
 
-        with open(os.path.join(backup_path, "backup_metadata.json"), "w") as f:
-            json.dump(metadata, f, indent=2)
+        collection_names = (
+            collections
+            or list(metadata["collections"])
+            or sorted(db.list_collection_names())
+        )
+        metadata["collections"] = {name: None for name in collection_names}
+        _write_metadata(backup_path, metadata)
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {
+                name: executor.submit(
+                    backup_collection,
+                    db,
+                    backup_path,
+                    name,
+                    compression,
+                    batch_size,
+                    docs_per_part,
+                )
+                for name in collection_names
+            }
+            backup_stats = {name: future.result() for name, future in futures.items()}
+
+        # Save backup metadata
+        metadata.update(
+            {
+                "collections": backup_stats,
+                "total_documents": sum(backup_stats.values()),
+                "duration_seconds": round(time.perf_counter() - start_time, 3),
+                "complete": True,
+            }
+        )
+        _write_metadata(backup_path, metadata)
 
         return backup_path, metadata
 
@@ -72,10 +262,147 @@ def create_backup():
         raise
 
 
-if __name__ == "__main__":
-    backup_path, metadata = create_backup()
+def _write_metadata(backup_path, metadata):
+    with open(os.path.join(backup_path, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+
+
+def iter_backup_documents(backup_path, collection_name):
+    """
+    Stream the documents of one collection from a backup.
+
+    Also reads backups made by the previous version of this script (a single
+    `<collection>.json` array with string `_id`s).
+    """
+    legacy_file = os.path.join(backup_path, f"{collection_name}.json")
+    if os.path.exists(legacy_file):
+        with open(legacy_file, "r") as f:
+            documents = json.load(f)
+        for doc in documents:
+            if ObjectId.is_valid(doc["_id"]):
+                doc["_id"] = ObjectId(doc["_id"])
+            yield doc
+        return
+
+    with open(os.path.join(backup_path, METADATA_FILE), "r") as f:
+        compression = json.load(f)["compression"]
+    checkpoint = _read_checkpoint(backup_path, collection_name)
+    if not checkpoint["parts"]:
+        if not os.path.isdir(_collection_dir(backup_path, collection_name)):
+            raise FileNotFoundError(
+                f"Collection {collection_name} not found in backup: {backup_path}"
+            )
+        return
+
+    # Only parts covered by the checkpoint are complete
+    for part in range(checkpoint["parts"]):
+        path = _part_path(backup_path, collection_name, part, compression)
+        with _open_text(path, "rt", compression) as f:
+            for line in f:
+                if line.strip():
+                    yield json_util.loads(line, json_options=JSON_OPTIONS)
+
+
+def restore_collection(
+    db, backup_path, collection_name, drop=False, batch_size=BATCH_SIZE
+):
+    """
+    Stream one collection from a backup into the database in batches.
+
+    Documents that already exist are skipped, so an interrupted restore can
+    simply be run again. Returns the number of documents inserted.
+    """
+    collection = db[collection_name]
+    if drop:
+        collection.drop()
+
+    inserted = 0
+    batch = []
+    for doc in iter_backup_documents(backup_path, collection_name):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            inserted += _insert_batch(collection, batch)
+            batch = []
+    if batch:
+        inserted += _insert_batch(collection, batch)
+    return inserted
+
+
+def _insert_batch(collection, batch):
+    try:
+        return len(collection.insert_many(batch, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != 11000 for error in errors):
+            raise
+        # Only duplicates failed: those documents were restored before
+        return e.details.get("nInserted", len(batch) - len(errors))
+
+
+def restore_backup(
+    backup_path,
+    db=None,
+    collections=None,
+    drop=False,
+    batch_size=BATCH_SIZE,
+    workers=WORKERS,
+):
+    """Restore all collections (or the given ones) of a backup in parallel"""
+    db = db if db is not None else _get_database()
+    with open(os.path.join(backup_path, METADATA_FILE), "r") as f:
+        metadata = json.load(f)
+    collection_names = collections or list(metadata["collections"])
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            name: executor.submit(
+                restore_collection, db, backup_path, name, drop, batch_size
+            )
+            for name in collection_names
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up or restore the database")
+    parser.add_argument("--collections", help="Comma separated collection names")
+    parser.add_argument("--compression", choices=sorted(EXTENSIONS), default="gzip")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--resume", metavar="BACKUP_PATH")
+    parser.add_argument("--restore", metavar="BACKUP_PATH")
+    parser.add_argument(
+        "--drop", action="store_true", help="Drop collections before restoring"
+    )
+    args = parser.parse_args()
+    collections = args.collections.split(",") if args.collections else None
+
+    if args.restore:
+        stats = restore_backup(
+            args.restore,
+            collections=collections,
+            drop=args.drop,
+            batch_size=args.batch_size,
+            workers=args.workers,
+        )
+        print(f"Backup restored from: {args.restore}")
+        for coll, count in stats.items():
+            print(f"{coll}: {count} documents inserted")
+        return
+
+    backup_path, metadata = create_backup(
+        collections=collections,
+        compression=args.compression,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        resume=args.resume,
+    )
     print(f"Backup created successfully at: {backup_path}")
     print("\nBackup statistics:")
     print(f"Total documents: {metadata['total_documents']}")
     for coll, count in metadata["collections"].items():
         print(f"{coll}: {count} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,12 @@ This script:
 4. Logs migration statistics
 """
 
-import json
 import logging
 import os
 import sys
 from datetime import datetime
 
-from backup_db import create_backup
-from bson import ObjectId
+from backup_db import BATCH_SIZE, create_backup, iter_backup_documents
 from dotenv import load_dotenv
 from pymongo import MongoClient, UpdateOne
 
@@ -126,22 +124,21 @@ def rollback_migration(backup_path):
         client = MongoClient(MONGODB_URL)
         db = client[DATABASE_NAME]
 
-        backup_file_path = os.path.join(backup_path, "users.json")
-        if not os.path.exists(backup_file_path):
-            raise FileNotFoundError(f"Backup file not found: {backup_file_path}")
-
-        # Read users collection backup
-        with open(backup_file_path, "r") as f:
-            users_backup = json.load(f)
-
-        # Convert string IDs back to ObjectId
-        for user in users_backup:
-            user["_id"] = ObjectId(user["_id"])
+        # Read users collection backup (raises FileNotFoundError if missing)
+        users_backup = iter_backup_documents(backup_path, "users")
+        first_user = next(users_backup, None)
 
         # Replace current users collection with backup
         db.users.drop()
-        if users_backup:
-            db.users.insert_many(users_backup)
+        if first_user is not None:
+            batch = [first_user]
+            for user in users_backup:
+                batch.append(user)
+                if len(batch) >= BATCH_SIZE:
+                    db.users.insert_many(batch)
+                    batch = []
+            if batch:
+                db.users.insert_many(batch)
 
         logger.info(f"Successfully rolled back to backup: {backup_path}")
         return True
@@ -0,0 +1,165 @@
+"""
+Migration script to move inline base64 images out of user and group documents.
+This script:
+1. Creates a backup of the users and groups collections
+2. Finds documents whose imageUrl is a data URL, in batches ordered by _id
+3. Stores each image in blob storage and replaces imageUrl with its short URL
+4. Records the conversions in the change log like any other profile or group
+   edit (groups get a new version), and copies the new image URLs of users
+   into their group member snapshots
+5. Logs migration statistics
+
+Documents are only updated if their imageUrl did not change in the meantime,
+and converted documents no longer match, so the script can be re-run safely.
+
+Usage:
+    python migrate_inline_images.py [--batch-size 100] [--dry-run] [--skip-backup]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import (  # noqa: E402
+    close_mongo_connection,
+    connect_to_mongo,
+    get_database,
+)
+from app.groups.service import group_service  # noqa: E402
+from app.storage.images import decode_data_url, store_image  # noqa: E402
+from app.sync.changes import GROUP, USER, change, record_changes  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from pymongo import UpdateOne  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ("users", "groups")
+BATCH_SIZE = 100
+
+
+async def migrate_collection(db, collection_name, batch_size=BATCH_SIZE, dry_run=False):
+    """
+    Convert inline images of one collection, `batch_size` documents at a time.
+    Returns statistics about the migration.
+    """
+    collection = db[collection_name]
+    stats = {
+        "scanned": 0,
+        "migrated": 0,
+        "failed": 0,
+        "bytes_moved": 0,
+        "snapshot_groups": 0,
+    }
+    query = {"imageUrl": {"$regex": "^data:"}}
+    last_id = None
+
+    while True:
+        batch_query = dict(query)
+        if last_id is not None:
+            batch_query["_id"] = {"$gt": last_id}
+        docs = (
+            await collection.find(batch_query, {"imageUrl": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(batch_size)
+        )
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        updates, urls = [], {}
+        for doc in docs:
+            stats["scanned"] += 1
+            data_url = doc["imageUrl"]
+            try:
+                data = decode_data_url(data_url)
+                url = data_url if dry_run else await store_image(data)
+            except (ValueError, HTTPException) as e:
+                detail = getattr(e, "detail", str(e))
+                logger.warning(f"Skipping {collection_name} {doc['_id']}: {detail}")
+                stats["failed"] += 1
+                continue
+            stats["bytes_moved"] += len(data_url)
+            urls[doc["_id"]] = url
+            update = {"$set": {"imageUrl": url}}
+            if collection_name == "groups":
+                update["$inc"] = {"version": 1}
+            updates.append(UpdateOne({"_id": doc["_id"], "imageUrl": data_url}, update))
+
+        if updates and not dry_run:
+            result = await collection.bulk_write(updates, ordered=False)
+            stats["migrated"] += result.modified_count
+            # Documents whose image changed in the meantime were left alone
+            converted = await collection.distinct(
+                "_id",
+                {"_id": {"$in": list(urls)}, "imageUrl": {"$in": list(urls.values())}},
+            )
+            await record_conversions(db, collection_name, converted, stats)
+        elif dry_run:
+            stats["migrated"] += len(updates)
+        logger.info(f"{collection_name}: {stats['scanned']} documents processed")
+
+    return stats
+
+
+async def record_conversions(db, collection_name, ids, stats):
+    """
+    Publish converted documents the way the API publishes image edits, so
+    clients and caches pick up the new URLs.
+    """
+    if collection_name == "users":
+        user_ids = [str(user_id) for user_id in ids]
+        await record_changes(
+            db.changes, None, [change(USER, user_id) for user_id in user_ids]
+        )
+        stats["snapshot_groups"] += await group_service.refresh_member_profiles(
+            user_ids
+        )
+    else:
+        for group_id in ids:
+            await record_changes(db.changes, group_id, [change(GROUP, str(group_id))])
+
+
+async def migrate_inline_images(batch_size=BATCH_SIZE, dry_run=False):
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        return {
+            name: await migrate_collection(db, name, batch_size, dry_run)
+            for name in COLLECTIONS
+        }
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--skip-backup", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_backup and not args.dry_run:
+        from backup_db import create_backup
+
+        logger.info("Creating database backup...")
+        backup_path, _ = create_backup(collections=list(COLLECTIONS))
+        logger.info(f"Backup created at: {backup_path}")
+
+    logger.info("Starting inline image migration...")
+    results = asyncio.run(migrate_inline_images(args.batch_size, args.dry_run))
+
+    logger.info("Migration completed. Statistics:")
+    for name, stats in results.items():
+        logger.info(
+            f"{name}: {stats['scanned']} inline images, {stats['migrated']} migrated, "
+            f"{stats['failed']} failed, {stats['bytes_moved'] / 1024:.0f} KB moved, "
+            f"member snapshots updated in {stats['snapshot_groups']} groups"
+        )
@@ -0,0 +1,68 @@
+"""
+Repair script for the per-group expense and settlement counters.
+This script:
+1. Iterates over all groups, or the groups given with --group
+2. Recounts each group's stats from its expenses and settlements
+3. Stores the recounted stats and reports the groups whose counters had drifted
+
+Counters are normally maintained with $inc on every expense and settlement
+change; run this after restoring data or if a counter update failed.
+
+Usage:
+    python recount_group_stats.py [--group GROUP_ID ...]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import close_mongo_connection, connect_to_mongo  # noqa: E402
+from app.expenses.service import expense_service  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def recount_groups(group_ids=None):
+    """
+    Recount the stats of the given groups (all groups by default).
+    Returns how many groups were recounted and how many had drifted.
+    """
+    query = {"_id": {"$in": [ObjectId(gid) for gid in group_ids]}} if group_ids else {}
+    stats = {"recounted": 0, "repaired": 0}
+
+    async for group in expense_service.groups_collection.find(query, {"stats": 1}):
+        group_id = str(group["_id"])
+        recounted = await expense_service.recount_group_stats(group_id)
+        stats["recounted"] += 1
+        if group.get("stats") != recounted:
+            logger.info(f"Group {group_id}: {group.get('stats')} -> {recounted}")
+            stats["repaired"] += 1
+
+    return stats
+
+
+async def main(group_ids=None):
+    await connect_to_mongo()
+    try:
+        return await recount_groups(group_ids)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--group", action="append", dest="groups", metavar="GROUP_ID")
+    args = parser.parse_args()
+
+    stats = asyncio.run(main(args.groups))
+    logger.info(
+        f"Recounted {stats['recounted']} groups, {stats['repaired']} had drifted"
+    )
@@ -0,0 +1,90 @@
+"""
+Cleanup script for expenses, settlements and attachments of deleted groups.
+This script:
+1. Collects the group ids referenced by expenses, settlements and attachments
+2. Finds the ones whose group no longer exists
+3. Removes their data with the same batched job that runs when a group is deleted
+
+Deleting a group removes its data in the background; run this once for groups
+deleted before that was the case. With --dry-run the orphaned groups are only
+reported.
+
+Usage:
+    python sweep_orphaned_group_data.py [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import close_mongo_connection, connect_to_mongo  # noqa: E402
+from app.groups.service import (  # noqa: E402
+    DELETE_GROUP_DATA,
+    GROUP_DATA_COLLECTIONS,
+    group_service,
+)
+from app.jobs import job_queue  # noqa: E402
+from bson import ObjectId  # noqa: E402
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+async def find_orphaned_groups():
+    """Ids of groups that no longer exist but still have data"""
+    db = group_service.get_db()
+    referenced = set()
+    for name in GROUP_DATA_COLLECTIONS:
+        async for row in db[name].aggregate([{"$group": {"_id": "$groupId"}}]):
+            if row["_id"] is not None:
+                referenced.add(row["_id"])
+
+    referenced = sorted(referenced)
+    existing = set()
+    for start in range(0, len(referenced), BATCH_SIZE):
+        ids = [
+            ObjectId(gid)
+            for gid in referenced[start : start + BATCH_SIZE]
+            if ObjectId.is_valid(gid)
+        ]
+        async for group in db.groups.find({"_id": {"$in": ids}}, {"_id": 1}):
+            existing.add(str(group["_id"]))
+    return [gid for gid in referenced if gid not in existing]
+
+
+async def sweep(dry_run=False):
+    """Remove the data of orphaned groups. Returns the orphaned group ids."""
+    orphaned = await find_orphaned_groups()
+    for group_id in orphaned:
+        logger.info(f"Group {group_id} no longer exists but has data")
+        if not dry_run:
+            await group_service.delete_group_data(group_id)
+    if not dry_run:
+        await job_queue.run_pending(group_service.get_db().jobs, [DELETE_GROUP_DATA])
+    return orphaned
+
+
+async def main(dry_run=False):
+    await connect_to_mongo()
+    try:
+        return await sweep(dry_run)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    orphaned = asyncio.run(main(args.dry_run))
+    action = "Found" if args.dry_run else "Removed the data of"
+    logger.info(f"{action} {len(orphaned)} deleted groups")
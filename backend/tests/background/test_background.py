@@ -0,0 +1,74 @@
+import asyncio
+import io
+
+import pytest
+from app import background
+from app.images import RECEIPT_VARIANTS, VariantSpec, generate_variants, resize_image
+from PIL import Image
+
+
+def make_image(width, height, mode="RGB", format="PNG"):
+    output = io.BytesIO()
+    Image.new(mode, (width, height)).save(output, format=format)
+    return output.getvalue()
+
+
+def test_resize_image_fits_within_max_size():
+    variant = resize_image(make_image(2000, 1000), VariantSpec(400, "JPEG"))
+
+    assert (variant.width, variant.height) == (400, 200)
+    assert variant.content_type == "image/jpeg"
+    assert Image.open(io.BytesIO(variant.data)).size == (400, 200)
+
+
+def test_resize_image_never_upscales_and_converts_alpha_for_jpeg():
+    variant = resize_image(make_image(100, 50, mode="RGBA"), VariantSpec(400, "JPEG"))
+
+    assert (variant.width, variant.height) == (100, 50)
+    assert Image.open(io.BytesIO(variant.data)).mode == "RGB"
+
+
+def test_generate_variants_produces_every_receipt_variant(mocker):
+    open_image = mocker.spy(Image, "open")
+    variants = generate_variants(make_image(2000, 1000), RECEIPT_VARIANTS)
+
+    assert set(variants) == set(RECEIPT_VARIANTS)
+    assert variants["webp"].content_type == "image/webp"
+    # Every variant is made from the full image, which is decoded once
+    assert (variants["thumbnail"].width, variants["webp"].width) == (320, 1600)
+    assert open_image.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_run_in_process_uses_process_pool():
+    try:
+        variants = await background.run_in_process(
+            generate_variants, make_image(640, 480), RECEIPT_VARIANTS
+        )
+        assert (variants["thumbnail"].width, variants["thumbnail"].height) == (
+            320,
+            240,
+        )
+    finally:
+        await background.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_spawn_logs_failures_and_drain_waits(mocker):
+    mock_logger = mocker.patch("app.background.logger")
+    finished = []
+
+    async def succeed():
+        await asyncio.sleep(0)
+        finished.append(True)
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    background.spawn(succeed(), name="ok")
+    background.spawn(fail(), name="broken")
+    await background.drain()
+
+    assert finished == [True]
+    mock_logger.error.assert_called_once()
+    assert "broken" in mock_logger.error.call_args.args[0]
@@ -0,0 +1,227 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from app.cache import (
+    LOCAL_CACHE_TTL,
+    MemoryCache,
+    RedisCache,
+    SingleFlight,
+    invalidation_ttl,
+)
+from app.config import settings
+from app.expenses.service import ExpenseService
+from app.groups.service import GroupService
+from app.invalidation import invalidation_bus
+from bson import ObjectId
+
+
+@pytest.fixture
+def memory_cache():
+    return MemoryCache(maxsize=100)
+
+
+@pytest.fixture
+async def redis_cache():
+    fakeredis = pytest.importorskip("fakeredis")
+    cache = RedisCache("redis://test", client=fakeredis.FakeAsyncRedis())
+    yield cache
+    await cache.close()
+
+
+@pytest.fixture(params=["memory_cache", "redis_cache"])
+def cache(request):
+    return request.getfixturevalue(request.param)
+
+
+@pytest.mark.asyncio
+async def test_get_set_delete_and_mget(cache):
+    await cache.set("a", {"value": 1})
+    await cache.set("b", [1, 2])
+
+    assert await cache.get("a") == {"value": 1}
+    assert await cache.mget(["a", "missing", "b"]) == [{"value": 1}, None, [1, 2]]
+
+    await cache.delete("a")
+    assert await cache.get("a", "default") == "default"
+    assert cache.metrics()["hits"] == 3
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl(cache):
+    await cache.set("short", 1, ttl=0.05)
+    await cache.set("long", 2, ttl=60)
+    await asyncio.sleep(0.1)
+
+    assert await cache.mget(["short", "long"]) == [None, 2]
+
+
+@pytest.mark.asyncio
+async def test_redis_tag_sets_expire_with_their_longest_lived_key(redis_cache):
+    client = redis_cache.client
+    await redis_cache.set("a", 1, ttl=10, tags=["group:1"])
+    await redis_cache.set("b", 2, ttl=60, tags=["group:1"])
+    await redis_cache.set("c", 3, ttl=5, tags=["group:1"])
+    assert 50_000 < await client.pttl("cache:tag:group:1") <= 60_000
+
+    # Entries without a TTL are kept for a day when tagged
+    await redis_cache.set("d", 4, tags=["group:1"])
+    assert await client.pttl("cache:tag:group:1") > 60_000
+    assert await client.pttl("cache:d") > 60_000
+
+
+@pytest.mark.asyncio
+async def test_invalidate_tags_drops_tagged_entries(cache):
+    await cache.set("balance:u1", 10, tags=["group:g1", "user:u1"])
+    await cache.set("balance:u2", 20, tags=["group:g2"])
+    await cache.set("member:g1:u2", True, tags=["group:g1"])
+
+    await cache.invalidate_tags("group:g1")
+
+    assert await cache.mget(["balance:u1", "balance:u2", "member:g1:u2"]) == [
+        None,
+        20,
+        None,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_computes_once_for_concurrent_misses(cache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "settlements"
+
+    results = await asyncio.gather(
+        *(cache.get_or_set("settlements:g1", compute) for _ in range(10))
+    )
+
+    assert results == ["settlements"] * 10
+    assert calls == 1
+    assert cache.metrics()["coalesced"] == 9
+    assert await cache.get_or_set("settlements:g1", compute) == "settlements"
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_caches_falsy_values(cache):
+    async def compute():
+        return None
+
+    await cache.get_or_set("user:missing", compute)
+    assert await cache.get_or_set("user:missing", compute) is None
+    assert cache.metrics()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_value_computed_from_invalidated_data_is_not_stored(cache):
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def compute():
+        started.set()
+        await release.wait()
+        return "old"
+
+    fill = asyncio.create_task(cache.get_or_set("k", compute, tags=["group:g1"]))
+    await started.wait()
+    await cache.invalidate_tags("group:g1")
+    release.set()
+
+    assert await fill == "old"
+    assert await cache.get("k") is None
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(maxsize=2)
+    await cache.set("a", 1, tags=["t"])
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # "b" is now the least recently used
+    await cache.set("c", 3)
+
+    assert await cache.mget(["a", "b", "c"]) == [1, None, 3]
+    assert len(cache) == 2
+    assert cache.metrics()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_membership_checks_are_cached_until_the_group_changes(mock_db):
+    admin, member = str(ObjectId()), str(ObjectId())
+    group = await GroupService().create_group({"name": "Trip"}, admin)
+    await GroupService().join_group_by_code(group["joinCode"], member)
+    service = ExpenseService()
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        assert await service.is_group_member(group["_id"], member)
+        with patch.object(mock_db.groups, "find_one") as find_one:
+            assert await service.is_group_member(group["_id"], member)
+            find_one.assert_not_called()
+
+        await GroupService().remove_member(group["_id"], member, admin)
+        assert not await service.is_group_member(group["_id"], member)
+
+
+def test_entries_are_kept_briefly_when_other_workers_cannot_invalidate(monkeypatch):
+    monkeypatch.setattr(settings, "cache_backend", "memory")
+    monkeypatch.setattr(invalidation_bus, "mode", "local")
+    assert invalidation_ttl(300) == LOCAL_CACHE_TTL
+
+    monkeypatch.setattr(invalidation_bus, "mode", "changeStream")
+    assert invalidation_ttl(300) == 300
+
+    monkeypatch.setattr(invalidation_bus, "mode", "reconnecting")
+    monkeypatch.setattr(settings, "cache_backend", "redis")
+    assert invalidation_ttl(300) == 300
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_concurrent_calls_only():
+    flights = SingleFlight()
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert (
+        await asyncio.gather(*(flights.run("k", compute) for _ in range(5))) == [1] * 5
+    )
+    # Nothing is kept once the call finished
+    assert await flights.run("k", compute) == 2
+    assert flights.metrics() == {"calls": 2, "coalesced": 4, "inFlight": 0}
+
+
+@pytest.mark.asyncio
+async def test_single_flight_survives_a_cancelled_caller():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    first = asyncio.create_task(flights.run("k", compute))
+    second = asyncio.create_task(flights.run("k", compute))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_every_caller():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        *(flights.run("k", fail) for _ in range(3)), return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results)
@@ -0,0 +1,138 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from app.auth.security import create_access_token
+from app.groups.service import group_service
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+from main import app
+
+MEMBER_ID = str(ObjectId())
+OUTSIDER_ID = str(ObjectId())
+
+
+def auth_headers(user_id, **extra):
+    token = create_access_token({"sub": user_id}, expires_delta=timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}", **extra}
+
+
+@pytest.fixture
+async def async_client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+@pytest.fixture
+async def group_id(mock_db, monkeypatch):
+    monkeypatch.setattr(
+        "app.expenses.service.mongodb", SimpleNamespace(database=mock_db)
+    )
+    group_id = ObjectId()
+    await mock_db.users.insert_one({"_id": ObjectId(MEMBER_ID), "name": "Alice"})
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "name": "Trip",
+            "currency": "USD",
+            "joinCode": "ABC123",
+            "createdBy": MEMBER_ID,
+            "createdAt": datetime.utcnow(),
+            "members": [
+                {"userId": MEMBER_ID, "role": "admin", "joinedAt": datetime.utcnow()}
+            ],
+            "version": 3,
+        }
+    )
+    return str(group_id)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "path",
+    ["/groups", "/groups/{group_id}", "/groups/{group_id}/expenses"],
+)
+async def test_unchanged_resource_returns_304(async_client, group_id, path):
+    url = path.format(group_id=group_id)
+    first = await async_client.get(url, headers=auth_headers(MEMBER_ID))
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "private, no-cache"
+
+    second = await async_client.get(
+        url, headers=auth_headers(MEMBER_ID, **{"If-None-Match": etag})
+    )
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_304_skips_the_service_call(async_client, group_id):
+    url = f"/groups/{group_id}"
+    etag = (await async_client.get(url, headers=auth_headers(MEMBER_ID))).headers[
+        "ETag"
+    ]
+
+    with patch.object(group_service, "get_group_by_id") as get_group:
+        response = await async_client.get(
+            url, headers=auth_headers(MEMBER_ID, **{"If-None-Match": etag})
+        )
+
+    assert response.status_code == 304
+    get_group.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_etag_changes_with_group_version(async_client, group_id, mock_db):
+    url = f"/groups/{group_id}"
+    etag = (await async_client.get(url, headers=auth_headers(MEMBER_ID))).headers[
+        "ETag"
+    ]
+
+    await async_client.patch(
+        url, json={"name": "Trip 2"}, headers=auth_headers(MEMBER_ID)
+    )
+    response = await async_client.get(
+        url, headers=auth_headers(MEMBER_ID, **{"If-None-Match": etag})
+    )
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "Trip 2"
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_friends_balance_etag_follows_user_groups(
+    async_client, group_id, mock_db
+):
+    url = "/users/me/friends-balance"
+    first = await async_client.get(url, headers=auth_headers(MEMBER_ID))
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    await mock_db.groups.insert_one(
+        {
+            "_id": ObjectId(),
+            "name": "New",
+            "members": [{"userId": MEMBER_ID, "joinedAt": datetime.utcnow()}],
+        }
+    )
+    response = await async_client.get(
+        url, headers=auth_headers(MEMBER_ID, **{"If-None-Match": etag})
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_non_members_get_no_etag(async_client, group_id):
+    response = await async_client.get(
+        f"/groups/{group_id}", headers=auth_headers(OUTSIDER_ID)
+    )
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
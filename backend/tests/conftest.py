@@ -1,11 +1,17 @@
 import os  # Added
 import sys  # Added
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
 from pathlib import Path  # Added
 from unittest.mock import MagicMock, patch
 
 import firebase_admin  # Added
 import pytest
 import pytest_asyncio
+from mongomock.collection import BulkOperationBuilder
+from mongomock.collection import Collection as MongoMockCollection
 from mongomock_motor import AsyncMongoMockClient
 
 # Add project root to sys.path to allow imports from app and main
@@ -13,6 +19,17 @@ from mongomock_motor import AsyncMongoMockClient
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
+# pymongo >= 4.11 passes a `sort` option for UpdateOne in bulk writes, which
+# mongomock does not know about yet
+_mongomock_add_update = BulkOperationBuilder.add_update
+
+
+def _add_update_ignoring_sort(self, *args, sort=None, **kwargs):
+    return _mongomock_add_update(self, *args, **kwargs)
+
+
+BulkOperationBuilder.add_update = _add_update_ignoring_sort
+
 
 @pytest.fixture(scope="session", autouse=True)
 def mock_firebase_admin(request):
@@ -61,6 +78,12 @@ def mock_firebase_admin(request):
     yield
 
 
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Start every test with an empty shared cache"""
+    monkeypatch.setattr("app.cache._cache", None)
+
+
 @pytest_asyncio.fixture(scope="function", autouse=True)
 async def mock_db():
     print("mock_db fixture: Creating AsyncMongoMockClient")
@@ -94,3 +117,89 @@ async def mock_db():
     # mongomock doesn't have a straightforward way to list all collections like a real DB,
     # so we might need to clear known collections if necessary, or rely on new client per test.
     # For now, a new AsyncMongoMockClient per function scope should provide good isolation.
+
+
+# Collection methods counted by the assert_max_queries fixture, mapped to the
+# MongoDB command each of them issues against a real server
+COUNTED_COLLECTION_METHODS = {
+    "find": "find",
+    "find_one": "find",
+    "insert_one": "insert",
+    "insert_many": "insert",
+    "update_one": "update",
+    "update_many": "update",
+    "replace_one": "update",
+    "bulk_write": "update",
+    "delete_one": "delete",
+    "delete_many": "delete",
+    "find_one_and_update": "findAndModify",
+    "find_one_and_replace": "findAndModify",
+    "find_one_and_delete": "findAndModify",
+    "count_documents": "aggregate",
+    "aggregate": "aggregate",
+    "distinct": "distinct",
+}
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    Assert that a block issues at most `n` MongoDB commands against mongomock.
+
+        with assert_max_queries(2) as profile:
+            await async_client.get(f"/groups/{group_id}/members", headers=headers)
+
+    mongomock does not emit pymongo command events, so its collection methods
+    are wrapped to feed the same QueryProfile the profiling listener uses in
+    development. Nested calls made by mongomock internally are counted once.
+    """
+    from app.profiling import filter_shape, get_current_profile, profile_queries
+
+    local = threading.local()
+
+    def counted(method_name, command_name):
+        original = getattr(MongoMockCollection, method_name)
+
+        @wraps(original)
+        def wrapper(self, *args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            local.depth = depth + 1
+            start = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                local.depth = depth
+                profile = get_current_profile()
+                if depth == 0 and profile is not None:
+                    profile.record(
+                        command_name,
+                        self.name,
+                        (time.perf_counter() - start) * 1000,
+                        shape=filter_shape(args[0]) if args else None,
+                    )
+
+        return wrapper
+
+    patches = [
+        patch.object(MongoMockCollection, name, counted(name, command))
+        for name, command in COUNTED_COLLECTION_METHODS.items()
+    ]
+    for p in patches:
+        p.start()
+
+    @contextmanager
+    def check(max_queries: int):
+        with profile_queries() as profile:
+            yield profile
+        issued = "\n".join(
+            f"  {c.name} {c.collection} {c.shape}" for c in profile.commands
+        )
+        assert (
+            profile.count <= max_queries
+        ), f"Expected at most {max_queries} queries, got {profile.count}:\n{issued}"
+
+    try:
+        yield check
+    finally:
+        for p in patches:
+            p.stop()
@@ -0,0 +1,307 @@
+import io
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from app import background
+from app.auth.security import create_access_token
+from app.config import settings
+from app.jobs import job_queue
+from app.storage import LocalBlobStorage
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+from main import app
+from PIL import Image
+
+MEMBER_ID = str(ObjectId())
+OUTSIDER_ID = str(ObjectId())
+RECEIPT = b"\x89PNG fake receipt bytes " * 500
+
+
+def auth_headers(user_id):
+    token = create_access_token({"sub": user_id}, expires_delta=timedelta(minutes=5))
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def async_client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+def make_image(width=1200, height=900, format="PNG"):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format=format)
+    return output.getvalue()
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+@pytest.fixture(autouse=True)
+async def inline_processing(monkeypatch):
+    """Run image processing in-process and let background tasks finish"""
+    monkeypatch.setattr("app.expenses.service.run_in_process", run_inline)
+    yield
+    await background.drain()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalBlobStorage(str(tmp_path))
+    monkeypatch.setattr("app.storage._storage", storage)
+    return storage
+
+
+@pytest.fixture
+async def expense(mock_db, monkeypatch):
+    monkeypatch.setattr(
+        "app.expenses.service.mongodb", SimpleNamespace(database=mock_db)
+    )
+    group_id = ObjectId()
+    expense_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "name": "Trip",
+            "members": [{"userId": MEMBER_ID, "role": "admin"}],
+        }
+    )
+    await mock_db.expenses.insert_one(
+        {
+            "_id": expense_id,
+            "groupId": str(group_id),
+            "createdBy": MEMBER_ID,
+            "paidBy": MEMBER_ID,
+            "description": "Dinner",
+            "amount": 40.0,
+            "splits": [{"userId": MEMBER_ID, "amount": 40.0}],
+            "splitType": "equal",
+            "receiptUrls": [],
+            "createdAt": datetime.utcnow(),
+            "updatedAt": datetime.utcnow(),
+        }
+    )
+    return str(group_id), str(expense_id)
+
+
+async def upload(async_client, group_id, expense_id, content=RECEIPT, user=MEMBER_ID):
+    return await async_client.post(
+        f"/groups/{group_id}/expenses/{expense_id}/attachments",
+        files={"file": ("receipt.png", content, "image/png")},
+        headers=auth_headers(user),
+    )
+
+
+@pytest.mark.asyncio
+async def test_upload_and_download_attachment(async_client, storage, expense, mock_db):
+    group_id, expense_id = expense
+
+    response = await upload(async_client, group_id, expense_id)
+
+    assert response.status_code == 201
+    body = response.json()
+    assert body["size"] == len(RECEIPT)
+    assert body["contentType"] == "image/png"
+    assert body["url"].endswith(body["attachment_key"])
+    stored = await mock_db.expenses.find_one({"_id": ObjectId(expense_id)})
+    assert stored["receiptUrls"] == [body["url"]]
+
+    download = await async_client.get(body["url"], headers=auth_headers(MEMBER_ID))
+    assert download.status_code == 200
+    assert download.content == RECEIPT
+    assert download.headers["content-type"] == "image/png"
+    assert download.headers["accept-ranges"] == "bytes"
+    etag = download.headers["etag"]
+
+    not_modified = await async_client.get(
+        body["url"], headers={**auth_headers(MEMBER_ID), "If-None-Match": etag}
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    partial = await async_client.get(
+        body["url"], headers={**auth_headers(MEMBER_ID), "Range": "bytes=10-19"}
+    )
+    assert partial.status_code == 206
+    assert partial.content == RECEIPT[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(RECEIPT)}"
+
+
+@pytest.mark.asyncio
+async def test_identical_uploads_share_one_blob(
+    async_client, storage, expense, tmp_path
+):
+    group_id, expense_id = expense
+
+    first = await upload(async_client, group_id, expense_id)
+    second = await upload(async_client, group_id, expense_id)
+
+    assert first.json()["attachment_key"] != second.json()["attachment_key"]
+    blobs = [p for p in tmp_path.rglob("*") if p.is_file()]
+    assert len(blobs) == 1
+
+
+@pytest.mark.asyncio
+async def test_upload_rejects_oversized_file(
+    async_client, storage, expense, monkeypatch, tmp_path
+):
+    group_id, expense_id = expense
+    monkeypatch.setattr(settings, "attachment_max_bytes", 1000)
+
+    response = await upload(async_client, group_id, expense_id)
+
+    assert response.status_code == 413
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
+
+
+@pytest.mark.asyncio
+async def test_chunked_upload_is_cut_off_while_received(
+    async_client, storage, expense, monkeypatch
+):
+    group_id, expense_id = expense
+    monkeypatch.setattr(settings, "attachment_max_bytes", 1000)
+    sent = 0
+
+    async def body():
+        # No Content-Length, and far more than the limit
+        nonlocal sent
+        yield (
+            b"--b\r\nContent-Disposition: form-data; name=file; "
+            b'filename="r.png"\r\nContent-Type: image/png\r\n\r\n'
+        )
+        for _ in range(100):
+            sent += 16 * 1024
+            yield b"x" * (16 * 1024)
+        yield b"\r\n--b--\r\n"
+
+    response = await async_client.post(
+        f"/groups/{group_id}/expenses/{expense_id}/attachments",
+        content=body(),
+        headers={
+            **auth_headers(MEMBER_ID),
+            "Content-Type": "multipart/form-data; boundary=b",
+        },
+    )
+
+    assert response.status_code == 413
+    assert "1000 bytes" in response.json()["detail"]
+    assert sent < 100 * 16 * 1024
+
+
+@pytest.mark.asyncio
+async def test_non_member_cannot_upload_or_download(async_client, storage, expense):
+    group_id, expense_id = expense
+    uploaded = (await upload(async_client, group_id, expense_id)).json()
+
+    response = await upload(async_client, group_id, expense_id, user=OUTSIDER_ID)
+    assert response.status_code == 403
+
+    response = await async_client.get(
+        uploaded["url"], headers=auth_headers(OUTSIDER_ID)
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_download_unknown_attachment(async_client, storage, expense):
+    group_id, expense_id = expense
+
+    response = await async_client.get(
+        f"/groups/{group_id}/expenses/{expense_id}/attachments/missing.png",
+        headers=auth_headers(MEMBER_ID),
+    )
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_receipt_image_variants_are_generated_by_a_job(
+    async_client, storage, expense, mock_db
+):
+    group_id, expense_id = expense
+    headers = auth_headers(MEMBER_ID)
+
+    uploaded = (
+        await upload(async_client, group_id, expense_id, content=make_image())
+    ).json()
+    await job_queue.run_pending(mock_db.jobs)
+
+    attachment = await mock_db.attachments.find_one({"key": uploaded["attachment_key"]})
+    assert attachment["variantsStatus"] == "ready"
+    assert attachment["variants"]["thumbnail"]["width"] == 320
+    assert attachment["variants"]["thumbnail"]["height"] == 240
+    assert attachment["variants"]["webp"]["contentType"] == "image/webp"
+
+    thumbnail = await async_client.get(
+        f"{uploaded['url']}?variant=thumbnail", headers=headers
+    )
+    assert thumbnail.status_code == 200
+    assert thumbnail.headers["content-type"] == "image/jpeg"
+    assert Image.open(io.BytesIO(thumbnail.content)).size == (320, 240)
+
+    webp = await async_client.get(f"{uploaded['url']}?variant=webp", headers=headers)
+    assert Image.open(io.BytesIO(webp.content)).format == "WEBP"
+
+    listed = await async_client.get(f"/groups/{group_id}/expenses", headers=headers)
+    listed_expense = listed.json()["expenses"][0]
+    assert listed_expense["receiptUrls"] == [f"{uploaded['url']}?variant=thumbnail"]
+    assert listed_expense["receipts"] == [
+        {
+            "url": uploaded["url"],
+            "thumbnailUrl": f"{uploaded['url']}?variant=thumbnail",
+            "webpUrl": f"{uploaded['url']}?variant=webp",
+        }
+    ]
+
+    originals = await async_client.get(
+        f"/groups/{group_id}/expenses?receipts=original", headers=headers
+    )
+    assert originals.json()["expenses"][0]["receiptUrls"] == [uploaded["url"]]
+
+
+@pytest.mark.asyncio
+async def test_identical_receipt_images_reuse_variants(
+    async_client, storage, expense, mock_db, monkeypatch
+):
+    group_id, expense_id = expense
+    image = make_image()
+    await upload(async_client, group_id, expense_id, content=image)
+    await job_queue.run_pending(mock_db.jobs)
+
+    calls = []
+
+    async def counting_run(fn, *args):
+        calls.append(fn)
+        return fn(*args)
+
+    monkeypatch.setattr("app.expenses.service.run_in_process", counting_run)
+    await upload(async_client, group_id, expense_id, content=image)
+    await job_queue.run_pending(mock_db.jobs)
+
+    assert calls == []
+    attachments = await mock_db.attachments.find().to_list(None)
+    assert [a["variantsStatus"] for a in attachments] == ["ready", "ready"]
+    assert attachments[0]["variants"] == attachments[1]["variants"]
+
+
+@pytest.mark.asyncio
+async def test_undecodable_image_marks_variants_failed(
+    async_client, storage, expense, mock_db
+):
+    group_id, expense_id = expense
+
+    uploaded = (await upload(async_client, group_id, expense_id)).json()
+    await job_queue.run_pending(mock_db.jobs)
+
+    attachment = await mock_db.attachments.find_one({"key": uploaded["attachment_key"]})
+    assert attachment["variantsStatus"] == "failed"
+    response = await async_client.get(
+        f"{uploaded['url']}?variant=thumbnail", headers=auth_headers(MEMBER_ID)
+    )
+    assert response.status_code == 404
+    original = await async_client.get(uploaded["url"], headers=auth_headers(MEMBER_ID))
+    assert original.status_code == 200
@@ -1,5 +1,6 @@
 import asyncio
 from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
 from typing import Any
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -182,6 +183,56 @@ async def test_create_expense_payer_not_member(expense_service, mock_group_data)
         )
 
 
+@pytest.mark.asyncio
+async def test_create_expense_without_summary_refreshes_settlements_in_background(
+    expense_service, mock_db
+):
+    """Skipping the summary defers the optimization and warms the group's cache"""
+    from app import background
+
+    user_a, user_b = str(ObjectId()), str(ObjectId())
+    group_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {"_id": group_id, "members": [{"userId": user_a}, {"userId": user_b}]}
+    )
+    expense = ExpenseCreateRequest(
+        description="Taxi",
+        amount=40.0,
+        splits=[
+            ExpenseSplit(userId=user_a, amount=20.0),
+            ExpenseSplit(userId=user_b, amount=20.0),
+        ],
+        paidBy=user_a,
+    )
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        with patch.object(
+            expense_service,
+            "calculate_optimized_settlements",
+            wraps=expense_service.calculate_optimized_settlements,
+        ) as calculate:
+            result = await expense_service.create_expense(
+                str(group_id), expense, user_a, include_summary=False
+            )
+            assert result["groupSummary"] is None
+            calculate.assert_not_called()
+
+            await background.drain()
+            calculate.assert_called_once()
+
+            # Served from the cache until the group changes again
+            cached = await expense_service.get_optimized_settlements(str(group_id))
+            assert calculate.call_count == 1
+            assert [(s.fromUserId, s.toUserId, s.amount) for s in cached] == [
+                (user_b, user_a, 20.0)
+            ]
+
+            await expense_service.create_expense(str(group_id), expense, user_a)
+            refreshed = await expense_service.get_optimized_settlements(str(group_id))
+            assert calculate.call_count == 2
+            assert refreshed[0].amount == 40.0
+
+
 @pytest.mark.asyncio
 async def test_calculate_optimized_settlements_advanced(expense_service):
     """Test advanced settlement algorithm with real optimization logic"""
@@ -791,15 +842,34 @@ async def test_delete_expense_success(expense_service, mock_expense_data):
         mock_db.expenses.delete_one = AsyncMock(return_value=mock_delete_expense_result)
 
         # Mock successful deletion of related settlements
+        mock_settlements_cursor = AsyncMock()
+        mock_settlements_cursor.to_list.return_value = [
+            {"_id": ObjectId(), "amount": 50.0, "status": "completed"},
+            {"_id": ObjectId(), "amount": 50.0, "status": "pending"},
+        ]
+        mock_db.settlements.find.return_value = mock_settlements_cursor
         mock_delete_settlements_result = MagicMock()
         mock_delete_settlements_result.deleted_count = 2  # Assume 2 settlements deleted
         mock_db.settlements.delete_many = AsyncMock(
             return_value=mock_delete_settlements_result
         )
+        mock_db.groups.find_one_and_update = AsyncMock()
 
         result = await expense_service.delete_expense(group_id, expense_id, user_id)
 
         assert result is True
+        # Group counters are decremented in a single update
+        mock_db.groups.find_one_and_update.assert_called_once()
+        update = mock_db.groups.find_one_and_update.call_args[0][1]
+        assert update["$inc"] == {
+            "version": 1,
+            "stats.expenseCount": -1,
+            "stats.totalExpenses": -100.0,
+            "stats.settlementCount": -2,
+            "stats.pendingCount": -1,
+            "stats.pendingTotal": -50.0,
+        }
+        assert "lastActivityAt" in update["$max"]
         mock_db.expenses.find_one.assert_called_once_with(
             {"_id": ObjectId(expense_id), "groupId": group_id, "createdBy": user_id}
         )
@@ -866,11 +936,17 @@ async def test_delete_expense_failed_deletion(expense_service, mock_expense_data
         mock_delete_expense_result.deleted_count = 0  # Simulate DB deletion failure
         mock_db.expenses.delete_one = AsyncMock(return_value=mock_delete_expense_result)
 
+        mock_settlements_cursor = AsyncMock()
+        mock_settlements_cursor.to_list.return_value = []
+        mock_db.settlements.find.return_value = mock_settlements_cursor
         mock_db.settlements.delete_many = AsyncMock()
+        mock_db.groups.find_one_and_update = AsyncMock()
 
         result = await expense_service.delete_expense(group_id, expense_id, user_id)
 
         assert result is False  # Deletion failed
+        # Nothing was removed, so the group counters are left untouched
+        mock_db.groups.find_one_and_update.assert_not_called()
         # Settlements should still be attempted to be deleted
         mock_db.settlements.delete_many.assert_called_once()
         mock_db.expenses.delete_one.assert_called_once()
@@ -1261,24 +1337,15 @@ async def test_update_settlement_status_success(expense_service):
         "payeeName": "P2",
         "createdAt": datetime.now(timezone.utc) - timedelta(days=1),
     }
-    # Settlement doc after update
-    updated_settlement_doc = original_settlement_doc.copy()
-    updated_settlement_doc["status"] = new_status.value
-    updated_settlement_doc["paidAt"] = paid_at_time
-    updated_settlement_doc["updatedAt"] = datetime.now(
-        timezone.utc
-    )  # Will be set by the method
-
     with patch("app.expenses.service.mongodb") as mock_mongodb:
         mock_db = MagicMock()
         mock_mongodb.database = mock_db
 
-        mock_update_result = MagicMock()
-        mock_update_result.matched_count = 1
-        mock_db.settlements.update_one = AsyncMock(return_value=mock_update_result)
-
-        # find_one is called to retrieve the updated document
-        mock_db.settlements.find_one = AsyncMock(return_value=updated_settlement_doc)
+        # find_one_and_update returns the document as it was before the update
+        mock_db.settlements.find_one_and_update = AsyncMock(
+            return_value=original_settlement_doc
+        )
+        mock_db.groups.find_one_and_update = AsyncMock()
 
         result = await expense_service.update_settlement_status(
             group_id, settlement_id_str, new_status, paid_at=paid_at_time
@@ -1289,8 +1356,8 @@ async def test_update_settlement_status_success(expense_service):
         assert result.status == new_status.value
         assert result.paidAt == paid_at_time
 
-        mock_db.settlements.update_one.assert_called_once()
-        update_call_args = mock_db.settlements.update_one.call_args[0]
+        mock_db.settlements.find_one_and_update.assert_called_once()
+        update_call_args = mock_db.settlements.find_one_and_update.call_args[0]
         assert update_call_args[0] == {
             "_id": settlement_id_obj,
             "groupId": group_id,
@@ -1301,7 +1368,14 @@ async def test_update_settlement_status_success(expense_service):
         assert set_doc["paidAt"] == paid_at_time
         assert "updatedAt" in set_doc
 
-        mock_db.settlements.find_one.assert_called_once_with({"_id": settlement_id_obj})
+        # The settlement is no longer pending
+        update = mock_db.groups.find_one_and_update.call_args[0][1]
+        assert update["$inc"] == {
+            "version": 1,
+            "stats.pendingCount": -1,
+            "stats.pendingTotal": -10,
+        }
+        assert "lastActivityAt" in update["$max"]
 
 
 @pytest.mark.asyncio
@@ -1317,11 +1391,9 @@ async def test_update_settlement_status_not_found(expense_service):
         mock_db = MagicMock()
         mock_mongodb.database = mock_db
 
-        mock_update_result = MagicMock()
-        mock_update_result.matched_count = 0  # Simulate settlement not found
-        mock_db.settlements.update_one = AsyncMock(return_value=mock_update_result)
-
-        mock_db.settlements.find_one = AsyncMock(return_value=None)
+        # Simulate settlement not found
+        mock_db.settlements.find_one_and_update = AsyncMock(return_value=None)
+        mock_db.groups.find_one_and_update = AsyncMock()
 
         """with pytest.raises(ValueError, match="Settlement not found"):
             await expense_service.update_settlement_status(
@@ -1336,8 +1408,8 @@ async def test_update_settlement_status_not_found(expense_service):
         assert exc_info.value.status_code == 404
         assert exc_info.value.detail == "Settlement not found"
 
-        # Should not be called if update fails
-        mock_db.settlements.find_one.assert_not_called()
+        # Counters are not touched if update fails
+        mock_db.groups.find_one_and_update.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -1356,9 +1428,10 @@ async def test_delete_settlement_success(expense_service, mock_group_data):
         mock_db.groups.find_one = AsyncMock(return_value=mock_group_data)
 
         # Mock successful deletion
-        mock_delete_result = MagicMock()
-        mock_delete_result.deleted_count = 1
-        mock_db.settlements.delete_one = AsyncMock(return_value=mock_delete_result)
+        mock_db.settlements.find_one_and_delete = AsyncMock(
+            return_value={"_id": settlement_id_obj, "amount": 20.0, "status": "pending"}
+        )
+        mock_db.groups.find_one_and_update = AsyncMock()
 
         result = await expense_service.delete_settlement(
             group_id, settlement_id_str, user_id
@@ -1368,9 +1441,18 @@ async def test_delete_settlement_success(expense_service, mock_group_data):
         mock_db.groups.find_one.assert_called_once_with(
             {"_id": ObjectId(group_id), "members.userId": user_id}
         )
-        mock_db.settlements.delete_one.assert_called_once_with(
-            {"_id": ObjectId(settlement_id_str), "groupId": group_id}
+        mock_db.settlements.find_one_and_delete.assert_called_once_with(
+            {"_id": ObjectId(settlement_id_str), "groupId": group_id},
+            projection={"amount": 1, "status": 1},
         )
+        update = mock_db.groups.find_one_and_update.call_args[0][1]
+        assert update["$inc"] == {
+            "version": 1,
+            "stats.settlementCount": -1,
+            "stats.pendingCount": -1,
+            "stats.pendingTotal": -20.0,
+        }
+        assert "lastActivityAt" in update["$max"]
 
 
 @pytest.mark.asyncio
@@ -1386,9 +1468,8 @@ async def test_delete_settlement_not_found(expense_service, mock_group_data):
 
         mock_db.groups.find_one = AsyncMock(return_value=mock_group_data)
 
-        mock_delete_result = MagicMock()
-        mock_delete_result.deleted_count = 0  # Simulate not found
-        mock_db.settlements.delete_one = AsyncMock(return_value=mock_delete_result)
+        # Simulate not found
+        mock_db.settlements.find_one_and_delete = AsyncMock(return_value=None)
 
         result = await expense_service.delete_settlement(
             group_id, settlement_id_str, user_id
@@ -1421,7 +1502,192 @@ async def test_delete_settlement_group_access_denied(expense_service):
         assert exc_info.value.status_code == 403
         assert exc_info.value.detail == "Group not found or user not a member"
 
-        mock_db.settlements.delete_one.assert_not_called()
+        mock_db.settlements.find_one_and_delete.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_group_stats_follow_expense_and_settlement_changes(
+    expense_service, mock_db
+):
+    """Counters maintained with $inc match a full recount after each change"""
+    from app.expenses.schemas import SettlementStatus
+
+    user_a, user_b = str(ObjectId()), str(ObjectId())
+    group_id = ObjectId()
+    await mock_db.users.insert_many(
+        [{"_id": ObjectId(user_a), "name": "A"}, {"_id": ObjectId(user_b), "name": "B"}]
+    )
+    await mock_db.groups.insert_one(
+        {"_id": group_id, "members": [{"userId": user_a}, {"userId": user_b}]}
+    )
+
+    def expense(amount):
+        return ExpenseCreateRequest(
+            description="Dinner",
+            amount=amount,
+            splits=[
+                ExpenseSplit(userId=user_a, amount=amount / 2),
+                ExpenseSplit(userId=user_b, amount=amount / 2),
+            ],
+            paidBy=user_a,
+        )
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        # Counted in full on first use, then maintained incrementally
+        first = await expense_service.create_expense(
+            str(group_id), expense(100.0), user_a
+        )
+        assert first["groupSummary"]["totalExpenses"] == 100.0
+        assert first["groupSummary"]["totalSettlements"] == 2
+
+        second = await expense_service.create_expense(
+            str(group_id), expense(30.0), user_a
+        )
+        assert second["groupSummary"]["totalExpenses"] == 130.0
+        assert second["groupSummary"]["totalSettlements"] == 4
+
+        pending = next(s for s in second["settlements"] if s.status == "pending")
+        await expense_service.update_settlement_status(
+            str(group_id), pending.id, SettlementStatus.COMPLETED
+        )
+        await expense_service.delete_expense(str(group_id), first["expense"].id, user_a)
+
+        stats = await expense_service.get_group_stats(str(group_id))
+        assert stats == {
+            "expenseCount": 1,
+            "totalExpenses": 30.0,
+            "settlementCount": 2,
+            "pendingCount": 0,
+            "pendingTotal": 0,
+        }
+        assert await expense_service.recount_group_stats(str(group_id)) == stats
+        assert await expense_service.get_pending_settlements_total(str(group_id)) == 0
+
+
+@pytest.mark.asyncio
+async def test_recount_is_repeated_when_the_group_changes_meanwhile(
+    expense_service, mock_db
+):
+    group_id = ObjectId()
+    await mock_db.groups.insert_one({"_id": group_id, "version": 3})
+    await mock_db.expenses.insert_one({"groupId": str(group_id), "amount": 10.0})
+    count = expense_service._count_group_stats
+    calls = 0
+
+    async def count_while_an_expense_is_added(gid):
+        nonlocal calls
+        calls += 1
+        stats = await count(gid)
+        if calls == 1:
+            # Committed between the count and the write of the stats; its
+            # $inc was skipped because the group had no stats yet
+            await mock_db.expenses.insert_one({"groupId": gid, "amount": 5.0})
+            await mock_db.groups.update_one({"_id": group_id}, {"$inc": {"version": 1}})
+        return stats
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        with patch.object(
+            expense_service, "_count_group_stats", count_while_an_expense_is_added
+        ):
+            stats = await expense_service.get_group_stats(str(group_id))
+
+    assert calls == 2
+    assert stats["expenseCount"] == 2
+    group = await mock_db.groups.find_one({"_id": group_id})
+    assert group["stats"]["totalExpenses"] == 15.0
+
+
+@pytest.mark.asyncio
+async def test_get_group_settlements_overview(expense_service, mock_db):
+    """Settlements page, optimized settlements and pending total in one call"""
+    group_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {"_id": group_id, "members": [{"userId": "user_a"}, {"userId": "user_b"}]}
+    )
+    await mock_db.settlements.insert_many(
+        [
+            {
+                "_id": ObjectId(),
+                "groupId": str(group_id),
+                "payerId": "user_b",
+                "payeeId": "user_a",
+                "payerName": "B",
+                "payeeName": "A",
+                "amount": amount,
+                "status": status,
+                "createdAt": datetime.now(timezone.utc),
+            }
+            for amount, status in [
+                (30.0, "pending"),
+                (20.0, "pending"),
+                (5.0, "completed"),
+            ]
+        ]
+    )
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        result = await expense_service.get_group_settlements_overview(
+            str(group_id), "user_a", page=1, limit=2
+        )
+
+    assert result["total"] == 3
+    assert len(result["settlements"]) == 2
+    assert result["totalPending"] == 50.0
+    assert len(result["optimizedSettlements"]) == 1
+    assert result["optimizedSettlements"][0].amount == 50.0
+
+
+@pytest.mark.asyncio
+async def test_get_group_settlements_overview_queries_run_concurrently(
+    expense_service,
+):
+    """The independent queries overlap instead of running back to back"""
+    events = []
+
+    def slow(name, value):
+        async def query(*args, **kwargs):
+            events.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end {name}")
+            return value
+
+        return query
+
+    with patch.object(
+        expense_service, "_verify_settlements_access", AsyncMock()
+    ), patch.object(
+        expense_service,
+        "_list_group_settlements",
+        slow("list", {"settlements": [], "total": 0, "page": 1, "limit": 50}),
+    ), patch.object(
+        expense_service, "get_optimized_settlements", slow("optimize", [])
+    ), patch.object(
+        expense_service, "get_pending_settlements_total", slow("pending", 0)
+    ):
+        result = await expense_service.get_group_settlements_overview(
+            str(ObjectId()), "user_a"
+        )
+
+    assert result["totalPending"] == 0
+    assert [e.split()[0] for e in events[:3]] == ["start", "start", "start"]
+
+
+@pytest.mark.asyncio
+async def test_get_group_settlements_overview_access_denied(expense_service):
+    """No settlement queries run for non-members"""
+    with patch("app.expenses.service.mongodb") as mock_mongodb:
+        mock_db = MagicMock()
+        mock_mongodb.database = mock_db
+        mock_db.groups.find_one = AsyncMock(return_value=None)
+
+        with pytest.raises(HTTPException) as exc_info:
+            await expense_service.get_group_settlements_overview(
+                str(ObjectId()), "user_x"
+            )
+
+        assert exc_info.value.status_code == 403
+        mock_db.settlements.count_documents.assert_not_called()
+        mock_db.settlements.aggregate.assert_not_called()
 
 
 @pytest.mark.asyncio
@@ -1906,6 +2172,51 @@ async def test_get_overall_balance_summary_no_groups(expense_service):
         mock_db.settlements.aggregate.assert_not_called()
 
 
+@pytest.mark.asyncio
+async def test_get_dashboard_summarizes_each_group(expense_service, mock_db):
+    """Dashboard balances and activity come from the settlements and expenses"""
+    user_a, user_b = str(ObjectId()), str(ObjectId())
+    trip, flat = ObjectId(), ObjectId()
+    await mock_db.users.insert_many(
+        [{"_id": ObjectId(user_a), "name": "A"}, {"_id": ObjectId(user_b), "name": "B"}]
+    )
+    members = [{"userId": user_a}, {"userId": user_b}]
+    created = datetime(2024, 1, 1)
+    groups = [
+        {"_id": str(trip), "name": "Trip", "members": members, "createdAt": created},
+        {"_id": str(flat), "name": "Flat", "members": members, "createdAt": created},
+    ]
+    await mock_db.groups.insert_many(
+        [{**group, "_id": ObjectId(group["_id"])} for group in groups]
+    )
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        await expense_service.create_expense(
+            str(trip),
+            ExpenseCreateRequest(
+                description="Dinner",
+                amount=90.0,
+                splits=[
+                    ExpenseSplit(userId=user_a, amount=45.0),
+                    ExpenseSplit(userId=user_b, amount=45.0),
+                ],
+                paidBy=user_b,
+            ),
+            user_b,
+        )
+        dashboard = await expense_service.get_dashboard(user_a, groups)
+
+    trip_summary, flat_summary = dashboard["groups"]
+    assert trip_summary["groupId"] == str(trip)
+    assert trip_summary["memberCount"] == 2
+    assert trip_summary["yourBalance"] == -45.0
+    assert trip_summary["lastActivity"] > created
+    assert flat_summary["yourBalance"] == 0
+    assert flat_summary["lastActivity"] == created
+    assert dashboard["summary"]["totalYouOwe"] == 45.0
+    assert [f["userId"] for f in dashboard["friendsBalance"]] == [user_b]
+
+
 @pytest.mark.asyncio
 async def test_get_group_analytics_success(expense_service, mock_group_data):
     """Test successful retrieval of group analytics"""
@@ -2109,6 +2420,37 @@ async def test_get_group_analytics_group_not_found(expense_service):
         mock_db.users.find_one.assert_not_called()
 
 
+@pytest.mark.asyncio
+async def test_concurrent_group_analytics_are_computed_once(expense_service, mock_db):
+    """Members reading the same analytics at the same time share one computation"""
+    members = [str(ObjectId()) for _ in range(3)]
+    group_id = ObjectId()
+    await mock_db.users.insert_many(
+        [{"_id": ObjectId(uid), "name": f"User {i}"} for i, uid in enumerate(members)]
+    )
+    await mock_db.groups.insert_one(
+        {"_id": group_id, "members": [{"userId": uid} for uid in members]}
+    )
+
+    with patch(
+        "app.expenses.service.mongodb", SimpleNamespace(database=mock_db)
+    ), patch.object(
+        expense_service,
+        "_calculate_group_analytics",
+        wraps=expense_service._calculate_group_analytics,
+    ) as calculate:
+        results = await asyncio.gather(
+            *(
+                expense_service.get_group_analytics(str(group_id), uid, "year", 2024)
+                for uid in members
+            )
+        )
+
+    assert calculate.call_count == 1
+    assert results[0] == results[1] == results[2]
+    assert expense_service.flights.coalesced == 2
+
+
 @pytest.mark.asyncio
 async def test_get_friends_balance_summary_aggregation_error(expense_service):
     """Test friends balance summary when aggregation fails"""
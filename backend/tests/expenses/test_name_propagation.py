@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from app.config import settings
+from app.expenses.service import ExpenseService
+from app.jobs import job_queue
+from bson import ObjectId
+
+
+@pytest.fixture
+def service(mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "name_propagation_batch_size", 2)
+    monkeypatch.setattr(settings, "name_propagation_batch_delay", 0)
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        yield ExpenseService()
+
+
+GROUP_ID = ObjectId()
+
+
+async def _seed(mock_db):
+    group_id = str(GROUP_ID)
+    await mock_db.groups.insert_one({"_id": GROUP_ID, "version": 1})
+    await mock_db.settlements.insert_many(
+        [
+            {
+                "groupId": group_id,
+                "payerId": "alice",
+                "payeeId": "bob",
+                "payerName": "Al",
+                "payeeName": "B",
+            }
+            for _ in range(3)
+        ]
+        + [
+            {
+                "groupId": group_id,
+                "payerId": "bob",
+                "payeeId": "alice",
+                "payerName": "B",
+                "payeeName": "Al",
+            }
+        ]
+    )
+    await mock_db.expenses.insert_one(
+        {
+            "groupId": group_id,
+            "history": [
+                {"userId": "alice", "userName": "Al"},
+                {"userId": "bob", "userName": "B"},
+                {"userId": "alice", "userName": "Al"},
+            ],
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_rename_is_copied_into_settlements_and_history(service, mock_db):
+    await _seed(mock_db)
+
+    await service.propagate_user_name("alice", "Alice")
+    await job_queue.run_pending(mock_db.jobs)
+
+    assert await mock_db.settlements.count_documents({"payerName": "Al"}) == 0
+    assert await mock_db.settlements.count_documents({"payeeName": "Al"}) == 0
+    assert await mock_db.settlements.count_documents({"payerName": "B"}) == 1
+    expense = await mock_db.expenses.find_one({})
+    assert [e["userName"] for e in expense["history"]] == ["Alice", "B", "Alice"]
+
+    progress = await mock_db.name_propagations.find_one({"_id": "alice"})
+    assert progress["name"] == "Alice"
+    assert progress["updated"] == 6
+    assert progress["finishedAt"] is not None
+    assert "pending" not in progress
+
+    # Cached settlements and ETags of the group are invalidated, and the
+    # renamed documents are sent by /sync: one version per batch
+    group = await mock_db.groups.find_one({"_id": GROUP_ID})
+    assert group["version"] == 1 + 5
+    changes = await mock_db.changes.find({"groupId": str(GROUP_ID)}).to_list(None)
+    assert sorted(c["entity"] for c in changes) == ["expense"] * 2 + ["settlement"] * 4
+
+
+@pytest.mark.asyncio
+async def test_changes_of_an_interrupted_batch_are_recorded_on_resume(service, mock_db):
+    await _seed(mock_db)
+    settlement = await mock_db.settlements.find_one({"payerId": "alice"})
+    # Stopped after writing a batch, before recording its changes
+    await mock_db.settlements.update_one(
+        {"_id": settlement["_id"]}, {"$set": {"payerName": "Alice"}}
+    )
+    pending = [
+        {"entity": "settlement", "id": str(settlement["_id"]), "groupId": str(GROUP_ID)}
+    ]
+    await mock_db.name_propagations.insert_one(
+        {
+            "_id": "alice",
+            "name": "Alice",
+            "stage": 0,
+            "updated": 0,
+            "pending": pending,
+            "finishedAt": None,
+        }
+    )
+
+    await service._propagate_name("alice")
+
+    change = await mock_db.changes.find_one({"entityId": str(settlement["_id"])})
+    assert change["entity"] == "settlement"
+    assert change["groupId"] == str(GROUP_ID)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_propagation_resumes(service, mock_db):
+    await _seed(mock_db)
+    # Stopped after the first batch of payer names
+    await mock_db.settlements.update_one(
+        {"payerId": "alice"}, {"$set": {"payerName": "Alice"}}
+    )
+    await mock_db.name_propagations.insert_one(
+        {"_id": "alice", "name": "Alice", "stage": 0, "updated": 1, "finishedAt": None}
+    )
+    # whose job was left running by a worker that is gone
+    await mock_db.jobs.insert_one(
+        {
+            "_id": "propagateName:alice",
+            "type": "propagateName",
+            "key": "alice",
+            "status": "running",
+            "attempts": 1,
+            "runAt": datetime.now(timezone.utc) - timedelta(minutes=5),
+            "leasedUntil": datetime.now(timezone.utc) - timedelta(minutes=1),
+        }
+    )
+
+    assert await job_queue.run_pending(mock_db.jobs) == 1
+    assert await mock_db.settlements.count_documents({"payerName": "Al"}) == 0
+    progress = await mock_db.name_propagations.find_one({"_id": "alice"})
+    assert progress["updated"] == 6
+
+
+@pytest.mark.asyncio
+async def test_rename_during_propagation_switches_to_newer_name(service, mock_db):
+    await _seed(mock_db)
+
+    await service.propagate_user_name("alice", "Alice")
+    # Renamed again before the first propagation ran
+    await service.propagate_user_name("alice", "Ali")
+    await job_queue.run_pending(mock_db.jobs)
+
+    assert await mock_db.settlements.count_documents({"payerName": "Ali"}) == 3
+    expense = await mock_db.expenses.find_one({})
+    assert [e["userName"] for e in expense["history"]] == ["Ali", "B", "Ali"]
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from app.cache import MemoryCache
+from app.expenses.service import ExpenseService
+from app.groups.service import GroupService
+from bson import ObjectId
+
+
+@pytest.mark.asyncio
+async def test_optimized_settlements_cached_per_group_version(mock_db):
+    service = ExpenseService(cache=MemoryCache(100))
+    group_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "name": "Trip",
+            "members": [{"userId": "user_a", "role": "admin"}, {"userId": "user_b"}],
+        }
+    )
+    await mock_db.settlements.insert_one(
+        {
+            "groupId": str(group_id),
+            "payerId": "user_a",
+            "payeeId": "user_b",
+            "payerName": "A",
+            "payeeName": "B",
+            "amount": 25.0,
+            "status": "pending",
+        }
+    )
+
+    with patch(
+        "app.expenses.service.mongodb", SimpleNamespace(database=mock_db)
+    ), patch.object(
+        service,
+        "calculate_optimized_settlements",
+        wraps=service.calculate_optimized_settlements,
+    ) as calculate:
+        first = await service.get_optimized_settlements(str(group_id))
+        for _ in range(3):
+            assert await service.get_optimized_settlements(str(group_id)) == first
+        assert calculate.call_count == 1
+        assert service.cache.hits == 3
+
+        # Group writes bump the version, so the next read recomputes
+        await GroupService().update_group(str(group_id), {"name": "Trip!"}, "user_a")
+        await service.get_optimized_settlements(str(group_id))
+        assert calculate.call_count == 2
+
+        # A fresh worker picks up the stored result, which the group document
+        # (read by group lists and details) doesn't carry
+        group = await mock_db.groups.find_one({"_id": group_id})
+        assert "settlementsCache" not in group
+        other_worker = ExpenseService(cache=MemoryCache(100))
+        with patch.object(other_worker, "calculate_optimized_settlements") as other:
+            assert await other_worker.get_optimized_settlements(str(group_id)) == first
+            other.assert_not_called()
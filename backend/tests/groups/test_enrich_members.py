@@ -69,6 +69,60 @@ class TestEnrichMembersOptimized:
         assert "_id" in call_args[0][0]
         assert "$in" in call_args[0][0]["_id"]
 
+    @pytest.mark.asyncio
+    async def test_enrich_members_uses_small_variant_of_stored_images(self):
+        """Stored avatars are returned as 64px variants, external URLs as-is"""
+        user_id_1 = str(ObjectId())
+        user_id_2 = str(ObjectId())
+        stored_url = "/images/" + "ab" * 32 + ".png"
+        members = [{"userId": user_id_1}, {"userId": user_id_2}]
+        mock_users = [
+            {"_id": ObjectId(user_id_1), "name": "One", "imageUrl": stored_url},
+            {
+                "_id": ObjectId(user_id_2),
+                "name": "Two",
+                "imageUrl": "https://example.com/two.jpg",
+            },
+        ]
+
+        mock_db = MagicMock()
+        mock_cursor = AsyncMock()
+        mock_cursor.to_list.return_value = mock_users
+        mock_db.users.find.return_value = mock_cursor
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            enriched = await self.service._enrich_members_with_user_details(members)
+
+        assert enriched[0]["user"]["imageUrl"] == f"{stored_url}?size=64"
+        assert enriched[1]["user"]["imageUrl"] == "https://example.com/two.jpg"
+
+    @pytest.mark.asyncio
+    async def test_enrich_members_uses_profile_snapshots(self):
+        """Only members without a profile snapshot are looked up"""
+        user_id_1, user_id_2 = str(ObjectId()), str(ObjectId())
+        members = [
+            {
+                "userId": user_id_1,
+                "role": "admin",
+                "joinedAt": "2023-01-01",
+                "profile": {"name": "Snapshot", "email": "s@x.com", "imageUrl": None},
+            },
+            {"userId": user_id_2, "role": "member", "joinedAt": "2023-01-01"},
+        ]
+        mock_db = MagicMock()
+        mock_cursor = AsyncMock()
+        mock_cursor.to_list.return_value = [
+            {"_id": ObjectId(user_id_2), "name": "Looked Up", "email": "l@x.com"}
+        ]
+        mock_db.users.find.return_value = mock_cursor
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            enriched = await self.service._enrich_members_with_user_details(members)
+
+        assert [m["user"]["name"] for m in enriched] == ["Snapshot", "Looked Up"]
+        query = mock_db.users.find.call_args[0][0]
+        assert query == {"_id": {"$in": [ObjectId(user_id_2)]}}
+
     @pytest.mark.asyncio
     async def test_enrich_members_empty_list(self):
         """Test enrichment with empty members list - covers line 35"""
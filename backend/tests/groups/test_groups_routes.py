@@ -84,26 +84,43 @@ class TestGroupsRoutes:
         self, async_client: AsyncClient, auth_headers, mock_db
     ):
         """Test listing user groups"""
-        with patch("app.groups.service.group_service.get_user_groups") as mock_get:
-            mock_get.return_value = [
-                {
-                    "_id": "642f1e4a9b3c2d1f6a1b2c3d",
-                    "name": "Test Group",
-                    "currency": "USD",
-                    "joinCode": "ABC123",
-                    "createdBy": "user123",
-                    "createdAt": "2023-01-01T00:00:00Z",
-                    "imageUrl": None,
-                    "members": [],
-                }
-            ]
+        with patch("app.groups.service.group_service.list_user_groups") as mock_list:
+            mock_list.return_value = {
+                "groups": [
+                    {
+                        "_id": "642f1e4a9b3c2d1f6a1b2c3d",
+                        "name": "Test Group",
+                        "currency": "USD",
+                        "joinCode": "ABC123",
+                        "createdBy": "user123",
+                        "createdAt": "2023-01-01T00:00:00Z",
+                        "imageUrl": None,
+                        "memberCount": 8,
+                        "members": [],
+                        "lastActivityAt": "2023-01-02T00:00:00Z",
+                    }
+                ],
+                "nextCursor": "next",
+            }
 
-            response = await async_client.get("/groups", headers=auth_headers)
+            response = await async_client.get(
+                "/groups?limit=1&cursor=abc", headers=auth_headers
+            )
 
             assert response.status_code == status.HTTP_200_OK
             data = response.json()
             assert "groups" in data
             assert len(data["groups"]) == 1
+            assert data["groups"][0]["memberCount"] == 8
+            assert data["nextCursor"] == "next"
+            assert mock_list.call_args[0][1:] == (1, "abc")
+
+    @pytest.mark.asyncio
+    async def test_list_user_groups_rejects_oversized_page(
+        self, async_client: AsyncClient, auth_headers, mock_db
+    ):
+        response = await async_client.get("/groups?limit=1000", headers=auth_headers)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
 
     @pytest.mark.asyncio
     async def test_get_group_details(
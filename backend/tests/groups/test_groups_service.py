@@ -1,6 +1,9 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from app.config import settings
 from app.groups.service import GroupService
 from bson import ObjectId
 from fastapi import HTTPException
@@ -52,33 +55,6 @@ class TestGroupService:
         mock_collection = AsyncMock()
         mock_db.groups = mock_collection
 
-        # Mock find_one to return None (no existing join code)
-        mock_collection.find_one.return_value = None
-
-        # Mock insert_one
-        mock_result = MagicMock()
-        mock_result.inserted_id = ObjectId("642f1e4a9b3c2d1f6a1b2c3d")
-        mock_collection.insert_one.return_value = mock_result
-
-        # Mock find_one for created group
-        created_group = {
-            "_id": ObjectId("642f1e4a9b3c2d1f6a1b2c3d"),
-            "name": "Test Group",
-            "currency": "USD",
-            "joinCode": "ABC123",
-            "createdBy": "user123",
-            "createdAt": "2023-01-01T00:00:00Z",
-            "imageUrl": None,
-            "members": [
-                {
-                    "userId": "user123",
-                    "role": "admin",
-                    "joinedAt": "2023-01-01T00:00:00Z",
-                }
-            ],
-        }
-        mock_collection.find_one.side_effect = [None, created_group]
-
         with patch.object(self.service, "get_db", return_value=mock_db):
             result = await self.service.create_group(
                 {"name": "Test Group", "currency": "USD"}, "user123"
@@ -87,6 +63,42 @@ class TestGroupService:
         assert result["name"] == "Test Group"
         assert result["currency"] == "USD"
         assert "joinCode" in result
+        assert result["members"][0]["userId"] == "user123"
+        # The response is built from the inserted document
+        mock_collection.find_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_create_group_retries_duplicate_join_code(self, mock_db):
+        """A join code already in use is rejected by the unique index and replaced"""
+        await mock_db.groups.create_index("joinCode", unique=True)
+        await mock_db.groups.insert_one({"name": "Existing", "joinCode": "TAKEN1"})
+
+        codes = iter(["TAKEN1", "FRESH1"])
+        with patch.object(self.service, "get_db", return_value=mock_db), patch.object(
+            self.service, "generate_join_code", side_effect=lambda: next(codes)
+        ):
+            result = await self.service.create_group(
+                {"name": "Test Group", "currency": "USD"}, "user123"
+            )
+
+        assert result["joinCode"] == "FRESH1"
+        assert await mock_db.groups.count_documents({}) == 2
+
+    @pytest.mark.asyncio
+    async def test_create_group_gives_up_after_repeated_collisions(self, mock_db):
+        await mock_db.groups.create_index("joinCode", unique=True)
+        await mock_db.groups.insert_one({"name": "Existing", "joinCode": "TAKEN1"})
+
+        with patch.object(self.service, "get_db", return_value=mock_db), patch.object(
+            self.service, "generate_join_code", return_value="TAKEN1"
+        ):
+            with pytest.raises(HTTPException) as exc_info:
+                await self.service.create_group(
+                    {"name": "Test Group", "currency": "USD"}, "user123"
+                )
+
+        assert exc_info.value.status_code == 500
+        assert await mock_db.groups.count_documents({}) == 1
 
     @pytest.mark.asyncio
     async def test_get_user_groups(self):
@@ -125,6 +137,200 @@ class TestGroupService:
         assert len(result) == 1
         assert result[0]["name"] == "Test Group"
 
+    @pytest.mark.asyncio
+    async def test_list_user_groups_pages_by_last_activity(self, mock_db):
+        """Groups are paged most recently active first, with a member summary"""
+        base = datetime(2024, 1, 1)
+        members = [{"userId": "user123", "role": "admin"}] + [
+            {"userId": f"user{i}", "role": "member"} for i in range(7)
+        ]
+        activity = [base, base + timedelta(days=2), None, base + timedelta(days=2)]
+        for i, last_activity in enumerate(activity):
+            group = {
+                "name": f"Group {i}",
+                "currency": "USD",
+                "joinCode": f"CODE{i}",
+                "createdBy": "user123",
+                "createdAt": base,
+                "members": members[: i + 1] if i else members,
+            }
+            if last_activity:
+                group["lastActivityAt"] = last_activity
+            await mock_db.groups.insert_one(group)
+        await mock_db.groups.insert_one(
+            {"name": "Other", "joinCode": "OTHER", "members": [{"userId": "x"}]}
+        )
+
+        pages, cursor = [], None
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            while True:
+                page = await self.service.list_user_groups("user123", 1, cursor)
+                pages.append(page["groups"])
+                cursor = page["nextCursor"]
+                if cursor is None:
+                    break
+            # Without a limit every group is listed at once
+            unpaged = await self.service.list_user_groups("user123")
+
+        assert [len(page) for page in pages] == [1, 1, 1, 1]
+        names = [g["name"] for page in pages for g in page]
+        # Ties are broken by the newest group, groups without activity come last
+        assert names == ["Group 3", "Group 1", "Group 0", "Group 2"]
+        assert [g["name"] for g in unpaged["groups"]] == names
+        assert unpaged["nextCursor"] is None
+        group_0 = pages[2][0]
+        assert group_0["memberCount"] == 8
+        assert len(group_0["members"]) == settings.group_member_preview_size
+        assert group_0["lastActivityAt"] == base
+
+    @pytest.mark.asyncio
+    async def test_list_user_groups_invalid_cursor(self, mock_db):
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            with pytest.raises(HTTPException) as exc_info:
+                await self.service.list_user_groups("user123", 10, "not-a-cursor")
+
+        assert exc_info.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_members_carry_profile_snapshots(self, mock_db):
+        """Group reads use the member profiles stored with the group"""
+        alice, bob = ObjectId(), ObjectId()
+        await mock_db.users.insert_many(
+            [
+                {"_id": alice, "name": "Alice", "email": "a@x.com"},
+                {"_id": bob, "name": "Bob", "email": "b@x.com", "imageUrl": None},
+            ]
+        )
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            group = await self.service.create_group({"name": "Trip"}, str(alice))
+            await self.service.join_group_by_code(group["joinCode"], str(bob))
+
+            # Not looked up anymore
+            await mock_db.users.delete_many({})
+            members = await self.service.get_group_members(group["_id"], str(alice))
+            listed = await self.service.list_user_groups(str(bob), 10)
+
+        assert [m["user"]["name"] for m in members] == ["Alice", "Bob"]
+        assert members[1]["user"]["email"] == "b@x.com"
+        assert [m["user"]["name"] for m in listed["groups"][0]["members"]] == [
+            "Alice",
+            "Bob",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_profile_refresh_runs_as_a_job(self, mock_db, monkeypatch):
+        """Profile changes arriving together are written in one refresh job"""
+        from app.jobs import job_queue
+
+        monkeypatch.setattr(settings, "member_profile_refresh_delay", 0)
+        alice, bob = ObjectId(), ObjectId()
+        await mock_db.users.insert_many(
+            [{"_id": alice, "name": "Alice"}, {"_id": bob, "name": "Bob"}]
+        )
+        await mock_db.groups.insert_one(
+            {
+                "members": [
+                    {"userId": str(alice), "profile": {"name": "Old"}},
+                    {
+                        "userId": str(bob),
+                        "profile": {"name": "Bob", "email": None, "imageUrl": None},
+                    },
+                ],
+                "version": 1,
+            }
+        )
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            await self.service.schedule_member_profile_refresh(str(alice))
+            await self.service.schedule_member_profile_refresh(str(alice))
+            await self.service.schedule_member_profile_refresh(str(bob))
+            # One job per user; the repeated change to Alice is written once
+            assert await job_queue.run_pending(mock_db.jobs) == 2
+
+        group = await mock_db.groups.find_one({})
+        assert [m["profile"]["name"] for m in group["members"]] == ["Alice", "Bob"]
+        # Only Alice's snapshot changed
+        assert group["version"] == 2
+
+    @pytest.mark.asyncio
+    async def test_delete_group_removes_its_data_in_batches(self, mock_db, monkeypatch):
+        from app.jobs import job_queue
+
+        monkeypatch.setattr(settings, "group_deletion_batch_size", 2)
+        monkeypatch.setattr(settings, "group_deletion_batch_delay", 0)
+        group_id, other_id = ObjectId(), str(ObjectId())
+        await mock_db.groups.insert_one(
+            {"_id": group_id, "members": [{"userId": "user123", "role": "admin"}]}
+        )
+        gid = str(group_id)
+        await mock_db.expenses.insert_many(
+            [{"groupId": gid} for _ in range(3)] + [{"groupId": other_id}]
+        )
+        await mock_db.settlements.insert_many([{"groupId": gid} for _ in range(2)])
+        await mock_db.attachments.insert_one({"groupId": gid, "key": "k"})
+        await mock_db.settlement_caches.insert_one(
+            {"_id": f"{gid}:advanced", "groupId": gid}
+        )
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            assert await self.service.delete_group(gid, "user123") is True
+            await job_queue.run_pending(mock_db.jobs)
+
+        assert await mock_db.groups.count_documents({}) == 0
+        assert await mock_db.expenses.count_documents({}) == 1
+        assert await mock_db.settlements.count_documents({}) == 0
+        assert await mock_db.attachments.count_documents({}) == 0
+        deletion = await mock_db.group_deletions.find_one({"_id": gid})
+        assert deletion["deleted"] == {
+            "expenses": 3,
+            "settlements": 2,
+            "attachments": 1,
+            "settlement_caches": 1,
+        }
+        assert deletion["finishedAt"] is not None
+
+    @pytest.mark.asyncio
+    async def test_interrupted_group_deletion_resumes(self, mock_db, monkeypatch):
+        from app.jobs import job_queue
+
+        monkeypatch.setattr(settings, "group_deletion_batch_delay", 0)
+        gid = str(ObjectId())
+        # Stopped while deleting settlements
+        await mock_db.settlements.insert_many([{"groupId": gid} for _ in range(2)])
+        await mock_db.group_deletions.insert_one(
+            {
+                "_id": gid,
+                "stage": 1,
+                "deleted": {"expenses": 4, "settlements": 1, "attachments": 0},
+                "finishedAt": None,
+            }
+        )
+
+        # and its job was left running by a worker that is gone
+        await mock_db.jobs.insert_one(
+            {
+                "_id": f"deleteGroupData:{gid}",
+                "type": "deleteGroupData",
+                "key": gid,
+                "status": "running",
+                "attempts": 1,
+                "runAt": datetime.now(timezone.utc) - timedelta(minutes=5),
+                "leasedUntil": datetime.now(timezone.utc) - timedelta(minutes=1),
+            }
+        )
+
+        await job_queue.run_pending(mock_db.jobs)
+
+        assert await mock_db.settlements.count_documents({}) == 0
+        deletion = await mock_db.group_deletions.find_one({"_id": gid})
+        assert deletion["deleted"] == {
+            "expenses": 4,
+            "settlements": 3,
+            "attachments": 0,
+        }
+        assert deletion["finishedAt"] is not None
+
     @pytest.mark.asyncio
     async def test_join_group_by_code_success(self):
         """Test successful group joining"""
@@ -132,19 +338,6 @@ class TestGroupService:
         mock_collection = AsyncMock()
         mock_db.groups = mock_collection
 
-        existing_group = {
-            "_id": ObjectId("642f1e4a9b3c2d1f6a1b2c3d"),
-            "name": "Test Group",
-            "joinCode": "ABC123",
-            "members": [
-                {
-                    "userId": "user123",
-                    "role": "admin",
-                    "joinedAt": "2023-01-01T00:00:00Z",
-                }
-            ],
-        }
-
         updated_group = {
             "_id": ObjectId("642f1e4a9b3c2d1f6a1b2c3d"),
             "name": "Test Group",
@@ -163,14 +356,17 @@ class TestGroupService:
             ],
         }
 
-        mock_collection.find_one.return_value = existing_group
         mock_collection.find_one_and_update.return_value = updated_group
 
         with patch.object(self.service, "get_db", return_value=mock_db):
-            result = await self.service.join_group_by_code("ABC123", "user456")
+            result = await self.service.join_group_by_code("abc123", "user456")
 
         assert result is not None
         assert len(result["members"]) == 2
+        # A single conditional update, guarded against existing membership
+        query = mock_collection.find_one_and_update.call_args[0][0]
+        assert query == {"joinCode": "ABC123", "members.userId": {"$ne": "user456"}}
+        mock_collection.find_one.assert_not_called()
 
     @pytest.mark.asyncio
     async def test_join_group_invalid_code(self):
@@ -179,6 +375,7 @@ class TestGroupService:
         mock_collection = AsyncMock()
         mock_db.groups = mock_collection
 
+        mock_collection.find_one_and_update.return_value = None
         mock_collection.find_one.return_value = None
 
         with patch.object(self.service, "get_db", return_value=mock_db):
@@ -327,7 +524,9 @@ class TestGroupService:
             ],
         }
 
-        mock_collection.find_one.return_value = existing_group
+        # The membership guard leaves the group untouched
+        mock_collection.find_one_and_update.return_value = None
+        mock_collection.find_one.return_value = {"_id": existing_group["_id"]}
 
         with patch.object(self.service, "get_db", return_value=mock_db):
             with pytest.raises(HTTPException) as exc_info:
@@ -336,6 +535,35 @@ class TestGroupService:
             assert exc_info.value.status_code == 400
             assert "already a member" in str(exc_info.value.detail)
 
+    @pytest.mark.asyncio
+    async def test_join_group_concurrent_joins_add_member_once(self, mock_db):
+        """Racing joins of the same user add a single member entry"""
+        await mock_db.groups.insert_one(
+            {
+                "name": "Test Group",
+                "joinCode": "ABC123",
+                "members": [{"userId": "user123", "role": "admin"}],
+                "version": 0,
+            }
+        )
+
+        with patch.object(self.service, "get_db", return_value=mock_db):
+            results = await asyncio.gather(
+                *(
+                    self.service.join_group_by_code("ABC123", "user456")
+                    for _ in range(3)
+                ),
+                return_exceptions=True,
+            )
+
+        joined = [r for r in results if isinstance(r, dict)]
+        rejected = [r for r in results if isinstance(r, HTTPException)]
+        assert len(joined) == 1 and len(rejected) == 2
+        assert all(r.status_code == 400 for r in rejected)
+        group = await mock_db.groups.find_one({"joinCode": "ABC123"})
+        assert [m["userId"] for m in group["members"]] == ["user123", "user456"]
+        assert group["version"] == 1
+
     @pytest.mark.asyncio
     async def test_update_group_not_admin(self):
         """Test updating group when not admin"""
@@ -477,8 +705,7 @@ class TestGroupService:
             ],
         }
 
-        # First call returns None (user not admin), second call returns the group (group exists)
-        mock_collection.find_one.side_effect = [None, existing_group]
+        mock_collection.find_one.return_value = existing_group
 
         with patch.object(self.service, "get_db", return_value=mock_db):
             with pytest.raises(HTTPException) as exc_info:
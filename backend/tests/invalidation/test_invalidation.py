@@ -0,0 +1,138 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from app.cache import get_cache, group_tag, user_tag
+from app.invalidation import (
+    CHANGE_STREAM_HISTORY_LOST,
+    NOT_A_REPLICA_SET,
+    InvalidationBus,
+)
+from app.sync.changes import EXPENSE, USER, change, record_changes
+from pymongo.errors import AutoReconnect, OperationFailure
+
+
+class FakeStream:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    async def __aenter__(self):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        for event in self.outcome:
+            yield event
+        # The connection drops after the scripted events
+        raise AutoReconnect("connection lost")
+
+
+class FakeChanges:
+    """Collection whose change streams play a script of events and failures"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.resumed_after = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.resumed_after.append(resume_after)
+        if not self.outcomes:
+            return FakeStream(OperationFailure("not a replica set", NOT_A_REPLICA_SET))
+        return FakeStream(self.outcomes.pop(0))
+
+
+def inserted(token, entry_id, group_id="g1"):
+    return {"_id": token, "fullDocument": {"_id": entry_id, "groupId": group_id}}
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    monkeypatch.setattr("app.invalidation.asyncio.sleep", AsyncMock())
+    return InvalidationBus()
+
+
+@pytest.mark.asyncio
+async def test_notify_dispatches_to_every_cache(bus):
+    seen = []
+
+    def failing(entry):
+        raise RuntimeError("broken cache")
+
+    bus.subscribe(failing, lambda: None)
+    bus.subscribe(seen.append, lambda: None)
+
+    await bus.notify([{"_id": 1, "groupId": "g1"}, {"_id": 2, "groupId": "g2"}])
+
+    assert [entry["_id"] for entry in seen] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_change_stream_resumes_after_reconnect(bus):
+    seen, resets = [], []
+    bus.subscribe(seen.append, lambda: resets.append(True))
+    changes = FakeChanges(
+        [inserted({"t": 1}, "a"), inserted({"t": 2}, "b")],
+        [inserted({"t": 3}, "c")],
+    )
+
+    bus.start(changes)
+    await asyncio.wait_for(bus._watcher, timeout=1)
+
+    assert [entry["_id"] for entry in seen] == ["a", "b", "c"]
+    assert changes.resumed_after == [None, {"t": 2}, {"t": 3}]
+    assert resets == []
+    assert bus.metrics()["mode"] == "local"
+
+
+@pytest.mark.asyncio
+async def test_lost_history_flushes_caches(bus):
+    resets = []
+    bus.subscribe(lambda entry: None, lambda: resets.append(True))
+    bus.resume_token = {"t": 1}
+    changes = FakeChanges(
+        OperationFailure("history lost", CHANGE_STREAM_HISTORY_LOST), []
+    )
+
+    bus.start(changes)
+    await asyncio.wait_for(bus._watcher, timeout=1)
+
+    assert resets == [True]
+    assert changes.resumed_after[:2] == [{"t": 1}, None]
+
+
+@pytest.mark.asyncio
+async def test_local_changes_are_not_dispatched_twice(bus):
+    seen = []
+    bus.subscribe(seen.append, lambda: None)
+    bus.mode = "changeStream"
+    await bus.notify([{"_id": "local", "groupId": "g1"}])
+    changes = FakeChanges([inserted({"t": 1}, "local"), inserted({"t": 2}, "remote")])
+
+    bus.start(changes)
+    await asyncio.wait_for(bus._watcher, timeout=1)
+
+    assert [entry["_id"] for entry in seen] == ["local", "remote"]
+
+
+@pytest.mark.asyncio
+async def test_recorded_changes_invalidate_cached_entries():
+    cache = get_cache()
+    await cache.set("settlements:g1", [], tags=[group_tag("g1")])
+    await cache.set("settlements:g2", [], tags=[group_tag("g2")])
+    await cache.set("user:u1", {}, tags=[user_tag("u1")])
+
+    await record_changes(AsyncMock(), "g1", [change(EXPENSE, "e1")])
+    await record_changes(AsyncMock(), None, [change(USER, "u1")])
+
+    assert await cache.mget(["settlements:g1", "settlements:g2", "user:u1"]) == [
+        None,
+        [],
+        None,
+    ]
@@ -0,0 +1,243 @@
+import asyncio
+import os
+import runpy
+import signal
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.config import settings
+from app.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def queue():
+    return JobQueue()
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc) if not value.tzinfo else value
+
+
+@pytest.mark.asyncio
+async def test_job_runs_once_with_its_payload(queue, mock_db):
+    seen = []
+
+    async def handler(job):
+        seen.append((job["key"], job["payload"]))
+
+    queue.register("greet", handler)
+    await queue.enqueue(mock_db.jobs, "greet", "alice", {"n": 1})
+    # Already waiting, so not queued twice
+    await queue.enqueue(mock_db.jobs, "greet", "alice", {"n": 1})
+
+    assert await queue.run_pending(mock_db.jobs) == 1
+    assert seen == [("alice", {"n": 1})]
+    job = await mock_db.jobs.find_one({"_id": "greet:alice"})
+    assert job["status"] == DONE
+    assert queue.metrics()["types"]["greet"]["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_job_enqueued_while_running_runs_again(queue, mock_db):
+    runs = []
+
+    async def handler(job):
+        runs.append(job["key"])
+        if len(runs) == 1:
+            await queue.enqueue(mock_db.jobs, "sync", "g1")
+
+    queue.register("sync", handler)
+    await queue.enqueue(mock_db.jobs, "sync", "g1")
+
+    assert await queue.run_pending(mock_db.jobs) == 2
+    assert runs == ["g1", "g1"]
+    assert (await mock_db.jobs.find_one({}))["status"] == DONE
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_with_backoff(queue, mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_retry_base_delay", 10)
+    monkeypatch.setattr(settings, "jobs_max_attempts", 2)
+
+    async def handler(job):
+        raise RuntimeError("boom")
+
+    queue.register("flaky", handler)
+    await queue.enqueue(mock_db.jobs, "flaky", "k")
+
+    assert await queue.run_pending(mock_db.jobs) == 1
+    job = await mock_db.jobs.find_one({})
+    assert job["status"] == QUEUED
+    assert job["error"] == "boom"
+    delay = (_utc(job["runAt"]) - datetime.now(timezone.utc)).total_seconds()
+    assert 5 < delay <= 10
+
+    # Due again: the second attempt is the last one
+    await mock_db.jobs.update_one({}, {"$set": {"runAt": datetime.now(timezone.utc)}})
+    assert await queue.run_pending(mock_db.jobs) == 1
+    job = await mock_db.jobs.find_one({})
+    assert job["status"] == FAILED
+    assert job["attempts"] == 2
+    metrics = queue.metrics()["types"]["flaky"]
+    assert (metrics["retried"], metrics["failed"]) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over(queue, mock_db):
+    ran = []
+
+    async def handler(job):
+        ran.append(job["attempts"])
+
+    queue.register("purge", handler)
+    past = datetime.now(timezone.utc) - timedelta(minutes=1)
+    await mock_db.jobs.insert_many(
+        [
+            # Its worker died
+            {
+                "_id": "purge:a",
+                "type": "purge",
+                "key": "a",
+                "status": RUNNING,
+                "worker": "gone",
+                "attempts": 1,
+                "runAt": past,
+                "leasedUntil": past,
+            },
+            # Still leased by a live worker
+            {
+                "_id": "purge:b",
+                "type": "purge",
+                "key": "b",
+                "status": RUNNING,
+                "worker": "alive",
+                "attempts": 1,
+                "runAt": past,
+                "leasedUntil": past + timedelta(minutes=5),
+            },
+        ]
+    )
+
+    assert await queue.run_pending(mock_db.jobs) == 1
+    assert ran == [2]
+    assert (await mock_db.jobs.find_one({"_id": "purge:b"}))["status"] == RUNNING
+
+
+@pytest.mark.asyncio
+async def test_job_that_lost_its_lease_is_stopped(queue, mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_visibility_timeout", 0.03)
+    stopped = asyncio.Event()
+
+    async def handler(job):
+        # Another worker takes the job over meanwhile
+        await mock_db.jobs.update_one({}, {"$set": {"worker": "other"}})
+        try:
+            await asyncio.sleep(1)
+        finally:
+            stopped.set()
+
+    queue.register("slow", handler)
+    await queue.enqueue(mock_db.jobs, "slow", "k")
+
+    assert await queue.run_pending(mock_db.jobs) == 1
+    assert stopped.is_set()
+    job = await mock_db.jobs.find_one({})
+    assert (job["status"], job["worker"]) == (RUNNING, "other")
+
+
+@pytest.mark.asyncio
+async def test_workers_respect_concurrency(queue, mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "jobs_poll_interval", 0.01)
+    running, peak, finished = 0, 0, []
+
+    async def handler(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        finished.append(job["key"])
+
+    queue.register("resize", handler, concurrency=2)
+    for n in range(6):
+        await queue.enqueue(mock_db.jobs, "resize", str(n))
+
+    async def all_done():
+        while await mock_db.jobs.count_documents({"status": DONE}) < 6:
+            await asyncio.sleep(0.01)
+
+    queue.start(mock_db.jobs)
+    try:
+        await asyncio.wait_for(all_done(), timeout=5)
+    finally:
+        await queue.stop()
+
+    assert peak == 2
+    assert sorted(finished) == [str(n) for n in range(6)]
+    assert await queue.queue_depth(mock_db.jobs) == {}
+
+
+@pytest.mark.asyncio
+async def test_queue_depth_counts_pending_jobs_per_type(queue, mock_db):
+    queue.register("a", lambda job: asyncio.sleep(0))
+    await queue.enqueue(mock_db.jobs, "a", "1")
+    await queue.enqueue(mock_db.jobs, "a", "2", delay=60)
+    await queue.enqueue(mock_db.jobs, "b", "1")
+
+    assert await queue.queue_depth(mock_db.jobs) == {
+        "a": {QUEUED: 2},
+        "b": {QUEUED: 1},
+    }
+    # Only the due job runs
+    assert await queue.run_pending(mock_db.jobs) == 1
+
+
+# runpy warns about running an imported module as __main__, which is the case
+# the test is about
+@pytest.mark.filterwarnings("ignore:'app.jobs' found in sys.modules")
+def test_worker_entry_point_runs_registered_jobs(mock_db, monkeypatch):
+    """`python -m app.jobs` runs the jobs the services registered"""
+    import app.database
+    from app.groups.service import REFRESH_MEMBER_PROFILE, group_service
+    from bson import ObjectId
+
+    alice = ObjectId()
+    job_id = f"{REFRESH_MEMBER_PROFILE}:{alice}"
+
+    async def seed():
+        await mock_db.users.insert_one({"_id": alice, "name": "Alice"})
+        await mock_db.groups.insert_one(
+            {"members": [{"userId": str(alice), "profile": {"name": "Al"}}]}
+        )
+        await group_service.schedule_member_profile_refresh(str(alice), delay=0)
+
+    async def stop_when_done():
+        for _ in range(200):
+            job = await mock_db.jobs.find_one({"_id": job_id})
+            if job["status"] == DONE:
+                break
+            await asyncio.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGINT)
+
+    async def connect_to_mongo():
+        asyncio.create_task(stop_when_done())
+
+    async def close_mongo_connection():
+        pass
+
+    asyncio.run(seed())
+    monkeypatch.setattr(app.database, "connect_to_mongo", connect_to_mongo)
+    monkeypatch.setattr(app.database, "close_mongo_connection", close_mongo_connection)
+    monkeypatch.setattr(app.database, "get_database", lambda: mock_db)
+
+    try:
+        runpy.run_module("app.jobs", run_name="__main__")
+    except KeyboardInterrupt:
+        pass  # Only without a signal handler, when nothing was run
+
+    async def check():
+        job = await mock_db.jobs.find_one({"_id": job_id})
+        group = await mock_db.groups.find_one({})
+        return job["status"], group["members"][0]["profile"]["name"]
+
+    assert asyncio.run(check()) == (DONE, "Alice")
@@ -0,0 +1,161 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from app.auth.security import create_access_token
+from app.config import settings
+from app.profiling import (
+    QUERY_COUNT_HEADER,
+    QUERY_TIME_HEADER,
+    QueryProfiler,
+    QueryProfilingMiddleware,
+    command_shape,
+    filter_shape,
+    get_current_profile,
+    profile_queries,
+)
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from httpx import ASGITransport, AsyncClient
+from main import app
+
+
+def _started(request_id, command_name, command):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        command_name=command_name,
+        command=command,
+    )
+
+
+def _finished(request_id, duration_micros):
+    return SimpleNamespace(
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        duration_micros=duration_micros,
+    )
+
+
+def test_filter_shape_hides_values():
+    shape = filter_shape(
+        {
+            "groupId": "abc",
+            "status": {"$in": ["pending", "completed"]},
+            "$or": [{"payerId": "u1"}, {"payeeId": "u1"}],
+        }
+    )
+    assert shape == {
+        "groupId": "?",
+        "status": {"$in": "?"},
+        "$or": [{"payerId": "?"}, {"payeeId": "?"}],
+    }
+
+
+def test_command_shape_uses_pipeline_for_aggregate():
+    command = {
+        "aggregate": "settlements",
+        "pipeline": [{"$match": {"groupId": "g1"}}],
+    }
+    assert command_shape(command) == [{"$match": {"groupId": "?"}}]
+
+
+def test_listener_records_commands_for_active_profile():
+    listener = QueryProfiler()
+
+    with profile_queries() as profile:
+        listener.started(_started(1, "find", {"find": "groups", "filter": {"a": 1}}))
+        listener.succeeded(_finished(1, 2500))
+        listener.started(_started(2, "insert", {"insert": "expenses"}))
+        listener.failed(_finished(2, 500))
+
+    assert profile.count == 2
+    assert profile.commands[0].collection == "groups"
+    assert profile.commands[0].shape == {"a": "?"}
+    assert profile.commands[0].duration_ms == 2.5
+    assert profile.commands[1].failed is True
+    assert profile.total_ms == 3.0
+
+
+def test_listener_ignores_commands_outside_profile():
+    listener = QueryProfiler()
+    listener.started(_started(1, "find", {"find": "groups"}))
+    listener.succeeded(_finished(1, 1000))
+
+    with profile_queries() as profile:
+        pass
+
+    assert profile.count == 0
+    assert get_current_profile() is None
+
+
+def test_middleware_reports_headers_and_slow_commands(caplog, monkeypatch):
+    monkeypatch.setattr(settings, "db_slow_query_ms", 50.0)
+    test_app = FastAPI()
+    test_app.add_middleware(QueryProfilingMiddleware)
+
+    @test_app.get("/test")
+    async def endpoint():
+        profile = get_current_profile()
+        profile.record("find", "groups", 10.0, shape={"_id": "?"})
+        profile.record("aggregate", "settlements", 80.0, shape=[{"$match": "?"}])
+        return {"ok": True}
+
+    client = TestClient(test_app)
+    with caplog.at_level(logging.INFO):
+        response = client.get("/test")
+
+    assert response.headers[QUERY_COUNT_HEADER] == "2"
+    assert response.headers[QUERY_TIME_HEADER] == "90.0"
+    assert "2 commands" in caplog.text
+    assert "Slow DB command during GET /test: aggregate on settlements" in caplog.text
+    assert "find on groups took" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_assert_max_queries_for_group_members_endpoint(
+    mock_db, assert_max_queries
+):
+    user_ids = [ObjectId() for _ in range(5)]
+    await mock_db.users.insert_many(
+        [{"_id": uid, "name": f"User {i}"} for i, uid in enumerate(user_ids)]
+    )
+    now = datetime.now(timezone.utc)
+    group_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "name": "Trip",
+            "members": [
+                {"userId": str(uid), "role": "member", "joinedAt": now}
+                for uid in user_ids
+            ],
+        }
+    )
+    token = create_access_token(
+        {"sub": str(user_ids[0])}, expires_delta=timedelta(minutes=5)
+    )
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        # One group lookup plus one batched user lookup, regardless of size
+        with assert_max_queries(2) as profile:
+            response = await client.get(
+                f"/groups/{group_id}/members",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert [c.collection for c in profile.commands] == ["groups", "users"]
+
+
+@pytest.mark.asyncio
+async def test_assert_max_queries_fails_when_exceeded(mock_db, assert_max_queries):
+    with pytest.raises(AssertionError, match="at most 1 queries, got 2"):
+        with assert_max_queries(1):
+            await mock_db.groups.find_one({"name": "a"})
+            await mock_db.users.count_documents({})
@@ -0,0 +1,179 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from app import realtime
+from app.auth.security import create_access_token
+from app.realtime import EventBus, LocalBroker
+from app.realtime import redis as redis_broker
+from app.realtime.bus import RESYNC
+from app.sync.changes import DELETE, EXPENSE, MEMBERSHIP, change, record_changes
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from main import app
+from starlette.websockets import WebSocketDisconnect
+
+
+def event(type_, group_id, **extra):
+    return {"type": type_, "groupId": group_id, "id": "x", **extra}
+
+
+@pytest.fixture
+def bus():
+    return EventBus(LocalBroker(), queue_size=3)
+
+
+@pytest.mark.asyncio
+async def test_events_reach_subscribers_of_the_group_only(bus):
+    alice = bus.subscribe("alice", ["g1"])
+    bob = bus.subscribe("bob", ["g2"])
+
+    await bus.publish(event("expense.upsert", "g1"))
+
+    assert (await alice.get())["type"] == "expense.upsert"
+    assert bob.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_membership_events_update_subscriptions(bus):
+    carol = bus.subscribe("carol", [])
+
+    await bus.publish(event("membership.upsert", "g1", userIds=["carol"]))
+    await bus.publish(event("expense.upsert", "g1"))
+    await bus.publish(event("membership.delete", "g1", userIds=["carol"]))
+    await bus.publish(event("expense.delete", "g1"))
+
+    received = [carol.queue.get_nowait()["type"] for _ in range(carol.queue.qsize())]
+    assert received == ["membership.upsert", "expense.upsert", "membership.delete"]
+    assert bus.metrics()["groups"] == 0
+
+
+@pytest.mark.asyncio
+async def test_deleted_group_unsubscribes_its_members(bus):
+    alice = bus.subscribe("alice", ["g1"])
+
+    await bus.publish(event("group.delete", "g1", userIds=["alice"]))
+    await bus.publish(event("expense.upsert", "g1"))
+
+    assert alice.queue.qsize() == 1
+    assert alice.group_ids == set()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync_instead_of_blocking(bus):
+    slow = bus.subscribe("alice", ["g1"])
+
+    for _ in range(5):
+        await bus.publish(event("expense.upsert", "g1"))
+
+    # The full queue was replaced by a resync marker, later events queue up again
+    assert [slow.queue.get_nowait() for _ in range(slow.queue.qsize())][0] == RESYNC
+    assert slow.dropped == 3
+    assert bus.metrics()["overflows"] == 1
+
+    slow.close()
+    assert bus.metrics()["connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_recorded_changes_are_published(bus, monkeypatch):
+    monkeypatch.setattr("app.sync.changes.get_bus", lambda: bus)
+    alice = bus.subscribe("alice", ["g1"])
+
+    await record_changes(
+        AsyncMock(),
+        "g1",
+        [change(EXPENSE, "e1", DELETE), change(MEMBERSHIP, "g1", user_ids=["bob"])],
+    )
+
+    first, second = await alice.get(), await alice.get()
+    assert {k: first[k] for k in ("type", "groupId", "id")} == {
+        "type": "expense.delete",
+        "groupId": "g1",
+        "id": "e1",
+    }
+    assert second["type"] == "membership.upsert"
+    assert second["userIds"] == ["bob"]
+
+
+@pytest.fixture
+def client(monkeypatch, mock_db):
+    monkeypatch.setattr("app.config.settings.realtime_heartbeat_seconds", 0.05)
+    monkeypatch.setattr("main.get_database", lambda: mock_db)
+    monkeypatch.setattr("main.connect_to_mongo", lambda: _noop())
+    monkeypatch.setattr("main.close_mongo_connection", lambda: _noop())
+    with TestClient(app) as client:
+        yield client
+
+
+async def _noop():
+    pass
+
+
+def test_websocket_pushes_group_events(client, mock_db):
+    user_id = str(ObjectId())
+    group_id = ObjectId()
+    client.portal.call(
+        mock_db.groups.insert_one,
+        {"_id": group_id, "name": "Trip", "members": [{"userId": user_id}]},
+    )
+    token = create_access_token({"sub": user_id}, expires_delta=timedelta(minutes=5))
+
+    with client.websocket_connect(f"/ws?token={token}") as websocket:
+        assert websocket.receive_json() == {"type": "ping"}
+        client.portal.call(
+            realtime.get_bus().publish, event("expense.upsert", str(group_id))
+        )
+        assert websocket.receive_json()["type"] == "expense.upsert"
+
+
+def test_websocket_rejects_invalid_token(client):
+    with pytest.raises(WebSocketDisconnect) as exc_info:
+        with client.websocket_connect("/ws?token=invalid") as websocket:
+            websocket.receive_json()
+    assert exc_info.value.code == 1008
+
+
+class FakePubSub:
+    def __init__(self, messages, error=None):
+        self.messages, self.error = messages, error
+        self.channels, self.closed = [], False
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        if self.error:
+            raise self.error
+        await asyncio.Event().wait()  # Stay connected
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_resubscribes_after_the_connection_drops(monkeypatch):
+    monkeypatch.setattr(redis_broker, "RECONNECT_DELAY", 0)
+    payload = json.dumps(event("expense.upsert", "g1"))
+    dropped = FakePubSub(
+        [{"type": "message", "data": payload}], ConnectionError("lost")
+    )
+    restored = FakePubSub([{"type": "subscribe"}, {"type": "message", "data": payload}])
+    client = MagicMock()
+    client.pubsub.side_effect = [dropped, restored]
+    client.close = AsyncMock()
+    bus = EventBus(redis_broker.RedisBroker("redis://test", client=client))
+    alice = bus.subscribe("alice", ["g1"])
+
+    await bus.broker.start()
+    first = await asyncio.wait_for(alice.get(), 1)
+    second = await asyncio.wait_for(alice.get(), 1)
+    await bus.broker.close()
+
+    assert first == second == event("expense.upsert", "g1")
+    assert dropped.closed and restored.closed
+    assert restored.channels == [redis_broker.CHANNEL]
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import backfill_member_profiles  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_backfill_adds_missing_snapshots(mock_db):
+    alice, bob = ObjectId(), ObjectId()
+    await mock_db.users.insert_many(
+        [
+            {"_id": alice, "name": "Alice", "email": "a@x.com", "imageUrl": None},
+            {"_id": bob, "name": "Bob", "email": "b@x.com", "password": "hash"},
+        ]
+    )
+    group_id = ObjectId()
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "members": [{"userId": str(alice)}, {"userId": str(bob)}],
+            "version": 3,
+        }
+    )
+
+    stats = await backfill_member_profiles.backfill_profiles(batch_size=1)
+
+    assert stats == {"users": 2, "groups": 2}
+    group = await mock_db.groups.find_one({"_id": group_id})
+    assert [m["profile"] for m in group["members"]] == [
+        {"name": "Alice", "email": "a@x.com", "imageUrl": None},
+        {"name": "Bob", "email": "b@x.com", "imageUrl": None},
+    ]
+    assert group["version"] == 5
+
+    # Snapshots that are up to date are left alone
+    assert await backfill_member_profiles.backfill_profiles() == {
+        "users": 2,
+        "groups": 0,
+    }
@@ -0,0 +1,120 @@
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import backup_db  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    database = mongomock.MongoClient()["backup_test"]
+    database.users.insert_many(
+        [
+            {
+                "_id": ObjectId(),
+                "name": f"User {i}",
+                "createdAt": datetime(2025, 1, i + 1),
+            }
+            for i in range(5)
+        ]
+    )
+    database.expenses.insert_many(
+        [{"_id": ObjectId(), "amount": float(i), "count": i} for i in range(23)]
+    )
+    return database
+
+
+def test_backup_streams_collections_into_compressed_parts(db, tmp_path):
+    backup_path, metadata = backup_db.create_backup(
+        db=db, backup_dir=str(tmp_path), batch_size=4, docs_per_part=10
+    )
+
+    assert metadata["collections"] == {"expenses": 23, "users": 5}
+    assert metadata["total_documents"] == 28
+    assert metadata["complete"] is True
+    parts = sorted(os.listdir(os.path.join(backup_path, "expenses")))
+    assert parts == [
+        "checkpoint.json",
+        "part-00000.ndjson.gz",
+        "part-00001.ndjson.gz",
+        "part-00002.ndjson.gz",
+    ]
+    with gzip.open(os.path.join(backup_path, "users", "part-00000.ndjson.gz")) as f:
+        first = json.loads(f.readline())
+    assert "$oid" in first["_id"]
+    assert "$date" in first["createdAt"]
+
+
+def test_restore_round_trips_bson_types(db, tmp_path):
+    backup_path, _ = backup_db.create_backup(
+        db=db, backup_dir=str(tmp_path), docs_per_part=10
+    )
+    target = mongomock.MongoClient()["restore_test"]
+
+    stats = backup_db.restore_backup(backup_path, db=target, batch_size=7)
+
+    assert stats == {"expenses": 23, "users": 5}
+    assert list(target.users.find().sort("_id", 1)) == list(
+        db.users.find().sort("_id", 1)
+    )
+    restored = target.expenses.find_one({"count": 3})
+    assert isinstance(restored["_id"], ObjectId)
+    assert isinstance(restored["amount"], float)
+
+
+def test_restore_can_be_rerun_without_duplicates(db, tmp_path):
+    backup_path, _ = backup_db.create_backup(db=db, backup_dir=str(tmp_path))
+    target = mongomock.MongoClient()["restore_test"]
+    backup_db.restore_backup(backup_path, db=target, collections=["users"])
+
+    stats = backup_db.restore_backup(backup_path, db=target, collections=["users"])
+
+    assert stats == {"users": 0}
+    assert target.users.count_documents({}) == 5
+
+
+def test_interrupted_backup_resumes_from_checkpoint(db, tmp_path, monkeypatch):
+    original_open = backup_db._open_text
+
+    def failing_open(path, mode, compression):
+        if "expenses" in path and path.endswith("part-00001.ndjson.gz"):
+            raise OSError("disk full")
+        return original_open(path, mode, compression)
+
+    monkeypatch.setattr(backup_db, "_open_text", failing_open)
+    with pytest.raises(OSError):
+        backup_db.create_backup(
+            db=db, backup_dir=str(tmp_path), docs_per_part=10, workers=1
+        )
+    (backup_path,) = [str(p) for p in tmp_path.iterdir()]
+    checkpoint = backup_db._read_checkpoint(backup_path, "expenses")
+    assert checkpoint["parts"] == 1 and checkpoint["count"] == 10
+
+    monkeypatch.setattr(backup_db, "_open_text", original_open)
+    _, metadata = backup_db.create_backup(
+        db=db, resume=backup_path, docs_per_part=10, workers=1
+    )
+
+    assert metadata["collections"] == {"expenses": 23, "users": 5}
+    restored_ids = [
+        doc["_id"] for doc in backup_db.iter_backup_documents(backup_path, "expenses")
+    ]
+    assert restored_ids == [doc["_id"] for doc in db.expenses.find().sort("_id", 1)]
+
+
+def test_reads_legacy_json_backups(tmp_path):
+    user_id = ObjectId()
+    with open(tmp_path / "users.json", "w") as f:
+        json.dump([{"_id": str(user_id), "name": "Alice"}], f)
+
+    documents = list(backup_db.iter_backup_documents(str(tmp_path), "users"))
+
+    assert documents == [{"_id": user_id, "name": "Alice"}]
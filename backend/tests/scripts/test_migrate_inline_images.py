@@ -0,0 +1,117 @@
+import base64
+import io
+import os
+import sys
+
+import pytest
+from app.storage import LocalBlobStorage
+from bson import ObjectId
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import migrate_inline_images  # noqa: E402
+
+
+def png_data_url(color):
+    output = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(output, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(output.getvalue()).decode()
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalBlobStorage(str(tmp_path))
+    monkeypatch.setattr("app.storage._storage", storage)
+    return storage
+
+
+@pytest.mark.asyncio
+async def test_migrates_inline_images_in_batches(mock_db, storage):
+    inline_ids = [ObjectId() for _ in range(5)]
+    await mock_db.users.insert_many(
+        [
+            {"_id": user_id, "imageUrl": png_data_url((i * 40, 0, 0))}
+            for i, user_id in enumerate(inline_ids)
+        ]
+        + [
+            {"_id": ObjectId(), "imageUrl": "https://example.com/a.png"},
+            {"_id": ObjectId(), "imageUrl": None},
+            {"_id": ObjectId(), "imageUrl": "data:image/png;base64,bm90IGFuIGltYWdl"},
+        ]
+    )
+
+    stats = await migrate_inline_images.migrate_collection(
+        mock_db, "users", batch_size=2
+    )
+
+    assert stats["scanned"] == 6
+    assert stats["migrated"] == 5
+    assert stats["failed"] == 1
+    for user_id in inline_ids:
+        user = await mock_db.users.find_one({"_id": user_id})
+        assert user["imageUrl"].startswith("/images/")
+        key = user["imageUrl"][len("/images/") : -len(".png")]
+        assert await storage.exists(key)
+    assert await mock_db.users.find_one({"imageUrl": "https://example.com/a.png"})
+
+    rerun = await migrate_inline_images.migrate_collection(mock_db, "users")
+    assert rerun["migrated"] == 0
+
+
+@pytest.mark.asyncio
+async def test_conversions_are_recorded_and_copied_into_snapshots(mock_db, storage):
+    user_id, group_id = ObjectId(), ObjectId()
+    data_url = png_data_url("blue")
+    await mock_db.users.insert_one(
+        {"_id": user_id, "name": "Alice", "email": "a@x.com", "imageUrl": data_url}
+    )
+    await mock_db.groups.insert_one(
+        {
+            "_id": group_id,
+            "imageUrl": png_data_url("green"),
+            "members": [
+                {
+                    "userId": str(user_id),
+                    "profile": {
+                        "name": "Alice",
+                        "email": "a@x.com",
+                        "imageUrl": data_url,
+                    },
+                }
+            ],
+            "version": 1,
+        }
+    )
+
+    users = await migrate_inline_images.migrate_collection(mock_db, "users")
+    groups = await migrate_inline_images.migrate_collection(mock_db, "groups")
+
+    assert users["snapshot_groups"] == 1
+    assert groups["migrated"] == 1
+    user = await mock_db.users.find_one({"_id": user_id})
+    group = await mock_db.groups.find_one({"_id": group_id})
+    assert group["members"][0]["profile"]["imageUrl"] == user["imageUrl"]
+    assert group["imageUrl"].startswith("/images/")
+    assert group["version"] == 3
+    changes = await mock_db.changes.find({}, {"_id": 0, "at": 0}).to_list(None)
+    assert sorted((c["entity"], c["entityId"]) for c in changes) == [
+        ("group", str(group_id)),
+        ("user", str(user_id)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_dry_run_changes_nothing(mock_db, storage, tmp_path):
+    await mock_db.groups.insert_one({"name": "Trip", "imageUrl": png_data_url("red")})
+
+    stats = await migrate_inline_images.migrate_collection(
+        mock_db, "groups", dry_run=True
+    )
+
+    assert stats["migrated"] == 1
+    group = await mock_db.groups.find_one({})
+    assert group["imageUrl"].startswith("data:")
+    assert "version" not in group
+    assert await mock_db.changes.count_documents({}) == 0
+    assert [p for p in tmp_path.rglob("*") if p.is_file()] == []
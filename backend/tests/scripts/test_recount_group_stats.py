@@ -0,0 +1,49 @@
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import recount_group_stats  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_recount_repairs_drifted_counters(mock_db):
+    drifted_id, correct_id = ObjectId(), ObjectId()
+    correct_stats = {
+        "expenseCount": 0,
+        "totalExpenses": 0,
+        "settlementCount": 0,
+        "pendingCount": 0,
+        "pendingTotal": 0,
+    }
+    await mock_db.groups.insert_many(
+        [
+            {"_id": drifted_id, "stats": {**correct_stats, "expenseCount": 5}},
+            {"_id": correct_id, "stats": correct_stats},
+        ]
+    )
+    await mock_db.expenses.insert_one({"groupId": str(drifted_id), "amount": 40.0})
+    await mock_db.settlements.insert_many(
+        [
+            {"groupId": str(drifted_id), "amount": 20.0, "status": "pending"},
+            {"groupId": str(drifted_id), "amount": 20.0, "status": "completed"},
+        ]
+    )
+
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        stats = await recount_group_stats.recount_groups()
+
+    assert stats == {"recounted": 2, "repaired": 1}
+    group = await mock_db.groups.find_one({"_id": drifted_id})
+    assert group["stats"] == {
+        "expenseCount": 1,
+        "totalExpenses": 40.0,
+        "settlementCount": 2,
+        "pendingCount": 1,
+        "pendingTotal": 20.0,
+    }
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+from app.config import settings
+from app.groups.service import group_service
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "scripts"))
+
+import sweep_orphaned_group_data  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_sweep_removes_data_of_deleted_groups_only(mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "group_deletion_batch_delay", 0)
+    live = ObjectId()
+    deleted = str(ObjectId())
+    await mock_db.groups.insert_one({"_id": live})
+    await mock_db.expenses.insert_many(
+        [{"groupId": str(live)}, {"groupId": deleted}, {"groupId": deleted}]
+    )
+    await mock_db.settlements.insert_one({"groupId": deleted})
+
+    # A deletion queued by the API is not run by a dry run either
+    await group_service.delete_group_data(deleted)
+    assert await sweep_orphaned_group_data.sweep(dry_run=True) == [deleted]
+    assert await mock_db.expenses.count_documents({}) == 3
+
+    assert await sweep_orphaned_group_data.sweep() == [deleted]
+    assert await mock_db.expenses.count_documents({}) == 1
+    assert await mock_db.settlements.count_documents({}) == 0
+    assert await mock_db.groups.count_documents({}) == 1
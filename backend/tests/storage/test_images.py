@@ -0,0 +1,187 @@
+import asyncio
+import base64
+import io
+
+import pytest
+from app.config import settings
+from app.storage import LocalBlobStorage
+from app.storage.images import (
+    decode_data_url,
+    externalize_image_url,
+    image_variant_url,
+    is_data_url,
+    warm_image_variants,
+)
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+from main import app
+from PIL import Image
+
+
+def make_png(width=16, height=16):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (0, 120, 200)).save(output, format="PNG")
+    return output.getvalue()
+
+
+async def run_inline(fn, *args):
+    return fn(*args)
+
+
+def data_url(data, content_type="image/png"):
+    return f"data:{content_type};base64,{base64.b64encode(data).decode()}"
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalBlobStorage(str(tmp_path / "blobs"))
+    monkeypatch.setattr("app.storage._storage", storage)
+    monkeypatch.setattr(settings, "image_cache_path", str(tmp_path / "cache"))
+    return storage
+
+
+@pytest.fixture
+async def async_client():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        yield ac
+
+
+def test_decode_data_url():
+    assert is_data_url("data:image/png;base64,AAAA")
+    assert not is_data_url("https://example.com/avatar.png")
+    assert decode_data_url(data_url(b"hello")) == b"hello"
+    with pytest.raises(ValueError):
+        decode_data_url("data:image/png,not-base64")
+    with pytest.raises(ValueError):
+        decode_data_url("data:image/png;base64,@@@")
+
+
+@pytest.mark.asyncio
+async def test_externalize_stores_image_under_content_address(storage):
+    png = make_png()
+
+    url = await externalize_image_url(data_url(png, "image/jpeg"))
+
+    # The stored type comes from the image itself, not the data URL
+    assert url.startswith("/images/") and url.endswith(".png")
+    key = url[len("/images/") : -len(".png")]
+    assert await storage.read_all(key) == png
+    assert await externalize_image_url(data_url(png)) == url
+
+
+@pytest.mark.asyncio
+async def test_externalize_leaves_other_values_alone(storage):
+    assert await externalize_image_url(None) is None
+    assert (
+        await externalize_image_url("https://example.com/a.png")
+        == "https://example.com/a.png"
+    )
+
+
+@pytest.mark.asyncio
+async def test_externalize_rejects_invalid_images(storage, monkeypatch):
+    with pytest.raises(HTTPException) as exc_info:
+        await externalize_image_url(data_url(b"not an image"))
+    assert exc_info.value.status_code == 400
+
+    monkeypatch.setattr(settings, "image_max_bytes", 10)
+    with pytest.raises(HTTPException) as exc_info:
+        await externalize_image_url(data_url(make_png()))
+    assert exc_info.value.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_image_route_serves_with_immutable_caching(storage, async_client):
+    png = make_png()
+    url = await externalize_image_url(data_url(png))
+
+    response = await async_client.get(url)
+
+    assert response.status_code == 200
+    assert response.content == png
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+
+    revalidated = await async_client.get(
+        url, headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_image_route_unknown_image(storage, async_client):
+    assert (await async_client.get("/images/" + "0" * 64 + ".png")).status_code == 404
+    assert (await async_client.get("/images/not-a-key.png")).status_code == 404
+    assert (await async_client.get("/images/" + "0" * 64 + ".exe")).status_code == 404
+
+
+def test_image_variant_url():
+    url = "/images/" + "a" * 64 + ".png"
+    assert image_variant_url(url, 64) == f"{url}?size=64"
+    assert image_variant_url(url, 50) == f"{url}?size=64"
+    assert image_variant_url(url, 5000) == f"{url}?size=1024"
+    assert image_variant_url("https://example.com/a.png", 64) == (
+        "https://example.com/a.png"
+    )
+    assert image_variant_url(None, 64) is None
+
+
+@pytest.mark.asyncio
+async def test_image_route_serves_cached_resized_variants(
+    storage, async_client, monkeypatch, tmp_path
+):
+    calls = []
+
+    async def counting_run(fn, *args):
+        calls.append(args[1].max_size)
+        return fn(*args)
+
+    monkeypatch.setattr("app.storage.images.run_in_process", counting_run)
+    url = await externalize_image_url(data_url(make_png(400, 200)))
+
+    response = await async_client.get(f"{url}?size=50")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    assert Image.open(io.BytesIO(response.content)).size == (64, 32)
+    cached = [p.name for p in (tmp_path / "cache").rglob("*") if p.is_file()]
+    assert cached == [f"{url[len('/images/'):-len('.png')]}-64.png"]
+
+    again = await async_client.get(f"{url}?size=64")
+    assert again.content == response.content
+    assert again.headers["etag"] == response.headers["etag"]
+    assert calls == [64]
+
+    revalidated = await async_client.get(
+        f"{url}?size=64", headers={"If-None-Match": response.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_concurrent_variant_requests_generate_once(storage, monkeypatch):
+    calls = []
+
+    async def slow_run(fn, *args):
+        calls.append(args[1].max_size)
+        await asyncio.sleep(0.01)
+        return fn(*args)
+
+    monkeypatch.setattr("app.storage.images.run_in_process", slow_run)
+    url = await externalize_image_url(data_url(make_png(300, 300)))
+
+    await asyncio.gather(*[warm_image_variants(url, (128,)) for _ in range(5)])
+
+    assert calls == [128]
+
+
+@pytest.mark.asyncio
+async def test_variant_of_unknown_image(storage, async_client, monkeypatch):
+    monkeypatch.setattr("app.storage.images.run_in_process", run_inline)
+
+    response = await async_client.get("/images/" + "0" * 64 + ".png?size=64")
+
+    assert response.status_code == 404
@@ -0,0 +1,247 @@
+import hashlib
+import io
+
+import pytest
+from app.storage import (
+    BlobNotFoundError,
+    BlobTooLargeError,
+    GridFSBlobStorage,
+    LocalBlobStorage,
+    S3BlobStorage,
+)
+from app.storage.responses import etag_matches, parse_range
+from fastapi import HTTPException
+
+
+class FakeS3Error(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}}
+
+
+class FakeS3Client:
+    """In-memory stand-in for the subset of the S3 API used by S3BlobStorage"""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        self.objects[(Bucket, Key)] = b"".join(parts[n] for n in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+
+    def copy_object(self, Bucket, Key, CopySource):
+        source = (CopySource["Bucket"], CopySource["Key"])
+        self.objects[(Bucket, Key)] = self.objects[source]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("404")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def get_object(self, Bucket, Key, Range):
+        if (Bucket, Key) not in self.objects:
+            raise FakeS3Error("NoSuchKey")
+        data = self.objects[(Bucket, Key)]
+        first, last = Range[len("bytes=") :].split("-")
+        end = int(last) + 1 if last else len(data)
+        return {"Body": io.BytesIO(data[int(first) : end])}
+
+
+@pytest.fixture(params=["local", "gridfs", "s3"])
+def storage(request, tmp_path, mock_db):
+    if request.param == "local":
+        return LocalBlobStorage(str(tmp_path))
+    if request.param == "gridfs":
+        # Small chunks so ranged reads span several chunk documents
+        return GridFSBlobStorage(lambda: mock_db, chunk_size=1000)
+    return S3BlobStorage("bucket", client=FakeS3Client())
+
+
+async def chunked(data: bytes, size: int = 777):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+DATA = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.mark.asyncio
+async def test_put_stores_content_under_digest(storage):
+    blob = await storage.put(chunked(DATA))
+
+    assert blob.key == hashlib.sha256(DATA).hexdigest()
+    assert blob.size == len(DATA)
+    assert blob.deduplicated is False
+    assert await storage.exists(blob.key)
+    assert await storage.size(blob.key) == len(DATA)
+    assert await storage.read_all(blob.key) == DATA
+
+
+@pytest.mark.asyncio
+async def test_put_deduplicates_identical_content(storage):
+    first = await storage.put(chunked(DATA))
+    second = await storage.put(chunked(DATA, size=4096))
+
+    assert second.key == first.key
+    assert second.deduplicated is True
+    assert await storage.read_all(first.key) == DATA
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("start,end", [(0, 0), (10, 2500), (999, 1000), (9000, None)])
+async def test_ranged_read(storage, start, end):
+    blob = await storage.put(chunked(DATA))
+
+    data = b"".join([chunk async for chunk in storage.read(blob.key, start, end)])
+
+    expected = DATA[start:] if end is None else DATA[start : end + 1]
+    assert data == expected
+
+
+@pytest.mark.asyncio
+async def test_put_enforces_size_limit_while_streaming(storage):
+    with pytest.raises(BlobTooLargeError):
+        await storage.put(chunked(DATA), max_bytes=5000)
+
+    assert not await storage.exists(hashlib.sha256(DATA).hexdigest())
+
+
+@pytest.mark.asyncio
+async def test_missing_blob(storage):
+    key = hashlib.sha256(b"missing").hexdigest()
+    assert not await storage.exists(key)
+    with pytest.raises(BlobNotFoundError):
+        await storage.size(key)
+    with pytest.raises(BlobNotFoundError):
+        await storage.read_all(key)
+
+
+@pytest.mark.asyncio
+async def test_delete(storage):
+    blob = await storage.put(chunked(DATA))
+    await storage.delete(blob.key)
+    await storage.delete(blob.key)  # idempotent
+
+    assert not await storage.exists(blob.key)
+
+
+@pytest.mark.asyncio
+async def test_local_storage_cleans_up_temp_files(tmp_path):
+    storage = LocalBlobStorage(str(tmp_path))
+    await storage.put(chunked(DATA))
+    await storage.put(chunked(DATA))
+    with pytest.raises(BlobTooLargeError):
+        await storage.put(chunked(DATA + b"x"), max_bytes=100)
+
+    assert list((tmp_path / "tmp").iterdir()) == []
+
+
+class StoppingCollection:
+    """A collection whose `method` fails as if the process stopped there"""
+
+    def __init__(self, collection, method):
+        self._collection = collection
+        self._method = method
+
+    def __getattr__(self, name):
+        if name == self._method:
+            raise RuntimeError("process stopped")
+        return getattr(self._collection, name)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "collection,method", [("chunks", "update_many"), ("files", "insert_one")]
+)
+async def test_interrupted_gridfs_commit_leaves_no_blob(
+    mock_db, monkeypatch, collection, method
+):
+    await mock_db["blobs.chunks"].create_index([("files_id", 1), ("n", 1)], unique=True)
+    storage = GridFSBlobStorage(lambda: mock_db, chunk_size=1000)
+    key = hashlib.sha256(DATA).hexdigest()
+    real = getattr(GridFSBlobStorage, collection)
+    monkeypatch.setattr(
+        GridFSBlobStorage,
+        collection,
+        property(lambda s: StoppingCollection(real.fget(s), method)),
+    )
+
+    with pytest.raises(RuntimeError):
+        await storage.put(chunked(DATA))
+    monkeypatch.undo()
+    # Not visible, so the next upload is not deduplicated onto a partial blob
+    assert not await storage.exists(key)
+
+    blob = await storage.put(chunked(DATA, size=4096))
+    assert blob.deduplicated is False
+    assert await storage.read_all(key) == DATA
+    assert await mock_db["blobs.chunks"].count_documents({}) == 11
+
+
+@pytest.mark.asyncio
+async def test_local_storage_rejects_non_digest_keys(tmp_path):
+    storage = LocalBlobStorage(str(tmp_path))
+    with pytest.raises(BlobNotFoundError):
+        await storage.size("../../etc/passwd")
+
+
+@pytest.mark.asyncio
+async def test_s3_storage_uploads_large_blobs_in_parts(monkeypatch):
+    monkeypatch.setattr("app.storage.s3.PART_SIZE", 4096)
+    client = FakeS3Client()
+    storage = S3BlobStorage("bucket", client=client, prefix="blobs/")
+
+    blob = await storage.put(chunked(DATA, size=1000))
+
+    assert list(client.objects) == [("bucket", f"blobs/{blob.key}")]
+    assert client.uploads == {}
+    assert await storage.read_all(blob.key) == DATA
+
+
+@pytest.mark.parametrize(
+    "header,expected",
+    [
+        (None, None),
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=900-5000", (900, 999)),
+        ("bytes=0-1,5-6", None),
+        ("bytes=abc", None),
+        ("items=0-1", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+def test_parse_range_not_satisfiable():
+    with pytest.raises(HTTPException) as exc_info:
+        parse_range("bytes=1000-", 1000)
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers["Content-Range"] == "bytes */1000"
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from app.auth.security import create_access_token
+from app.expenses.schemas import ExpenseCreateRequest, ExpenseSplit
+from app.expenses.service import expense_service
+from app.groups.service import group_service
+from app.sync.service import sync_service
+from bson import ObjectId
+from httpx import ASGITransport, AsyncClient
+from main import app
+
+ALICE, BOB, CAROL = (str(ObjectId()) for _ in range(3))
+
+
+@pytest.fixture(autouse=True)
+async def setup(mock_db, monkeypatch):
+    monkeypatch.setattr(
+        "app.expenses.service.mongodb", SimpleNamespace(database=mock_db)
+    )
+    monkeypatch.setattr("app.sync.service.get_database", lambda: mock_db)
+    # Hand out changes right away instead of waiting for them to settle
+    monkeypatch.setattr(sync_service, "_horizon", ObjectId)
+    await mock_db.users.insert_many(
+        [
+            {"_id": ObjectId(uid), "name": name}
+            for uid, name in [(ALICE, "Alice"), (BOB, "Bob"), (CAROL, "Carol")]
+        ]
+    )
+
+
+async def create_expense(group_id, amount=30.0):
+    request = ExpenseCreateRequest(
+        description="Dinner",
+        amount=amount,
+        splits=[
+            ExpenseSplit(userId=ALICE, amount=amount / 2),
+            ExpenseSplit(userId=BOB, amount=amount / 2),
+        ],
+        paidBy=ALICE,
+    )
+    result = await expense_service.create_expense(group_id, request, ALICE)
+    return result["expense"].id
+
+
+@pytest.mark.asyncio
+async def test_incremental_sync_returns_changes_and_tombstones():
+    group = await group_service.create_group({"name": "Trip"}, ALICE)
+    await group_service.join_group_by_code(group["joinCode"], BOB)
+
+    snapshot = await sync_service.sync(ALICE)
+    assert [g["_id"] for g in snapshot["groups"]] == [group["_id"]]
+    assert snapshot["expenses"] == []
+
+    expense_id = await create_expense(group["_id"])
+    changes = await sync_service.sync(ALICE, snapshot["token"])
+    assert [e.id for e in changes["expenses"]] == [expense_id]
+    assert len(changes["settlements"]) == 2
+    assert changes["groups"] == []
+
+    # Nothing new since the last token
+    unchanged = await sync_service.sync(ALICE, changes["token"])
+    assert unchanged["expenses"] == unchanged["settlements"] == []
+
+    await expense_service.delete_expense(group["_id"], expense_id, ALICE)
+    deletions = await sync_service.sync(ALICE, changes["token"])
+    assert deletions["expenses"] == []
+    assert deletions["deleted"]["expenses"] == [expense_id]
+    assert sorted(deletions["deleted"]["settlements"]) == sorted(
+        s.id for s in changes["settlements"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_removed_member_receives_group_tombstone():
+    group = await group_service.create_group({"name": "Trip"}, ALICE)
+    await group_service.join_group_by_code(group["joinCode"], BOB)
+    token = (await sync_service.sync(BOB))["token"]
+
+    await group_service.remove_member(group["_id"], BOB, ALICE)
+
+    changes = await sync_service.sync(BOB, token)
+    assert changes["groups"] == []
+    assert changes["deleted"]["groups"] == [group["_id"]]
+
+
+@pytest.mark.asyncio
+async def test_joining_a_group_syncs_its_history():
+    group = await group_service.create_group({"name": "Trip"}, ALICE)
+    await group_service.join_group_by_code(group["joinCode"], BOB)
+    expense_id = await create_expense(group["_id"])
+    token = (await sync_service.sync(CAROL))["token"]
+
+    await group_service.join_group_by_code(group["joinCode"], CAROL)
+
+    changes = await sync_service.sync(CAROL, token)
+    assert [g["_id"] for g in changes["groups"]] == [group["_id"]]
+    assert [e.id for e in changes["expenses"]] == [expense_id]
+
+
+@pytest.mark.asyncio
+async def test_deleted_group_reaches_all_members():
+    group = await group_service.create_group({"name": "Trip"}, ALICE)
+    await group_service.join_group_by_code(group["joinCode"], BOB)
+    token = (await sync_service.sync(BOB))["token"]
+
+    await group_service.delete_group(group["_id"], ALICE)
+
+    changes = await sync_service.sync(BOB, token)
+    assert changes["deleted"]["groups"] == [group["_id"]]
+
+
+@pytest.mark.asyncio
+async def test_changes_are_paginated(monkeypatch):
+    monkeypatch.setattr("app.sync.service.settings.sync_page_size", 2)
+    group = await group_service.create_group({"name": "Trip"}, ALICE)
+    token = (await sync_service.sync(ALICE))["token"]
+    await group_service.join_group_by_code(group["joinCode"], BOB)
+    await create_expense(group["_id"])
+
+    pages, seen_expenses = 0, set()
+    while True:
+        page = await sync_service.sync(ALICE, token)
+        pages += 1
+        seen_expenses |= {e.id for e in page["expenses"]}
+        token = page["token"]
+        if not page["hasMore"]:
+            break
+
+    assert pages > 1
+    assert len(seen_expenses) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "token, status",
+    [
+        ("not-a-token", 400),
+        (
+            str(
+                ObjectId.from_datetime(ObjectId().generation_time - timedelta(days=400))
+            ),
+            410,
+        ),
+    ],
+)
+async def test_sync_route_rejects_bad_tokens(token, status):
+    access_token = create_access_token(
+        {"sub": ALICE}, expires_delta=timedelta(minutes=5)
+    )
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.get(
+            "/sync",
+            params={"since": token},
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+    assert response.status_code == status
@@ -0,0 +1,242 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from app.config import settings
+from app.groups.service import group_service
+from app.jobs import job_queue
+from app.user.service import DELETED_USER_PROFILE, UserService
+from bson import ObjectId
+
+
+@pytest.fixture
+def service(mock_db, monkeypatch):
+    for setting in (
+        "account_deletion_batch_size",
+        "name_propagation_batch_size",
+        "group_deletion_batch_size",
+    ):
+        monkeypatch.setattr(settings, setting, 2)
+    for setting in (
+        "account_deletion_batch_delay",
+        "name_propagation_batch_delay",
+        "group_deletion_batch_delay",
+    ):
+        monkeypatch.setattr(settings, setting, 0)
+    with patch("app.expenses.service.mongodb", SimpleNamespace(database=mock_db)):
+        yield UserService()
+
+
+@pytest.mark.asyncio
+async def test_deleted_account_is_purged_in_the_background(service, mock_db):
+    alice, bob = ObjectId(), ObjectId()
+    uid = str(alice)
+    await mock_db.users.insert_many([{"_id": alice, "name": "Alice"}, {"_id": bob}])
+    await mock_db.refresh_tokens.insert_many(
+        [{"user_id": alice, "token": f"t{i}"} for i in range(3)]
+        + [{"user_id": bob, "token": "bob"}]
+    )
+    shared, solo = ObjectId(), ObjectId()
+    await mock_db.groups.insert_many(
+        [
+            {
+                "_id": shared,
+                "members": [
+                    {"userId": uid, "profile": {"name": "Alice"}},
+                    {"userId": str(bob)},
+                ],
+                "version": 1,
+            },
+            {"_id": solo, "members": [{"userId": uid}]},
+        ]
+    )
+    await mock_db.expenses.insert_one({"groupId": str(solo)})
+    await mock_db.settlements.insert_many(
+        [
+            {
+                "groupId": str(shared),
+                "payerId": uid,
+                "payerName": "Alice",
+                "status": "completed",
+                "amount": 10,
+            },
+            {
+                "groupId": str(shared),
+                "payerId": str(bob),
+                "payeeId": uid,
+                "payeeName": "Alice",
+                "status": "pending",
+                "amount": 25,
+            },
+        ]
+    )
+
+    assert await service.delete_user(uid) is True
+    status = await service.get_account_deletion(uid)
+    assert status["status"] == "inProgress"
+    assert status["stage"] == "refreshTokens"
+    await job_queue.run_pending(mock_db.jobs)
+
+    assert await mock_db.users.count_documents({}) == 1
+    assert await mock_db.refresh_tokens.count_documents({}) == 1
+    group = await mock_db.groups.find_one({"_id": shared})
+    assert group["members"][0]["profile"] == DELETED_USER_PROFILE
+    # Bumped for the anonymized member, the cancelled settlement and the
+    # renamed payer and payee
+    assert group["version"] == 5
+    # Nobody else was in the solo group, so it is deleted with its data
+    assert await mock_db.groups.count_documents({"_id": solo}) == 0
+    assert await mock_db.expenses.count_documents({}) == 0
+    settlements = await mock_db.settlements.find({}).to_list(None)
+    assert settlements[0]["payerName"] == "Deleted user"
+    # Pending settlements with the deleted user are cancelled
+    assert [s["status"] for s in settlements] == ["completed", "cancelled"]
+    assert settlements[1]["payeeName"] == "Deleted user"
+    changes = {
+        (c["groupId"], c["entity"], c["op"])
+        for c in await mock_db.changes.find({"entity": "group"}).to_list(None)
+    }
+    assert changes == {(str(shared), "group", "upsert"), (str(solo), "group", "delete")}
+
+    status = await service.get_account_deletion(uid)
+    assert status["status"] == "completed"
+    assert status["processed"] == {
+        "refreshTokens": 3,
+        "groups": 2,
+        "settlements": 1,
+        "names": 0,
+    }
+    assert status["finishedAt"] is not None
+
+
+@pytest.mark.asyncio
+async def test_interrupted_purge_resumes(service, mock_db):
+    uid = str(ObjectId())
+    await mock_db.groups.insert_one(
+        {"members": [{"userId": uid}, {"userId": "other"}], "version": 0}
+    )
+    # Stopped after revoking the refresh tokens
+    await mock_db.account_deletions.insert_one(
+        {
+            "_id": uid,
+            "stage": 1,
+            "processed": {"refreshTokens": 5, "groups": 0, "names": 0},
+            "finishedAt": None,
+        }
+    )
+
+    # and its job is waiting for a retry
+    await mock_db.jobs.insert_one(
+        {
+            "_id": f"purgeAccount:{uid}",
+            "type": "purgeAccount",
+            "key": uid,
+            "status": "queued",
+            "attempts": 1,
+            "runAt": datetime.now(timezone.utc) - timedelta(seconds=1),
+        }
+    )
+
+    await job_queue.run_pending(mock_db.jobs)
+
+    group = await mock_db.groups.find_one({})
+    assert group["members"][0]["profile"] == DELETED_USER_PROFILE
+    status = await service.get_account_deletion(uid)
+    assert status["status"] == "completed"
+    assert status["processed"]["refreshTokens"] == 5
+
+
+@pytest.mark.asyncio
+async def test_purge_queued_for_a_user_that_was_not_deleted_is_dropped(
+    service, mock_db
+):
+    alice = ObjectId()
+    uid = str(alice)
+    await mock_db.users.insert_one({"_id": alice, "name": "Alice"})
+    await mock_db.refresh_tokens.insert_one({"user_id": alice, "token": "t"})
+    # Stopped after queueing the purge, before deleting the user
+    await mock_db.account_deletions.insert_one(
+        {"_id": uid, "stage": 0, "processed": {}, "finishedAt": None}
+    )
+
+    await service._purge_account(uid)
+
+    assert await mock_db.refresh_tokens.count_documents({}) == 1
+    assert await service.get_account_deletion(uid) is None
+
+
+@pytest.mark.asyncio
+async def test_solo_group_data_is_removed_if_purge_stops_after_the_group(
+    service, mock_db
+):
+    uid = str(ObjectId())
+    solo = ObjectId()
+    await mock_db.groups.insert_one({"_id": solo, "members": [{"userId": uid}]})
+    await mock_db.expenses.insert_one({"groupId": str(solo)})
+    await mock_db.account_deletions.insert_one(
+        {"_id": uid, "stage": 1, "processed": {}, "finishedAt": None}
+    )
+
+    # The process stops right after deleting the group document
+    groups = mock_db.groups
+
+    async def delete_then_stop(*args, **kwargs):
+        await groups.delete_one(*args, **kwargs)
+        raise RuntimeError("stopped")
+
+    stopping_db = SimpleNamespace(
+        groups=SimpleNamespace(delete_one=delete_then_stop),
+        group_deletions=mock_db.group_deletions,
+        jobs=mock_db.jobs,
+        changes=mock_db.changes,
+    )
+    with patch.object(group_service, "get_db", return_value=stopping_db):
+        with pytest.raises(RuntimeError):
+            await service._purge_groups(uid)
+
+    # The data removal was queued (held back) before the group went away
+    job = await mock_db.jobs.find_one({"_id": f"deleteGroupData:{solo}"})
+    assert job["status"] == "queued"
+    await mock_db.jobs.update_one(
+        {"_id": job["_id"]}, {"$set": {"runAt": datetime.now(timezone.utc)}}
+    )
+    await job_queue.run_pending(mock_db.jobs, ["deleteGroupData"])
+    assert await mock_db.expenses.count_documents({}) == 0
+
+
+@pytest.mark.asyncio
+async def test_anonymized_groups_are_logged_when_resuming(service, mock_db):
+    uid = str(ObjectId())
+    shared = ObjectId()
+    await mock_db.groups.insert_one(
+        {
+            "_id": shared,
+            "members": [
+                {"userId": uid, "profile": DELETED_USER_PROFILE},
+                {"userId": "o"},
+            ],
+        }
+    )
+    # Stopped after anonymizing the member, before logging the change
+    await mock_db.account_deletions.insert_one(
+        {
+            "_id": uid,
+            "stage": 1,
+            "processed": {},
+            "pendingGroups": [str(shared)],
+            "finishedAt": None,
+        }
+    )
+
+    assert await service._purge_groups(uid) == 0
+
+    change = await mock_db.changes.find_one({"groupId": str(shared)})
+    assert change["entity"] == "group"
+    deletion = await mock_db.account_deletions.find_one({"_id": uid})
+    assert "pendingGroups" not in deletion
+
+
+@pytest.mark.asyncio
+async def test_no_deletion_status_for_active_accounts(service):
+    assert await service.get_account_deletion(str(ObjectId())) is None
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from app.config import settings
 from app.database import get_database
 from app.user.service import UserService
 from bson import ObjectId
@@ -17,6 +18,8 @@ def mock_db_client():
     """Fixture to create a mock database client with an async users collection."""
     db_client = MagicMock()
     db_client.users = AsyncMock()  # Mock the 'users' collection
+    db_client.groups = AsyncMock()
+    db_client.account_deletions = AsyncMock()
     return db_client
 
 
@@ -194,8 +197,14 @@ async def test_get_user_by_id_invalid_objectid(mock_db_client, mock_get_database
 
 
 @pytest.mark.asyncio
-async def test_update_user_profile_success(mock_db_client, mock_get_database):
+async def test_update_user_profile_success(mock_db_client, mock_get_database, mocker):
     update_data = {"name": "New Name", "currency": "CAD"}
+    mock_refresh = mocker.patch(
+        "app.user.service.group_service.schedule_member_profile_refresh", AsyncMock()
+    )
+    mock_propagate = mocker.patch(
+        "app.user.service.expense_service.propagate_user_name", AsyncMock()
+    )
 
     # The user document that find_one_and_update would return
     updated_user_doc_from_db = RAW_USER_FROM_DB.copy()
@@ -222,6 +231,15 @@ async def test_update_user_profile_success(mock_db_client, mock_get_database):
         kwargs["return_document"] is True
     )  # from pymongo import ReturnDocument (True means ReturnDocument.AFTER)
 
+    # Renames show up in group views, so the snapshots in the user's groups
+    # are refreshed by a job, queued before the write in case we stop after it
+    assert mock_refresh.await_args_list == [
+        mocker.call(TEST_OBJECT_ID_STR, delay=settings.jobs_visibility_timeout),
+        mocker.call(TEST_OBJECT_ID_STR),
+    ]
+    # and the new name is copied into settlements
+    mock_propagate.assert_awaited_once_with(TEST_OBJECT_ID_STR, "New Name")
+
     assert updated_user is not None
     assert updated_user["name"] == "New Name"
     assert updated_user["currency"] == "CAD"
@@ -229,6 +247,36 @@ async def test_update_user_profile_success(mock_db_client, mock_get_database):
     assert updated_user["updatedAt"] == ISO_LATER
 
 
+@pytest.mark.asyncio
+async def test_update_user_profile_moves_data_url_image_to_blob_storage(
+    mock_db_client, mocker
+):
+    mock_externalize = mocker.patch(
+        "app.user.service.externalize_image_url",
+        AsyncMock(return_value="/images/" + "a" * 64 + ".png"),
+    )
+    mock_spawn = mocker.patch("app.user.service.spawn")
+    mocker.patch(
+        "app.user.service.group_service.schedule_member_profile_refresh", AsyncMock()
+    )
+    mock_warm = mocker.patch(
+        "app.user.service.warm_image_variants", MagicMock(return_value="warm")
+    )
+    mock_db_client.users.find_one_and_update.return_value = RAW_USER_FROM_DB.copy()
+
+    await user_service.update_user_profile(
+        TEST_OBJECT_ID_STR, {"imageUrl": "data:image/png;base64,iVBORw0KGgo="}
+    )
+
+    mock_externalize.assert_awaited_once_with("data:image/png;base64,iVBORw0KGgo=")
+    args, _ = mock_db_client.users.find_one_and_update.call_args
+    assert args[1]["$set"]["imageUrl"] == "/images/" + "a" * 64 + ".png"
+    # Avatar variants are generated in the background
+    mock_warm.assert_called_once_with("/images/" + "a" * 64 + ".png", (64, 256))
+    mock_spawn.assert_called_once()
+    assert mock_spawn.call_args.args[0] == "warm"
+
+
 @pytest.mark.asyncio
 async def test_update_user_profile_user_not_found(mock_db_client, mock_get_database):
     mock_db_client.users.find_one_and_update.return_value = (
@@ -267,27 +315,42 @@ async def test_update_user_profile_invalid_object_id(mock_db_client, mock_get_da
 
 
 @pytest.mark.asyncio
-async def test_delete_user_success(mock_db_client, mock_get_database):
+async def test_delete_user_success(mock_db_client, mock_get_database, mocker):
     mock_delete_result = MagicMock()
     mock_delete_result.deleted_count = 1
     mock_db_client.users.delete_one.return_value = mock_delete_result
+    mock_schedule = mocker.patch.object(user_service, "_schedule_account_purge")
 
     result = await user_service.delete_user(TEST_OBJECT_ID_STR)
 
     mock_db_client.users.delete_one.assert_called_once_with({"_id": TEST_OBJECT_ID})
     assert result is True
+    # The rest of the account is purged in the background, queued (held
+    # back) before the user is deleted and moved forward afterwards
+    args, kwargs = mock_db_client.account_deletions.update_one.call_args
+    assert args[0] == {"_id": TEST_OBJECT_ID_STR}
+    assert kwargs["upsert"] is True
+    assert mock_schedule.await_args_list == [
+        mocker.call(TEST_OBJECT_ID_STR, settings.jobs_visibility_timeout),
+        mocker.call(TEST_OBJECT_ID_STR),
+    ]
 
 
 @pytest.mark.asyncio
-async def test_delete_user_not_found(mock_db_client, mock_get_database):
+async def test_delete_user_not_found(mock_db_client, mock_get_database, mocker):
     mock_delete_result = MagicMock()
     mock_delete_result.deleted_count = 0
     mock_db_client.users.delete_one.return_value = mock_delete_result
+    mocker.patch.object(user_service, "_schedule_account_purge")
 
     result = await user_service.delete_user(TEST_OBJECT_ID_STR)
 
     mock_db_client.users.delete_one.assert_called_once_with({"_id": TEST_OBJECT_ID})
     assert result is False
+    # The deletion record created for it is dropped again
+    mock_db_client.account_deletions.delete_one.assert_awaited_once_with(
+        {"_id": TEST_OBJECT_ID_STR, "stage": 0}
+    )
 
 
 # Added Test for invalid ObjectId format for user deletion